@@ -0,0 +1,386 @@
+"""Single-pass aggregation engine shared by the analysis, dashboard and summary scripts
+
+Instead of every script running its own GROUP BY over orders (six queries in
+phase 2, five in phase 3, two in the project summary), the engine streams
+order_facts once, accumulates every grouping with NumPy bincounts, and builds
+all report tables from those accumulators. The finished report is cached on
+disk keyed by the database's data_version, so the other scripts reuse it until
+new data is loaded.
+
+Every accumulator is an integer sum, count or max (revenue is kept in cents
+and averages are derived from sum and count only when the report is built), so
+partial aggregates over any split of the orders merge exactly.
+aggregate_parallel() uses that to spread the pass over a process pool.
+"""
+import functools
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import db
+import instrumentation
+import snapshot
+
+REPORT_CACHE_PATH = 'data/analytics_report.pkl'
+
+FACT_DTYPE = np.dtype([
+    ('customer_key', np.int64),
+    ('product_key', np.int64),
+    ('category_key', np.int64),
+    ('order_day', np.int64),
+    ('quantity', np.int64),
+    ('total_cents', np.int64),
+])
+
+FACT_COLUMNS_SQL = """
+    SELECT customer_key, product_key, category_key, order_day, quantity,
+           CAST(ROUND(total_amount * 100) AS INTEGER)
+    FROM order_facts
+"""
+
+
+def _grow(array, size):
+    if len(array) >= size:
+        return array
+    grown = np.zeros(size, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class OrderAggregates:
+    """Per-key accumulators for every report grouping; partial results merge with +"""
+
+    GROUPS = {
+        'day': ('order_day', ['revenue_cents', 'orders', 'units']),
+        'category': ('category_key', ['revenue_cents', 'orders']),
+        'product': ('product_key', ['revenue_cents', 'orders', 'units']),
+        'customer': ('customer_key', ['revenue_cents', 'orders', 'last_day']),
+    }
+
+    def __init__(self):
+        self.arrays = {
+            group: {name: np.zeros(0, dtype=np.int64) for name in fields}
+            for group, (_, fields) in self.GROUPS.items()
+        }
+        # Days are stored relative to the first day seen to keep the arrays short
+        self.day_offset = None
+
+    def update(self, facts):
+        """Accumulate one chunk of FACT_DTYPE records"""
+        if len(facts) == 0:
+            return
+        if self.day_offset is None:
+            self.day_offset = int(facts['order_day'].min())
+        if facts['order_day'].min() < self.day_offset:
+            self._shift_days(int(facts['order_day'].min()))
+
+        for group, (column, fields) in self.GROUPS.items():
+            keys = facts[column] - self.day_offset if group == 'day' else facts[column]
+            size = int(keys.max()) + 1
+            arrays = self.arrays[group]
+            for name in fields:
+                arrays[name] = _grow(arrays[name], size)
+            arrays['orders'] += np.bincount(keys, minlength=len(arrays['orders']))
+            # Integer weights sum exactly in float64 (below 2**53 cents per chunk)
+            arrays['revenue_cents'] += np.bincount(keys, weights=facts['total_cents'],
+                                                   minlength=len(arrays['revenue_cents'])).astype(np.int64)
+            if 'units' in arrays:
+                arrays['units'] += np.bincount(keys, weights=facts['quantity'],
+                                               minlength=len(arrays['units'])).astype(np.int64)
+            if 'last_day' in arrays:
+                np.maximum.at(arrays['last_day'], keys, facts['order_day'])
+
+    def _shift_days(self, new_offset):
+        shift = self.day_offset - new_offset
+        for name, array in self.arrays['day'].items():
+            self.arrays['day'][name] = np.concatenate([np.zeros(shift, dtype=array.dtype), array])
+        self.day_offset = new_offset
+
+    def merge(self, other):
+        """Add another accumulator's partial results into this one"""
+        if other.day_offset is None:
+            return self
+        if self.day_offset is None:
+            self.day_offset = other.day_offset
+        if other.day_offset < self.day_offset:
+            self._shift_days(other.day_offset)
+        for group, (_, fields) in self.GROUPS.items():
+            for name in fields:
+                theirs = other.arrays[group][name]
+                if group == 'day':
+                    theirs = np.concatenate([
+                        np.zeros(other.day_offset - self.day_offset, dtype=theirs.dtype), theirs])
+                mine = _grow(self.arrays[group][name], len(theirs))
+                theirs = _grow(theirs, len(mine))
+                if name == 'last_day':
+                    self.arrays[group][name] = np.maximum(mine, theirs)
+                else:
+                    self.arrays[group][name] = mine + theirs
+        return self
+
+
+def scan_order_facts(conn, chunk_size=500_000, id_range=None):
+    """Yield order_facts (optionally first..last order_id) as FACT_DTYPE record arrays, chunk_size rows at a time"""
+    if id_range is None:
+        cursor = conn.execute(FACT_COLUMNS_SQL)
+    else:
+        cursor = conn.execute(FACT_COLUMNS_SQL + " WHERE order_id BETWEEN ? AND ?", id_range)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield np.fromiter(rows, dtype=FACT_DTYPE, count=len(rows))
+
+
+def scan_store(store, chunk_size=500_000):
+    """Yield an OrderStore (e.g. a mapped snapshot) as FACT_DTYPE chunks, codes standing in for keys"""
+    for start in range(0, len(store), chunk_size):
+        stop = min(start + chunk_size, len(store))
+        chunk = np.empty(stop - start, dtype=FACT_DTYPE)
+        chunk['customer_key'] = store.column('customer')[start:stop]
+        chunk['product_key'] = store.column('product')[start:stop]
+        chunk['category_key'] = store.column('category')[start:stop]
+        chunk['order_day'] = store.column('order_day')[start:stop]
+        chunk['quantity'] = store.column('quantity')[start:stop]
+        chunk['total_cents'] = store.column('total_cents')[start:stop]
+        yield chunk
+
+
+@instrumentation.stage('analysis.aggregate_orders')
+def aggregate_orders(conn, chunk_size=500_000):
+    """Stream order_facts once and return the filled OrderAggregates"""
+    aggregates = OrderAggregates()
+    for chunk in scan_order_facts(conn, chunk_size):
+        aggregates.update(chunk)
+    return aggregates
+
+
+@instrumentation.stage('analysis.aggregate_store')
+def aggregate_store(store, chunk_size=500_000):
+    """OrderAggregates of an OrderStore, keyed by its dictionary codes"""
+    aggregates = OrderAggregates()
+    for chunk in scan_store(store, chunk_size):
+        aggregates.update(chunk)
+    return aggregates
+
+
+def split_range(low, high, parts):
+    """Split the inclusive range low..high into at most parts contiguous (first, last) ranges"""
+    if high < low:
+        return []
+    bounds = np.linspace(low, high + 1, min(parts, high - low + 1) + 1).astype(np.int64)
+    return [(int(first), int(last) - 1) for first, last in zip(bounds[:-1], bounds[1:])]
+
+
+def _aggregate_id_range(db_path, id_range, chunk_size):
+    conn = db.connect_readonly(db_path)
+    try:
+        aggregates = OrderAggregates()
+        for chunk in scan_order_facts(conn, chunk_size, id_range):
+            aggregates.update(chunk)
+        return aggregates
+    finally:
+        conn.close()
+
+
+@functools.lru_cache(maxsize=4)
+def _mapped_snapshot(directory, name):
+    return snapshot.open_snapshot(directory, name)[0]
+
+
+def _aggregate_snapshot_rows(location, row_range, chunk_size):
+    first, last = row_range
+    return aggregate_store(_mapped_snapshot(*location).take(slice(first, last + 1)), chunk_size)
+
+
+@instrumentation.stage('analysis.aggregate_parallel')
+def aggregate_parallel(db_path=None, workers=None, store=None, partitions=None, chunk_size=500_000):
+    """OrderAggregates computed by a process pool over order ranges, then merged
+
+    Without store, each task scans one order_id range of order_facts on its
+    own read-only connection (an index range scan of the primary key). With a
+    store mapped from a snapshot, tasks take row ranges of it instead and each
+    worker maps the same files, so they share the pages. There are several
+    partitions per worker so a slow one does not hold up the others. The
+    merged result equals a single aggregate_orders() pass exactly.
+    """
+    db_path = db_path or db.DB_PATH
+    workers = workers or os.cpu_count() or 1
+    partitions = partitions or workers * 4
+    if store is not None:
+        if store.location is None:
+            raise ValueError("only stores mapped from a snapshot can be shared with worker processes")
+        task = functools.partial(_aggregate_snapshot_rows, store.location, chunk_size=chunk_size)
+        ranges = split_range(0, len(store) - 1, partitions)
+    else:
+        conn = db.connect_readonly(db_path)
+        try:
+            low, high = conn.execute("SELECT MIN(order_id), MAX(order_id) FROM order_facts").fetchone()
+        finally:
+            conn.close()
+        task = functools.partial(_aggregate_id_range, db_path, chunk_size=chunk_size)
+        ranges = split_range(low, high, partitions) if low is not None else []
+
+    if workers == 1 or len(ranges) <= 1:
+        partials = map(task, ranges)
+        return functools.reduce(OrderAggregates.merge, partials, OrderAggregates())
+    # fork where available: workers start without re-importing pandas
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(min(workers, len(ranges)), mp_context=context) as executor:
+        return functools.reduce(OrderAggregates.merge, executor.map(task, ranges), OrderAggregates())
+
+
+def _dimension(conn, sql):
+    return dict(conn.execute(sql))
+
+
+def read_dimensions(conn):
+    """(categories, customers, products) by key: names, and (name, category_key) for products"""
+    categories = _dimension(conn, "SELECT category_key, category FROM categories")
+    customers = _dimension(conn, "SELECT customer_key, customer_id FROM customers")
+    products = {key: (name, category_key) for key, name, category_key in
+                conn.execute("SELECT product_key, product_name, category_key FROM products")}
+    return categories, customers, products
+
+
+def store_dimensions(store):
+    """read_dimensions() for an OrderStore, whose dictionary codes are the keys"""
+    product_category = np.zeros(len(store.dictionaries['product']), dtype=np.int64)
+    product_category[store.column('product')] = store.column('category')
+    return (dict(enumerate(store.dictionaries['category'])),
+            dict(enumerate(store.dictionaries['customer'])),
+            {code: (name, int(product_category[code]))
+             for code, name in enumerate(store.dictionaries['product'])})
+
+
+@instrumentation.stage('analysis.build_report')
+def build_report(aggregates, conn=None, dimensions=None):
+    """Turn accumulated aggregates into the report tables used by the scripts
+
+    Key-to-name lookups come from conn's dimension tables, or from dimensions
+    (see store_dimensions) when the aggregates were keyed by store codes.
+    """
+    categories, customers, products = dimensions if dimensions is not None else read_dimensions(conn)
+
+    # Daily series: the base for monthly and weekly trends
+    day = aggregates.arrays['day']
+    present = np.flatnonzero(day['orders'])
+    offset = aggregates.day_offset or 0
+    dates = (present + offset).astype('datetime64[D]')
+    daily = pd.DataFrame({
+        'order_date': dates,
+        'revenue': day['revenue_cents'][present] / 100,
+        'order_count': day['orders'][present],
+        'units': day['units'][present],
+    })
+
+    month_labels = np.datetime_as_string(dates.astype('datetime64[M]'))
+    monthly_sales = (daily.assign(month=month_labels)
+                     .groupby('month', as_index=False)
+                     .agg(monthly_revenue=('revenue', 'sum'), order_count=('order_count', 'sum')))
+
+    week_labels = pd.DatetimeIndex(dates).strftime('%Y-%W') if len(dates) else []
+    weekly_trend = (daily.assign(week=week_labels)
+                    .groupby('week', as_index=False)
+                    .agg(weekly_revenue=('revenue', 'sum'), weekly_orders=('order_count', 'sum')))
+
+    category = aggregates.arrays['category']
+    keys = np.flatnonzero(category['orders'])
+    category_performance = pd.DataFrame({
+        'category': [categories[k] for k in keys],
+        'revenue': category['revenue_cents'][keys] / 100,
+        'order_count': category['orders'][keys],
+        'avg_order_value': category['revenue_cents'][keys] / 100 / category['orders'][keys],
+    }).sort_values('revenue', ascending=False, ignore_index=True)
+
+    product = aggregates.arrays['product']
+    keys = np.flatnonzero(product['orders'])
+    product_performance = pd.DataFrame({
+        'product_name': [products[k][0] for k in keys],
+        'category': [categories[products[k][1]] for k in keys],
+        'revenue': product['revenue_cents'][keys] / 100,
+        'total_quantity': product['units'][keys],
+        'order_count': product['orders'][keys],
+    }).sort_values('revenue', ascending=False, ignore_index=True)
+
+    customer = aggregates.arrays['customer']
+    keys = np.flatnonzero(customer['orders'])
+    # Recency is measured from the latest order day in the data
+    anchor_day = int(present[-1]) + offset if len(present) else 0
+    customer_stats = pd.DataFrame({
+        'customer_id': [customers[k] for k in keys],
+        'frequency': customer['orders'][keys],
+        'monetary': customer['revenue_cents'][keys] / 100,
+        'last_order_date': customer['last_day'][keys].astype('datetime64[D]'),
+        'recency_days': anchor_day - customer['last_day'][keys],
+    }).sort_values('monetary', ascending=False, ignore_index=True)
+
+    total_orders = int(day['orders'].sum())
+    total_revenue = int(day['revenue_cents'].sum()) / 100
+    basic_metrics = pd.DataFrame([{
+        'total_orders': total_orders,
+        'total_revenue': round(total_revenue, 2),
+        'avg_order_value': total_revenue / total_orders if total_orders else 0.0,
+        'unique_customers': len(keys),
+    }])
+
+    report = {
+        'basic_metrics': basic_metrics,
+        'daily_sales': daily,
+        'monthly_sales': monthly_sales,
+        'weekly_trend': weekly_trend,
+        'category_performance': category_performance,
+        'product_performance': product_performance,
+        'customer_stats': customer_stats,
+    }
+    # Sums regrouped from the per-day amounts are floats again; present money rounded to cents
+    for name in ['daily_sales', 'monthly_sales', 'weekly_trend', 'category_performance',
+                 'product_performance', 'customer_stats']:
+        frame = report[name]
+        for column in ['revenue', 'monthly_revenue', 'weekly_revenue', 'monetary']:
+            if column in frame:
+                frame[column] = frame[column].round(2)
+    return report
+
+
+def load_report(db_path=None, cache_path=REPORT_CACHE_PATH, refresh=False, workers=1):
+    """Return the shared report, recomputing it only when the data_version changed
+
+    A recompute reads the memory-mapped snapshot when it is current, and
+    order_facts otherwise; workers other than 1 spreads it over that many
+    processes (None: one per core) with aggregate_parallel().
+    """
+    db_path = db_path or db.DB_PATH
+    conn = instrumentation.connect(db_path)
+    try:
+        version, _ = db.get_data_version(conn)
+        key = (os.path.abspath(db_path), version)
+
+        if not refresh and version and os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('key') == key:
+                return cached['report']
+
+        store = snapshot.load(conn, db_path)
+        if workers != 1:
+            aggregates = aggregate_parallel(db_path, workers, store)
+        elif store is not None:
+            aggregates = aggregate_store(store)
+        else:
+            aggregates = aggregate_orders(conn)
+        if store is not None:
+            report = build_report(aggregates, dimensions=store_dimensions(store))
+        else:
+            report = build_report(aggregates, conn)
+    finally:
+        conn.close()
+
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    with open(cache_path, 'wb') as f:
+        pickle.dump({'key': key, 'report': report}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return report
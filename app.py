@@ -1,15 +1,15 @@
 from flask import Flask
-import sqlite3
-import pandas as pd
+
+import db
 
 app = Flask(__name__)
+db.init_app(app)
 
 @app.route('/')
 def dashboard():
-    conn = sqlite3.connect('data/ecommerce.db')
-    metrics = pd.read_sql_query("SELECT COUNT(*) as orders FROM orders", conn)
-    conn.close()
-    return f"E-commerce Analytics: {metrics.iloc[0]['orders']} orders processed"
+    conn = db.get_connection()
+    orders, = conn.execute("SELECT COUNT(*) FROM order_facts").fetchone()
+    return f"E-commerce Analytics: {orders} orders processed"
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""asyncio server mode for the dashboard API
+
+Serves exactly the routes of web_dashboard.app (requests are handed to the
+Flask app through WSGI), but on an aiohttp event loop instead of one blocked
+thread per request:
+
+* DB work runs on a bounded thread pool, so a slow aggregate never blocks the
+  loop and other widgets keep being answered.
+* Concurrent identical GETs are coalesced ("single-flight"): one request runs
+  the query, every waiter gets its response.
+* /api/live (Server-Sent Events) is handled on the loop itself, so open
+  dashboards hold no threads while they wait for the next delta.
+* Backpressure: once max_pending requests are queued for the pool, new ones
+  get an immediate 503 with Retry-After instead of piling up; streamed
+  exports are written with drain(), so a slow client slows its own DB reads.
+
+Requires aiohttp (pip install aiohttp).
+
+    python async_server.py [--port 5000] [--workers 8] [--max-pending 64]
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from aiohttp import web
+except ImportError:  # optional dependency
+    web = None
+
+import live
+from query import dumps
+from web_dashboard import app as flask_app
+
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Request headers that can change a GET's response, and so belong in the single-flight key
+VARYING_HEADERS = ('If-None-Match', 'If-Modified-Since', 'Accept', 'Accept-Encoding')
+
+
+def _environ(method, path, query_string, headers, body, server):
+    """Minimal PEP 3333 environ for one request"""
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query_string,
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_TYPE': headers.get('Content-Type', ''),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers.items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key not in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+            environ[key] = value
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    """Run a WSGI app (on a pool thread); returns (status, headers, body or iterator)
+
+    Responses with a Content-Length are read in full here; streamed ones are
+    returned as their iterator, to be pulled chunk by chunk.
+    """
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = headers
+
+    result = wsgi_app(environ, start_response)
+    headers = started['headers']
+    if any(name.lower() == 'content-length' for name, _ in headers):
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], headers, body
+    return started['status'], headers, result
+
+
+class AsyncDashboardServer:
+    """aiohttp front end running a WSGI app on a bounded pool with single-flight GETs"""
+
+    def __init__(self, wsgi_app=flask_app, workers=DEFAULT_WORKERS, max_pending=None):
+        if web is None:
+            raise ImportError("the async server needs aiohttp: pip install aiohttp")
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db')
+        self.max_pending = max_pending or workers * 8
+        self.pending = 0
+        self.inflight = {}
+        self.stats = {'requests': 0, 'coalesced': 0, 'rejected': 0}
+
+    async def _run(self, fn, *args, admit=True, executor=None):
+        """Run fn on the pool, or raise HTTPServiceUnavailable when the queue is full
+
+        admit=False skips the limit, for work of a request that was already admitted;
+        executor runs it somewhere other than the shared pool.
+        """
+        if admit and self.pending >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise web.HTTPServiceUnavailable(
+                body=dumps({'error': 'server busy, retry shortly'}),
+                content_type='application/json', headers={'Retry-After': '1'})
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor or self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def _single_flight(self, key, environ):
+        """Share one WSGI call between concurrent identical requests
+
+        Buffered responses are shared; a streamed one belongs to the request
+        that started it, so waiters get None and make their own call.
+        """
+        future = self.inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            result = await self._run(call_wsgi, self.wsgi_app, environ)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self.inflight[key]
+        future.set_result(result if isinstance(result[2], bytes) else None)
+        return result
+
+    async def handle(self, request):
+        self.stats['requests'] += 1
+        body = await request.read()
+        environ = _environ(request.method, request.path, request.query_string,
+                           request.headers, body, (request.url.host, request.url.port or 80))
+
+        result = None
+        if request.method in ('GET', 'HEAD'):
+            key = (request.method, request.path_qs, *(request.headers.get(h) for h in VARYING_HEADERS))
+            result = await self._single_flight(key, environ)
+        if result is None:
+            result = await self._run(call_wsgi, self.wsgi_app, environ)
+
+        status, headers, payload = result
+        if isinstance(payload, bytes):
+            return web.Response(status=status, headers=_headers(headers), body=payload)
+        return await self._stream(request, status, headers, payload)
+
+    async def _stream(self, request, status, headers, result):
+        response = web.StreamResponse(status=status, headers=_headers(headers))
+        await response.prepare(request)
+        # The body generator can hold thread-bound state (the export's SQLite
+        # connection), so all of it runs on one thread of its own
+        thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stream')
+        chunks = iter(result)
+        try:
+            while True:
+                chunk = await self._run(next, chunks, None, admit=False, executor=thread)
+                if chunk is None:
+                    break
+                await response.write(chunk)  # waits for the client to drain
+        finally:
+            try:
+                if hasattr(result, 'close'):
+                    await self._run(result.close, admit=False, executor=thread)
+            finally:
+                thread.shutdown(wait=False)
+        await response.write_eof()
+        return response
+
+    async def live_metrics(self, request):
+        """/api/live served natively: subscribers wait on the loop, not on pool threads"""
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue(live.QUEUE_SIZE)
+        dropped = asyncio.Event()
+
+        def put(message):
+            try:
+                messages.put_nowait(message)
+            except asyncio.QueueFull:
+                dropped.set()  # too far behind: end the stream, the client reconnects
+
+        def deliver(message):  # called on the publisher thread
+            loop.call_soon_threadsafe(put, message)
+
+        hub = live.get_hub()
+        snapshot = await self._run(hub.subscribe, deliver)
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream',
+                                               'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        try:
+            await response.prepare(request)
+            await response.write(snapshot)
+            while not dropped.is_set():
+                try:
+                    message = await asyncio.wait_for(messages.get(), live.HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    message = live.HEARTBEAT
+                await response.write(message)
+        except ConnectionResetError:
+            pass
+        finally:
+            hub.unsubscribe(deliver)
+        return response
+
+    def make_app(self):
+        application = web.Application()
+        application.router.add_get('/_async/stats', self.get_stats)
+        application.router.add_get('/api/live', self.live_metrics)
+        # Everything else goes to the Flask app, which owns routing, 404s and 405s
+        application.router.add_route('*', '/{tail:.*}', self.handle)
+        application.on_shutdown.append(self._shutdown)
+        return application
+
+    async def get_stats(self, request):
+        return web.Response(body=dumps({**self.stats, 'pending': self.pending}),
+                            content_type='application/json')
+
+    async def _shutdown(self, application):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _headers(headers):
+    # aiohttp computes its own framing headers
+    return [(name, value) for name, value in headers
+            if name.lower() not in ('content-length', 'transfer-encoding', 'connection')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the dashboard API on an asyncio event loop')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='DB thread pool size')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='queued requests before answering 503 (default 8 per worker)')
+    args = parser.parse_args()
+
+    server = AsyncDashboardServer(workers=args.workers, max_pending=args.max_pending)
+    print("🚀 Starting E-commerce Dashboard (async)...")
+    print(f"📊 Access your dashboard at: http://localhost:{args.port}")
+    print(f"⚙️  {args.workers} DB workers, 503 beyond {server.max_pending} queued requests")
+    web.run_app(server.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Micro-benchmark: per-request latency of the API serialization paths
+
+Compares the old pandas path (read_sql_query -> DataFrame -> to_dict -> jsonify)
+with the cursor -> dict -> JSON path in query.py, for the dashboard endpoints.
+The result cache is bypassed so every call runs the query.
+
+    python benchmarks/bench_api_serialization.py [--iterations 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import web_dashboard  # noqa: E402
+from flask import jsonify  # noqa: E402
+
+ENDPOINTS = {
+    '/api/metrics': web_dashboard.get_metrics,
+    '/api/monthly-data': web_dashboard.get_monthly_data,
+    '/api/categories': web_dashboard.get_categories,
+    '/api/recent-orders': web_dashboard.get_recent_orders,
+}
+
+
+def time_calls(fn, iterations):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def pandas_path(sql):
+    import pandas as pd
+
+    def call():
+        df = pd.read_sql_query(sql, db.get_connection())
+        return jsonify(df.to_dict('records'))
+    return call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    # Capture each endpoint's SQL by recording what the fast path executes
+    captured = {}
+    conn = db.get_connection()
+    with web_dashboard.app.test_request_context():
+        for path, view in ENDPOINTS.items():
+            statements = []
+            conn.set_trace_callback(statements.append)
+            view.__wrapped__()
+            conn.set_trace_callback(None)
+            captured[path] = statements[-1]
+
+        print(f"{'endpoint':22} {'pandas (µs)':>12} {'fast (µs)':>12} {'speed-up':>9}")
+        for path, view in ENDPOINTS.items():
+            before = time_calls(pandas_path(captured[path]), args.iterations)
+            after = time_calls(view.__wrapped__, args.iterations)
+            print(f"{path:22} {before:>12.1f} {after:>12.1f} {before / after:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Cold-start cost of every cli.py subcommand
+
+Each subcommand's module is imported in a fresh interpreter, as cron would
+start it. Reports the wall time to import it (interpreter startup excluded),
+the import time Python itself measures (-X importtime), and which heavy
+libraries got pulled in. With --target-ms, exits non-zero when a cron-driven
+command (ingest, summary by default) starts slower than the target.
+
+    python benchmarks/bench_import_time.py [--repeat 5] [--target-ms 300] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cli import COMMANDS  # noqa: E402  (cli itself imports nothing heavy)
+
+HEAVY = ('numpy', 'pandas', 'matplotlib', 'PIL', 'flask', 'aiohttp', 'pyarrow')
+CRON_COMMANDS = ('ingest', 'summary')
+
+TARGETS = {name: module for name, (module, _, _) in COMMANDS.items()}
+TARGETS['serve --async'] = 'async_server'
+TARGETS['(dispatcher)'] = 'cli'
+
+
+def _run(code, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+    return result.stdout, result.stderr
+
+
+def wall_ms(module, repeat):
+    """Median wall time of `import module`, measured inside a fresh interpreter each time"""
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    return statistics.median(float(_run(code)[0]) for _ in range(repeat))
+
+
+def importtime(module):
+    """(total import µs reported by -X importtime, heavy top-level packages imported)"""
+    _, stderr = _run(f"import {module}", importtime=True)
+    total, packages = 0, set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name[1:].startswith(' '):
+            total += int(cumulative)  # top level: cumulative covers everything it pulled in
+        packages.add(name.strip().split('.')[0])
+    return total, sorted(p for p in HEAVY if p in packages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--target-ms', type=float, help='fail when a cron command imports slower than this')
+    parser.add_argument('--cron', default=','.join(CRON_COMMANDS), help='commands held to --target-ms')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = []
+    for name, module in TARGETS.items():
+        total_us, heavy = importtime(module)
+        results.append({'command': name, 'module': module, 'wall_ms': wall_ms(module, args.repeat),
+                        'importtime_ms': total_us / 1000, 'heavy': heavy})
+
+    print(f"{'command':15} {'module':24} {'wall (ms)':>10} {'-X importtime':>14}  heavy imports")
+    for r in results:
+        print(f"{r['command']:15} {r['module']:24} {r['wall_ms']:>10.1f} {r['importtime_ms']:>14.1f}  "
+              f"{', '.join(r['heavy']) or '-'}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.target_ms:
+        cron = set(args.cron.split(','))
+        slow = [r for r in results if r['command'] in cron and r['wall_ms'] > args.target_ms]
+        for r in slow:
+            print(f"❌ {r['command']} starts in {r['wall_ms']:.0f} ms, over the {args.target_ms:.0f} ms target")
+        if slow:
+            sys.exit(1)
+        print(f"✅ {', '.join(sorted(cron))} start under {args.target_ms:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""End-to-end benchmark: generation, load, analysis, API and rendering at several scales
+
+For each scale (10k, 1m, 10m, 100m rows, or any count) it generates orders with
+the phase 1 catalogue, loads them with create_database.py, then times every
+analysis step, every dashboard endpoint (result cache cleared before each
+call) and the chart rendering. Results go to a JSON file; `compare` diffs two
+such files and exits non-zero on regressions.
+
+    python benchmarks/bench_pipeline.py run --scales 10k,1m --json data/bench/today.json
+    python benchmarks/bench_pipeline.py run --scales 10k,1m --baseline data/bench/last.json
+    python benchmarks/bench_pipeline.py compare data/bench/last.json data/bench/today.json [--threshold 0.1]
+
+Datasets are kept in --work-dir (default data/bench/); --reuse skips the
+generate and load stages when a scale's files already exist. The 100m scale
+needs about 7 GB for the CSV and as much again for the database.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics_engine  # noqa: E402
+import chart_render  # noqa: E402
+import create_database  # noqa: E402
+import db  # noqa: E402
+import instrumentation  # noqa: E402
+import phase1_data_collection  # noqa: E402
+import rfm  # noqa: E402
+import snapshot  # noqa: E402
+import web_dashboard  # noqa: E402
+from cache import api_cache  # noqa: E402
+
+SCALES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000, '100m': 100_000_000}
+
+ENDPOINTS = [
+    '/api/metrics',
+    '/api/metrics?exact=1',
+    '/api/forecast',
+    '/api/forecast?category=Books&horizon=90',
+    '/api/monthly-data',
+    '/api/monthly-data?start=2023-03-10&end=2023-05-20&granularity=week',
+    '/api/categories',
+    '/api/categories?start=2023-07-01&end=2023-09-30',
+    '/api/recent-orders',
+    '/api/recent-orders?limit=100&category=Books',
+    '/api/top-products',
+    '/api/top-customers',
+    '/api/rfm',
+    '/api/orders/export?start=2023-06-01&end=2023-06-01',
+]
+
+# compare: ignore changes smaller than this many seconds, whatever the ratio
+MIN_DELTA = 0.002
+
+
+def parse_scale(value):
+    value = value.strip().lower()
+    if value in SCALES:
+        return value, SCALES[value]
+    try:
+        return value, int(float(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"unknown scale {value!r}") from None
+
+
+class Timer:
+    """Collects stage timings as {stage: {'seconds': ..., **details}}"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def stage(self, name, fn, *args, repeat=1, **details):
+        """Run fn repeat times; records the median and returns the last result"""
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn(*args)
+            times.append(time.perf_counter() - start)
+        entry = {'seconds': statistics.median(times), **details}
+        if repeat > 1:
+            entry.update(min_seconds=min(times), max_seconds=max(times), repeat=repeat)
+        self.stages[name] = entry
+        print(f"   {name:70} {entry['seconds'] * 1000:>11.1f} ms")
+        return result
+
+
+def bench_build(timer, rows, csv_path, db_path, reuse):
+    if reuse and os.path.exists(db_path):
+        print(f"   (reusing {db_path})")
+        return
+    written = timer.stage('generate/csv_write', phase1_data_collection.write_orders_csv, csv_path, rows)
+    timer.stages['generate/csv_write'].update(rows=written, bytes=os.path.getsize(csv_path),
+                                              rows_per_sec=written / timer.stages['generate/csv_write']['seconds'])
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    stats = timer.stage('load/create_database', create_database.load_orders, [csv_path], db_path)
+    timer.stages['load/create_database'].update(stats)
+    timer.stage('load/rfm_scores', rfm.score_customers, db_path)
+
+
+def bench_analysis(timer, db_path, cache_path):
+    conn = instrumentation.connect(db_path)
+    try:
+        aggregates = timer.stage('analysis/aggregate_orders', analytics_engine.aggregate_orders, conn)
+        report = timer.stage('analysis/build_report', analytics_engine.build_report, aggregates, conn)
+    finally:
+        conn.close()
+    directory = snapshot.snapshot_dir(db_path)
+    store, _ = timer.stage('analysis/open_snapshot', snapshot.open_snapshot, directory, repeat=3)
+    if store is not None:
+        timer.stage('analysis/aggregate_snapshot', analytics_engine.aggregate_store, store)
+        timer.stage('analysis/aggregate_snapshot_parallel', analytics_engine.aggregate_parallel, db_path, None, store)
+    timer.stage('analysis/aggregate_parallel', analytics_engine.aggregate_parallel, db_path)
+    stats = report['customer_stats']
+    timer.stage('analysis/rfm_segments', rfm.score_rfm, stats['recency_days'].to_numpy(),
+                stats['frequency'].to_numpy(), stats['monetary'].to_numpy(), repeat=3)
+    analytics_engine.load_report(db_path, cache_path, refresh=True)
+    timer.stage('analysis/report_cache_hit', analytics_engine.load_report, db_path, cache_path, repeat=3)
+    return report
+
+
+def bench_api(timer, db_path, repeat):
+    db.DB_PATH = db_path  # read at call time by every endpoint
+    client = web_dashboard.app.test_client()
+
+    def cold(url):
+        api_cache.clear()
+        response = client.get(url)
+        body = response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} answered {response.status_code}: {body[:200]!r}")
+        return len(body)
+
+    def cached(url):
+        return len(client.get(url).get_data())
+
+    for url in ENDPOINTS:
+        size = timer.stage(url, cold, url, repeat=repeat)
+        timer.stages[url]['bytes'] = size
+        if 'export' not in url:  # streamed responses are not cached
+            timer.stage(f"{url} [cached]", cached, url, repeat=repeat)
+
+
+def bench_render(timer, report, work_dir):
+    cache_dir = os.path.join(work_dir, 'panel_cache')
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    png, pdf = os.path.join(work_dir, 'dashboard.png'), os.path.join(work_dir, 'dashboard.pdf')
+    panels = chart_render.panel_data(report)
+    timer.stage('render/all_panels', chart_render.render_dashboard, panels, png, pdf, cache_dir)
+    timer.stage('render/unchanged', chart_render.render_dashboard, panels, png, pdf, cache_dir)
+    panels['top_products'] = panels['top_products'].head(len(panels['top_products']) - 1)
+    timer.stage('render/one_panel_changed', chart_render.render_dashboard, panels, png, pdf, cache_dir)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    os.makedirs(args.work_dir, exist_ok=True)
+    results = {
+        'meta': {
+            'started': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'scales': {},
+    }
+    for name, rows in args.scales:
+        print(f"📏 {name} ({rows:,} rows)")
+        scale_dir = os.path.join(args.work_dir, name)
+        os.makedirs(scale_dir, exist_ok=True)
+        csv_path, db_path = os.path.join(scale_dir, 'orders.csv'), os.path.join(scale_dir, 'ecommerce.db')
+
+        timer = Timer()
+        bench_build(timer, rows, csv_path, db_path, args.reuse)
+        report = bench_analysis(timer, db_path, os.path.join(scale_dir, 'analytics_report.pkl'))
+        bench_api(timer, db_path, args.repeat)
+        if not args.skip_render:
+            bench_render(timer, report, scale_dir)
+        if not args.keep_csv and os.path.exists(csv_path):
+            os.remove(csv_path)
+        results['scales'][name] = {'rows': rows, 'stages': timer.stages}
+
+    out = args.json or os.path.join(args.work_dir, f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"💾 Results saved to {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            return report_comparison(json.load(f), results, args.threshold)
+    return 0
+
+
+def compare_results(old, new, threshold=0.1, min_delta=MIN_DELTA):
+    """[(scale, stage, old s, new s, ratio, status)] for stages present in both runs"""
+    rows = []
+    for scale, new_scale in new['scales'].items():
+        old_stages = old['scales'].get(scale, {}).get('stages', {})
+        for stage, entry in new_scale['stages'].items():
+            if stage not in old_stages:
+                continue
+            before, after = old_stages[stage]['seconds'], entry['seconds']
+            ratio = after / before if before else float('inf')
+            if after - before > min_delta and ratio > 1 + threshold:
+                status = 'regression'
+            elif before - after > min_delta and ratio < 1 / (1 + threshold):
+                status = 'improvement'
+            else:
+                status = 'same'
+            rows.append((scale, stage, before, after, ratio, status))
+    return rows
+
+
+def report_comparison(old, new, threshold):
+    rows = compare_results(old, new, threshold)
+    marks = {'regression': '❌', 'improvement': '✅', 'same': '  '}
+    print(f"\nComparing {old['meta'].get('commit')} -> {new['meta'].get('commit')} "
+          f"(threshold {threshold:.0%}, changes under {MIN_DELTA * 1000:.0f} ms ignored)")
+    print(f"   {'scale':6} {'stage':70} {'before (ms)':>12} {'after (ms)':>12} {'ratio':>7}")
+    for scale, stage, before, after, ratio, status in rows:
+        print(f"{marks[status]} {scale:6} {stage:70} {before * 1000:>12.1f} {after * 1000:>12.1f} {ratio:>6.2f}x")
+    regressions = sum(status == 'regression' for *_, status in rows)
+    print(f"\n{regressions} regression(s) in {len(rows)} comparable stages")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='benchmark every stage at each scale')
+    run_parser.add_argument('--scales', default='10k,1m',
+                            type=lambda value: [parse_scale(v) for v in value.split(',')],
+                            help='comma-separated: 10k, 1m, 10m, 100m or a row count')
+    run_parser.add_argument('--work-dir', default='data/bench')
+    run_parser.add_argument('--json', help='results file (default: <work-dir>/results-<timestamp>.json)')
+    run_parser.add_argument('--repeat', type=int, default=5, help='calls per API endpoint')
+    run_parser.add_argument('--reuse', action='store_true', help='reuse existing databases, skipping generate/load')
+    run_parser.add_argument('--keep-csv', action='store_true', help='keep the generated CSVs')
+    run_parser.add_argument('--skip-render', action='store_true')
+    run_parser.add_argument('--baseline', help='compare against this results file when done')
+    run_parser.add_argument('--threshold', type=float, default=0.1, help='slowdown ratio counted as a regression')
+
+    compare_parser = commands.add_parser('compare', help='diff two results files')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        sys.exit(run(args))
+    with open(args.old) as f, open(args.new) as g:
+        sys.exit(report_comparison(json.load(f), json.load(g), args.threshold))
+
+
+if __name__ == '__main__':
+    main()
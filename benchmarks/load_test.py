@@ -0,0 +1,161 @@
+"""Load test: p50/p99 latency of the Flask server vs the asyncio server
+
+Starts each server in a subprocess against the same database and replays the
+same request mix at a fixed concurrency. The mix imitates many open
+dashboards: most requests are the widgets' URLs for the current "round"
+(every client asks for the same freshly invalidated slice at once, which is
+where single-flight helps), the rest are ad-hoc slices, and a few are slow
+exact top-customer scans. Needs aiohttp for the client and the async server.
+
+    python benchmarks/load_test.py [--db data/ecommerce.db] [--concurrency 64] [--requests 3000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import aiohttp
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    # The current entry point is app.run(debug=True); the reloader/debugger are left out here
+    'flask': [sys.executable, '-c',
+              'import sys, web_dashboard; web_dashboard.app.run(port=int(sys.argv[1]), threaded=True)'],
+    'async': [sys.executable, 'async_server.py', '--port'],
+}
+
+WIDGETS = ['/api/metrics', '/api/monthly-data', '/api/categories', '/api/recent-orders']
+CATEGORIES = ['Electronics', 'Clothing', 'Home & Kitchen', 'Books', 'Sports', 'Beauty']
+
+
+def _random_slice(rng, categories=True):
+    start = f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    query = f"start={start}"
+    if categories and rng.random() < 0.5:
+        query += f"&category={CATEGORIES[rng.randrange(len(CATEGORIES))]}"
+    return query
+
+
+def build_workload(n_requests, concurrency, seed=0):
+    """Deterministic URL list shared by every server under test"""
+    rng = random.Random(seed)
+    urls = []
+    for i in range(n_requests):
+        roll = rng.random()
+        if roll < 0.02:
+            urls.append(f"/api/top-customers?exact=1&{_random_slice(rng, categories=False)}")
+        elif roll < 0.30:
+            urls.append(f"{rng.choice(WIDGETS)}?{_random_slice(rng)}")
+        else:
+            # One round per `concurrency` requests: all clients poll the same new slice
+            day = 1 + (i // concurrency) % 28
+            urls.append(f"{rng.choice(WIDGETS)}?start=2023-06-{day:02d}&granularity=day")
+    return urls
+
+
+async def _run_load(base_url, urls, concurrency):
+    latencies = np.zeros(len(urls))
+    statuses = {}
+    queue = iter(enumerate(urls))
+
+    async def client(session):
+        for i, url in queue:
+            start = time.perf_counter()
+            async with session.get(base_url + url) as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            latencies[i] = time.perf_counter() - start
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+
+async def _server_stats(base_url):
+    """Single-flight/backpressure counters of the async server (None for Flask)"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(base_url + '/_async/stats') as response:
+            return await response.json() if response.status == 200 else None
+
+
+def _wait_ready(base_url, process, timeout=30):
+    async def ping():
+        async with aiohttp.ClientSession() as session:
+            async with session.get(base_url + '/api/cache-stats') as response:
+                return response.status
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if asyncio.run(ping()) == 200:
+                return
+        except aiohttp.ClientError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+def run_server_test(name, port, db_path, urls, concurrency):
+    env = {**os.environ, 'ECOMMERCE_DB': os.path.abspath(db_path)}
+    process = subprocess.Popen(SERVERS[name] + [str(port)], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base_url, process)
+        latencies, statuses, elapsed = asyncio.run(_run_load(base_url, urls, concurrency))
+        server_stats = asyncio.run(_server_stats(base_url))
+    finally:
+        process.terminate()
+        process.wait()
+    ms = latencies * 1000
+    return {
+        'server': name,
+        'requests': len(urls),
+        'concurrency': concurrency,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p90_ms': float(np.percentile(ms, 90)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+        'requests_per_sec': len(urls) / elapsed,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'server_stats': server_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='data/ecommerce.db')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--servers', default='flask,async')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    urls = build_workload(args.requests, args.concurrency)
+    results = [run_server_test(name, args.port + i, args.db, urls, args.concurrency)
+               for i, name in enumerate(args.servers.split(','))]
+
+    print(f"{'server':8} {'p50 (ms)':>9} {'p90 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9} {'req/s':>8}  statuses")
+    for r in results:
+        print(f"{r['server']:8} {r['p50_ms']:>9.1f} {r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+              f"{r['max_ms']:>9.1f} {r['requests_per_sec']:>8.0f}  {r['statuses']}")
+        if r['server_stats']:
+            print(f"{'':8} coalesced {r['server_stats']['coalesced']}, rejected {r['server_stats']['rejected']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
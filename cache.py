@@ -0,0 +1,110 @@
+"""Result cache for the dashboard JSON endpoints
+
+Entries are keyed on endpoint + query parameters and tagged with the
+data_version that produced them. An entry is served only while it is younger
+than the TTL and the database is still at that version, so an ingest
+invalidates every cached response at once. Responses carry an ETag and
+Last-Modified header so polling browsers get 304s.
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response, request
+
+import db
+
+
+# Response headers that are part of a cached result (e.g. pagination links)
+CACHED_HEADERS = ('Link',)
+
+
+class ResultCache:
+    """Thread-safe, size-bounded LRU with a TTL and data-version invalidation"""
+
+    def __init__(self, maxsize=256, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, version):
+        """Return the cached value for key at this data version, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, stored_at, value = entry
+                if entry_version == version and now - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.invalidations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+api_cache = ResultCache()
+
+
+def cached_json(view):
+    """Cache a JSON view's response body and answer conditional requests with 304"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version, last_modified = db.get_data_version(db.get_connection())
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+
+        cached = api_cache.get(key, version)
+        if cached is None:
+            response = view(*args, **kwargs)
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            etag = f"{version}-{hashlib.sha1(body).hexdigest()[:16]}"
+            headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+            cached = (body, etag, headers)
+            api_cache.put(key, version, cached)
+
+        body, etag, headers = cached
+        response = Response(body, mimetype='application/json', headers=headers)
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = datetime.fromtimestamp(int(last_modified), tz=timezone.utc)
+        # Let browsers keep the body but revalidate on every poll
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return wrapper
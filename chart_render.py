@@ -0,0 +1,319 @@
+"""Parallel, incremental rendering of the phase 3 dashboard
+
+The dashboard is a title band over six independent panels. Each panel is
+drawn on its own figure with the Agg backend in a process pool, and its
+raster is cached in data/panel_cache/ under a hash of the panel's input data
+and drawing code. After an ingest usually only the monthly panels change, so a
+re-run redraws those and pastes the cached rasters of the others into the
+final PNG. The vector PDF is drawn by another worker at the same time as the
+PNG is assembled, and both are skipped when no panel changed.
+
+    from chart_render import panel_data, render_dashboard
+    render_dashboard(panel_data(report), 'data/ecommerce_dashboard.png', 'data/ecommerce_dashboard.pdf')
+"""
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')  # workers never open a window
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+import instrumentation
+
+CACHE_DIR = 'data/panel_cache'
+MANIFEST = 'manifest.json'
+
+STYLE = 'seaborn-v0_8'
+TITLE = 'E-commerce Business Intelligence Dashboard'
+FIGSIZE = (20, 15)  # inches, whole dashboard
+GRID = (2, 3)  # rows, columns
+TITLE_BAND = 0.07  # share of the height above the panels, as subplots_adjust(top=0.93)
+DPI = 300
+
+
+def draw_monthly_revenue(ax, monthly):
+    ax.plot(monthly['month'], monthly['monthly_revenue'],
+            marker='o', linewidth=2, markersize=6, color='#2E86AB')
+    ax.set_title('Monthly Revenue Trend', fontsize=14, fontweight='bold')
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Revenue ($)')
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(True, alpha=0.3)
+
+    # Value labels on every other point to avoid clutter
+    for i, (month, revenue) in enumerate(zip(monthly['month'], monthly['monthly_revenue'])):
+        if i % 2 == 0:
+            ax.annotate(f'${revenue:,.0f}', (month, revenue),
+                        textcoords="offset points", xytext=(0, 10), ha='center', fontsize=8)
+
+
+def draw_categories(ax, categories):
+    colors = plt.cm.Set3(np.linspace(0, 1, len(categories)))
+    wedges, texts, autotexts = ax.pie(categories['revenue'], labels=categories['category'],
+                                      autopct='%1.1f%%', colors=colors, startangle=90)
+    ax.set_title('Revenue by Category', fontsize=14, fontweight='bold')
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+
+
+def draw_top_customers(ax, customers):
+    bars = ax.barh(customers['customer_id'], customers['total_spent'], color='#A23B72', alpha=0.7)
+    ax.set_title('Top 15 Customers by Spending', fontsize=14, fontweight='bold')
+    ax.set_xlabel('Total Spent ($)')
+    for bar, value in zip(bars, customers['total_spent']):
+        ax.text(bar.get_width() + 100, bar.get_y() + bar.get_height() / 2,
+                f'${value:,.0f}', ha='left', va='center', fontsize=9)
+
+
+def draw_top_products(ax, products):
+    y_pos = np.arange(len(products))
+    bars = ax.barh(y_pos, products['revenue'], color='#F18F01', alpha=0.7)
+    ax.set_title('Top 10 Products by Revenue', fontsize=14, fontweight='bold')
+    ax.set_xlabel('Revenue ($)')
+    ax.set_yticks(y_pos, products['product_name'])
+    for bar, value in zip(bars, products['revenue']):
+        ax.text(bar.get_width() + 100, bar.get_y() + bar.get_height() / 2,
+                f'${value:,.0f}', ha='left', va='center', fontsize=9)
+
+
+def draw_monthly_orders(ax, monthly):
+    bars = ax.bar(monthly['month'], monthly['order_count'], color='#C73E1D', alpha=0.7)
+    ax.set_title('Monthly Order Volume', fontsize=14, fontweight='bold')
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Number of Orders')
+    ax.tick_params(axis='x', labelrotation=45)
+    for bar, value in zip(bars, monthly['order_count']):
+        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 2,
+                f'{value}', ha='center', va='bottom', fontsize=9)
+
+
+def draw_summary(ax, summary):
+    ax.axis('off')
+    text = f"""
+📊 BUSINESS SUMMARY
+
+Total Revenue: ${summary['total_revenue']:,.2f}
+Total Orders: {summary['total_orders']:,}
+Avg Order Value: ${summary['avg_order_value']:.2f}
+
+🏆 Best Performing:
+Month: {summary['best_month']}
+Revenue: ${summary['best_month_revenue']:,.2f}
+
+Category: {summary['best_category']}
+Revenue: ${summary['best_category_revenue']:,.2f}
+
+📈 Key Insights:
+- {summary['categories']} product categories
+- {summary['customers']} active customers
+- {summary['months']} months of data
+"""
+    ax.text(0.1, 0.9, text, transform=ax.transAxes, fontsize=12,
+            verticalalignment='top', fontfamily='monospace', linespacing=1.5)
+
+
+# Grid order, row by row
+PANELS = {
+    'monthly_revenue': draw_monthly_revenue,
+    'categories': draw_categories,
+    'top_customers': draw_top_customers,
+    'top_products': draw_top_products,
+    'monthly_orders': draw_monthly_orders,
+    'summary': draw_summary,
+}
+
+
+def panel_data(report):
+    """Each panel's input, taken from the shared analytics report"""
+    monthly = report['monthly_sales']
+    categories = report['category_performance'][['category', 'revenue', 'order_count']]
+    customers = (report['customer_stats'].head(15)
+                 .rename(columns={'frequency': 'order_count', 'monetary': 'total_spent'})
+                 [['customer_id', 'order_count', 'total_spent']])
+    products = (report['product_performance'].head(10)
+                .rename(columns={'total_quantity': 'units_sold'})
+                [['product_name', 'revenue', 'units_sold']])
+
+    total_revenue = float(monthly['monthly_revenue'].sum())
+    total_orders = int(monthly['order_count'].sum())
+    best_month = monthly.loc[monthly['monthly_revenue'].idxmax()]
+    return {
+        'monthly_revenue': monthly[['month', 'monthly_revenue']],
+        'categories': categories,
+        'top_customers': customers,
+        'top_products': products,
+        'monthly_orders': monthly[['month', 'order_count']],
+        'summary': {
+            'total_revenue': total_revenue,
+            'total_orders': total_orders,
+            'avg_order_value': total_revenue / total_orders,
+            'best_month': best_month['month'],
+            'best_month_revenue': float(best_month['monthly_revenue']),
+            'best_category': categories.iloc[0]['category'],
+            'best_category_revenue': float(categories.iloc[0]['revenue']),
+            'categories': len(categories),
+            'customers': len(customers),
+            'months': int(monthly['month'].nunique()),
+        },
+    }
+
+
+def panel_key(name, data, dpi=DPI):
+    """Hash of what a panel looks like: its data, its drawing code, the style and the dpi"""
+    h = hashlib.sha256(f"{name}|{dpi}|{STYLE}|{FIGSIZE}|{GRID}|{TITLE_BAND}".encode())
+    h.update(inspect.getsource(PANELS[name] if name in PANELS else _draw_title).encode())
+    if isinstance(data, pd.DataFrame):
+        h.update(json.dumps([str(c) for c in data.columns]).encode())
+        h.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    else:
+        h.update(json.dumps(data, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:20]
+
+
+def layout(dpi=DPI):
+    """Pixel geometry: (canvas width, canvas height, title band height, panel width, panel height)"""
+    rows, columns = GRID
+    width, height = round(FIGSIZE[0] * dpi), round(FIGSIZE[1] * dpi)
+    band = round(height * TITLE_BAND)
+    panel_width, panel_height = width // columns, (height - band) // rows
+    return panel_width * columns, band + panel_height * rows, band, panel_width, panel_height
+
+
+def _draw_title(ax, title):
+    ax.axis('off')
+    ax.text(0.5, 0.5, title, transform=ax.transAxes, ha='center', va='center',
+            fontsize=20, fontweight='bold')
+
+
+def _save_atomic(fig, path, **kwargs):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fig.savefig(tmp, format=os.path.splitext(path)[1][1:], **kwargs)
+    os.replace(tmp, path)
+
+
+def render_panel(name, data, path, dpi=DPI):
+    """Draw one panel alone at its final pixel size and save it to path (worker entry point)"""
+    width, _, band, panel_width, panel_height = layout(dpi)
+    if name == 'title':
+        draw, size = _draw_title, (width, band)
+    else:
+        draw, size = PANELS[name], (panel_width, panel_height)
+    with plt.style.context(STYLE):
+        fig = plt.figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+        draw(fig.add_subplot(), data)
+        if name != 'title':
+            fig.tight_layout()
+        _save_atomic(fig, path, dpi=dpi)
+        plt.close(fig)
+    return path
+
+
+def render_pdf(panels, path):
+    """The whole dashboard as one vector figure, laid out like the original (worker entry point)"""
+    with plt.style.context(STYLE):
+        fig = plt.figure(figsize=FIGSIZE)
+        fig.suptitle(TITLE, fontsize=20, fontweight='bold')
+        for i, (name, draw) in enumerate(PANELS.items(), start=1):
+            draw(fig.add_subplot(*GRID, i), panels[name])
+        fig.tight_layout()
+        fig.subplots_adjust(top=1 - TITLE_BAND)
+        _save_atomic(fig, path, bbox_inches='tight')
+        plt.close(fig)
+    return path
+
+
+def assemble_png(tiles, path, dpi=DPI):
+    """Paste the title band and panel rasters into the final image"""
+    width, height, band, panel_width, panel_height = layout(dpi)
+    canvas = Image.new('RGB', (width, height), 'white')
+    with Image.open(tiles['title']) as title:
+        canvas.paste(title.convert('RGB'), (0, 0))
+    columns = GRID[1]
+    for i, name in enumerate(PANELS):
+        with Image.open(tiles[name]) as tile:
+            canvas.paste(tile.convert('RGB'), ((i % columns) * panel_width, band + (i // columns) * panel_height))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    canvas.save(tmp, format='PNG', dpi=(dpi, dpi))
+    os.replace(tmp, path)
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+@instrumentation.stage('render.dashboard')
+def render_dashboard(panels, png_path, pdf_path=None, cache_dir=CACHE_DIR, workers=None, dpi=DPI):
+    """Render the dashboard PNG (and PDF), redrawing only panels whose key changed
+
+    workers is the process pool size (default: one per CPU); 0 renders
+    everything in this process. Returns what was redrawn and the timings.
+    """
+    start = time.perf_counter()
+    os.makedirs(cache_dir, exist_ok=True)
+    inputs = {'title': TITLE, **panels}
+    keys = {name: panel_key(name, data, dpi) for name, data in inputs.items()}
+    tiles = {name: os.path.join(cache_dir, f"{name}-{key}.png") for name, key in keys.items()}
+    stale = [name for name in inputs if not os.path.exists(tiles[name])]
+
+    dashboard_key = hashlib.sha256(json.dumps(keys, sort_keys=True).encode()).hexdigest()[:20]
+    manifest = _read_manifest(cache_dir)
+    outputs = {'png': png_path, 'pdf': pdf_path}
+    redo = {kind: path for kind, path in outputs.items()
+            if path and not (manifest.get(kind) == [dashboard_key, path] and os.path.exists(path))}
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Forked workers start with matplotlib already imported
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    pool = ProcessPoolExecutor(workers, context) if workers and (stale or 'pdf' in redo) else None
+    try:
+        def submit(fn, *args):
+            if pool is None:
+                fn(*args)
+                return None
+            return pool.submit(fn, *args)
+
+        # Panels first so the PNG can be assembled while the PDF is still drawing
+        jobs = [submit(render_panel, name, inputs[name], tiles[name], dpi) for name in stale]
+        pdf_job = submit(render_pdf, panels, pdf_path) if 'pdf' in redo else None
+        for job in jobs:
+            if job is not None:
+                job.result()
+        if 'png' in redo:
+            assemble_png(tiles, png_path, dpi)
+        if pdf_job is not None:
+            pdf_job.result()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    manifest.update({kind: [dashboard_key, path] for kind, path in redo.items()})
+    with open(os.path.join(cache_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    _prune(cache_dir, set(tiles.values()))
+    return {
+        'redrawn': [name for name in stale if name != 'title'],
+        'reused': [name for name in panels if name not in stale],
+        'written': sorted(redo.values()),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def _prune(cache_dir, keep):
+    """Drop panel rasters of superseded data so the cache stays one dashboard's worth"""
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.png') and entry.path not in keep:
+            os.remove(entry.path)
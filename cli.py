@@ -0,0 +1,85 @@
+"""One entry point for the whole pipeline
+
+    python cli.py generate --rows 1000000     # phase1_data_collection.py
+    python cli.py load data/ecommerce_data.csv  # create_database.py
+    python cli.py ingest new_orders.csv        # ingest.py
+    python cli.py analyze                      # phase2_sql_analysis.py
+    python cli.py render [--html]              # phase3_dashboard.py (+ export_beautiful.py)
+    python cli.py serve [--async] [--port N]   # web_dashboard.py / async_server.py
+    python cli.py summary                      # project_summary.py
+
+Arguments after the subcommand go to that script's own parser. Nothing is
+imported until a subcommand is chosen, and each one imports only its own
+module, so `summary` or `ingest` from cron never pays for pandas or
+matplotlib. benchmarks/bench_import_time.py tracks the cost per subcommand.
+"""
+import importlib
+import sys
+
+# subcommand -> (module, entry point, help)
+COMMANDS = {
+    'generate': ('phase1_data_collection', 'main', 'generate synthetic order CSVs'),
+    'load': ('create_database', 'main', 'load order CSVs into a fresh SQLite database'),
+    'ingest': ('ingest', 'main', 'append new order batches to the database'),
+    'analyze': ('phase2_sql_analysis', 'main', 'print the business analysis and save its CSVs'),
+    'render': ('phase3_dashboard', 'main', 'draw the dashboard PNG/PDF (--html also writes the static page)'),
+    'serve': ('web_dashboard', None, 'serve the dashboard API (--async for the asyncio server)'),
+    'summary': ('project_summary', 'generate_project_summary', 'print the project summary'),
+}
+
+
+def usage():
+    lines = [__doc__.splitlines()[0], '', 'usage: python cli.py <command> [args]', '', 'commands:']
+    lines += [f"  {name:10} {help_}" for name, (_, _, help_) in COMMANDS.items()]
+    return '\n'.join(lines)
+
+
+def _pop_flag(argv, flag):
+    if flag in argv:
+        argv.remove(flag)
+        return True
+    return False
+
+
+def serve(argv):
+    """Flask's development server, or async_server with --async (which has its own options)"""
+    if _pop_flag(argv, '--async'):
+        sys.argv = ['cli.py serve --async', *argv]
+        importlib.import_module('async_server').main()
+        return
+    import argparse
+    parser = argparse.ArgumentParser(prog='cli.py serve', description='Serve the dashboard API with Flask')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--debug', action='store_true')
+    args = parser.parse_args(argv)
+    from web_dashboard import app
+    print(f"📊 Access your dashboard at: http://localhost:{args.port}")
+    app.run(debug=args.debug, host=args.host, port=args.port, threaded=True)
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0
+    command, argv = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"unknown command {command!r}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    if command == 'serve':
+        serve(argv)
+        return 0
+    html = command == 'render' and _pop_flag(argv, '--html')
+
+    module, entry, _ = COMMANDS[command]
+    sys.argv = [f"cli.py {command}", *argv]  # the script's own argparse reads these
+    getattr(importlib.import_module(module), entry)()
+    if html:
+        importlib.import_module('export_beautiful').export_beautiful_dashboard()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""Optional columnar storage backend: date-partitioned Parquet with predicate pushdown
+
+Orders are exported from SQLite into a hive-partitioned Parquet dataset
+(data/orders_parquet/order_month=YYYYMM/...). Queries read only the columns
+they aggregate and only the month partitions that match their filter, so a
+category-revenue or monthly-trend query touches 2-3 columns instead of every
+row. Requires pyarrow (pip install pyarrow).
+
+    python columnar_store.py export [--db data/ecommerce.db] [--out data/orders_parquet]
+    python columnar_store.py report [--start 2023-07-01] [--end 2023-09-30] [--category Electronics]
+"""
+import argparse
+import datetime
+import time
+
+import numpy as np
+
+import instrumentation
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:  # optional dependency
+    pa = None
+
+DATASET_PATH = 'data/orders_parquet'
+
+FACT_COLUMNS_SQL = """
+    SELECT order_id, customer_key, product_key, category_key, order_day, order_month,
+           unit_price, quantity, total_amount
+    FROM order_facts
+"""
+
+FACT_DTYPE = np.dtype([
+    ('order_id', np.int64),
+    ('customer_key', np.int64),
+    ('product_key', np.int64),
+    ('category_key', np.int64),
+    ('order_day', np.int32),
+    ('order_month', np.int32),
+    ('unit_price', np.float64),
+    ('quantity', np.int16),
+    ('total_amount', np.float64),
+])
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("the columnar backend needs pyarrow: pip install pyarrow")
+
+
+def orders_schema():
+    _require_pyarrow()
+    return pa.schema([
+        ('order_id', pa.int64()),
+        ('customer_id', pa.dictionary(pa.int32(), pa.string())),
+        ('product_name', pa.dictionary(pa.int32(), pa.string())),
+        ('category', pa.dictionary(pa.int32(), pa.string())),
+        ('order_date', pa.date32()),
+        ('unit_price', pa.float64()),
+        ('quantity', pa.int16()),
+        ('total_amount', pa.float64()),
+        ('order_month', pa.int32()),
+    ])
+
+
+def _dictionary_lookup(conn, sql):
+    """Return (key -> dictionary index array, dictionary values) for a dimension table"""
+    rows = conn.execute(sql).fetchall()
+    keys = np.array([key for key, _ in rows], dtype=np.int64)
+    positions = np.full(int(keys.max()) + 1 if len(keys) else 1, -1, dtype=np.int32)
+    positions[keys] = np.arange(len(keys), dtype=np.int32)
+    return positions, pa.array([value for _, value in rows], type=pa.string())
+
+
+def _fact_batches(conn, chunk_size):
+    customers = _dictionary_lookup(conn, "SELECT customer_key, customer_id FROM customers")
+    products = _dictionary_lookup(conn, "SELECT product_key, product_name FROM products")
+    categories = _dictionary_lookup(conn, "SELECT category_key, category FROM categories")
+    schema = orders_schema()
+
+    def encode(keys, lookup):
+        positions, dictionary = lookup
+        return pa.DictionaryArray.from_arrays(pa.array(positions[keys]), dictionary)
+
+    cursor = conn.execute(FACT_COLUMNS_SQL)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        facts = np.fromiter(rows, dtype=FACT_DTYPE, count=len(rows))
+        yield pa.record_batch([
+            pa.array(facts['order_id']),
+            encode(facts['customer_key'], customers),
+            encode(facts['product_key'], products),
+            encode(facts['category_key'], categories),
+            pa.array(facts['order_day'], type=pa.int32()).cast(pa.date32()),
+            pa.array(facts['unit_price']),
+            pa.array(facts['quantity']),
+            pa.array(facts['total_amount']),
+            pa.array(facts['order_month']),
+        ], schema=schema)
+
+
+def export_parquet(db_path='data/ecommerce.db', out_dir=DATASET_PATH, chunk_size=1_000_000):
+    """Write order_facts as a month-partitioned Parquet dataset; returns rows written"""
+    _require_pyarrow()
+    # write_dataset pulls batches from its own thread; the connection is only used there
+    conn = instrumentation.connect(db_path, check_same_thread=False)
+    rows = 0
+    try:
+        def counted(batches):
+            nonlocal rows
+            for batch in batches:
+                rows += batch.num_rows
+                yield batch
+
+        ds.write_dataset(
+            counted(_fact_batches(conn, chunk_size)),
+            out_dir,
+            schema=orders_schema(),
+            format='parquet',
+            partitioning=ds.partitioning(pa.schema([('order_month', pa.int32())]), flavor='hive'),
+            existing_data_behavior='delete_matching',
+            max_rows_per_group=1_000_000,
+        )
+    finally:
+        conn.close()
+    return rows
+
+
+def open_dataset(path=DATASET_PATH):
+    _require_pyarrow()
+    return ds.dataset(path, format='parquet', partitioning='hive')
+
+
+def _month_key(date):
+    return date.year * 100 + date.month
+
+
+def build_filter(start=None, end=None, category=None):
+    """Partition filter on order_month plus row-level filters on order_date/category
+
+    The order_month terms prune whole partition directories; the order_date
+    terms are checked against Parquet row-group statistics before decoding.
+    """
+    _require_pyarrow()
+    expression = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if start is not None:
+        start = datetime.date.fromisoformat(str(start))
+        expression = both(expression, ds.field('order_month') >= _month_key(start))
+        expression = both(expression, ds.field('order_date') >= pa.scalar(start, pa.date32()))
+    if end is not None:
+        end = datetime.date.fromisoformat(str(end))
+        expression = both(expression, ds.field('order_month') <= _month_key(end))
+        expression = both(expression, ds.field('order_date') <= pa.scalar(end, pa.date32()))
+    if category is not None:
+        expression = both(expression, ds.field('category') == category)
+    return expression
+
+
+def aggregate(columns, keys, aggregations, path=DATASET_PATH, **filters):
+    """Stream the needed columns batch by batch, grouping partials and merging them
+
+    aggregations is a list of (column, 'sum'|'count'); memory stays bounded by
+    the number of groups, not the number of rows.
+    """
+    dataset = open_dataset(path)
+    scanner = dataset.scanner(columns=columns, filter=build_filter(**filters))
+    partials = []
+    for batch in scanner.to_batches():
+        if batch.num_rows == 0:
+            continue
+        table = pa.Table.from_batches([batch])
+        for key in keys:
+            if pa.types.is_dictionary(table.schema.field(key).type):
+                table = table.set_column(table.schema.get_field_index(key), key,
+                                         table[key].cast(pa.string()))
+        partials.append(table.group_by(keys).aggregate(aggregations))
+    if not partials:
+        return []
+
+    # Partial counts and sums are both merged by summing
+    merged = pa.concat_tables(partials)
+    names = [f"{column}_{function}" for column, function in aggregations]
+    result = merged.group_by(keys).aggregate([(name, 'sum') for name in names])
+    return [{**{key: row[key] for key in keys}, **{name: row[f"{name}_sum"] for name in names}}
+            for row in result.to_pylist()]
+
+
+def monthly_data(path=DATASET_PATH, granularity='month', **filters):
+    """Revenue/orders per month (or day/week), in the /api/monthly-data shape"""
+    if granularity == 'month':
+        rows = aggregate(['order_month', 'total_amount'], ['order_month'],
+                         [('total_amount', 'sum'), ('total_amount', 'count')], path, **filters)
+        return [{'month': f"{row['order_month'] // 100}-{row['order_month'] % 100:02d}",
+                 'revenue': row['total_amount_sum'],
+                 'orders': row['total_amount_count']}
+                for row in sorted(rows, key=lambda row: row['order_month'])]
+
+    rows = aggregate(['order_date', 'total_amount'], ['order_date'],
+                     [('total_amount', 'sum'), ('total_amount', 'count')], path, **filters)
+    buckets = {}
+    for row in rows:
+        label = row['order_date'].strftime('%Y-%m-%d' if granularity == 'day' else '%Y-%W')
+        revenue, orders = buckets.get(label, (0.0, 0))
+        buckets[label] = (revenue + row['total_amount_sum'], orders + row['total_amount_count'])
+    return [{granularity: label, 'revenue': revenue, 'orders': orders}
+            for label, (revenue, orders) in sorted(buckets.items())]
+
+
+def categories(path=DATASET_PATH, **filters):
+    """Revenue/orders per category, in the /api/categories shape"""
+    rows = aggregate(['category', 'total_amount'], ['category'],
+                     [('total_amount', 'sum'), ('total_amount', 'count')], path, **filters)
+    return sorted(({'category': row['category'],
+                    'order_count': row['total_amount_count'],
+                    'revenue': row['total_amount_sum']} for row in rows),
+                  key=lambda row: row['revenue'], reverse=True)
+
+
+def metrics(path=DATASET_PATH, **filters):
+    """Totals and unique customers, reading only total_amount and customer_id"""
+    dataset = open_dataset(path)
+    scanner = dataset.scanner(columns=['customer_id', 'total_amount'], filter=build_filter(**filters))
+    total_orders = 0
+    total_revenue = 0.0
+    customers = set()
+    for batch in scanner.to_batches():
+        total_orders += batch.num_rows
+        total_revenue += pc.sum(batch.column('total_amount')).as_py() or 0.0
+        customers.update(pc.unique(batch.column('customer_id').cast(pa.string())).to_pylist())
+    return {
+        'total_orders': total_orders,
+        'total_revenue': total_revenue,
+        'avg_order_value': total_revenue / total_orders if total_orders else None,
+        'unique_customers': len(customers),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parquet columnar backend for order analytics')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help='write order_facts as partitioned Parquet')
+    export.add_argument('--db', default='data/ecommerce.db')
+    export.add_argument('--out', default=DATASET_PATH)
+    report = sub.add_parser('report', help='run the category/monthly aggregates against Parquet')
+    report.add_argument('--path', default=DATASET_PATH)
+    report.add_argument('--start')
+    report.add_argument('--end')
+    report.add_argument('--category')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print("🧱 Exporting orders to partitioned Parquet...")
+        start = time.perf_counter()
+        rows = export_parquet(args.db, args.out)
+        print(f"✅ Wrote {rows:,} orders to {args.out} in {time.perf_counter() - start:.2f}s")
+        return
+
+    filters = {'start': args.start, 'end': args.end, 'category': args.category}
+    start = time.perf_counter()
+    overview = metrics(args.path, **filters)
+    print("📈 Business Overview:")
+    print(f"   Total Orders: {overview['total_orders']:,}")
+    print(f"   Total Revenue: ${overview['total_revenue']:,.2f}")
+    print(f"   Unique Customers: {overview['unique_customers']:,}")
+    print("📅 Monthly Performance:")
+    for row in monthly_data(args.path, **filters):
+        print(f"   {row['month']}: ${row['revenue']:,.2f} ({row['orders']} orders)")
+    print("🏷️ Category Analysis:")
+    for row in categories(args.path, **filters):
+        print(f"   {row['category']:15} ${row['revenue']:>14,.2f} ({row['order_count']:>7} orders)")
+    print(f"⚡ Queried in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Shared read-only SQLite connections for the dashboard API
+
+Each thread keeps one long-lived connection, so requests skip connection
+setup and reuse a warm page cache / mmap. Connections are opened read-only
+(mode=ro + query_only) and are dropped in forked children, so a WSGI server
+that forks workers after import never shares a SQLite handle across processes.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+
+import instrumentation
+
+DB_PATH = os.environ.get('ECOMMERCE_DB', 'data/ecommerce.db')
+
+READ_PRAGMAS = [
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",  # 256 MB memory-mapped reads
+    "PRAGMA cache_size = -65536",  # 64 MB page cache per connection
+    "PRAGMA temp_store = MEMORY",
+]
+
+_local = threading.local()
+_lock = threading.Lock()
+_open_connections = set()
+
+
+def connect_readonly(db_path=None):
+    """Open a new read-only connection with the serving PRAGMAs applied"""
+    db_path = db_path or DB_PATH
+    uri = f"file:{os.path.abspath(db_path)}?mode=ro"
+    conn = instrumentation.connect(uri, uri=True)
+    for pragma in READ_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(db_path=None):
+    """Return this thread's shared read-only connection, opening it on first use"""
+    db_path = db_path or DB_PATH
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = connect_readonly(db_path)
+        with _lock:
+            _open_connections.add(conn)
+    return conn
+
+
+def get_data_version(conn):
+    """Return (data_version, last_modified unix time) as recorded by the loaders"""
+    try:
+        meta = dict(conn.execute(
+            "SELECT key, value FROM metadata WHERE key IN ('data_version', 'last_modified')"
+        ))
+    except sqlite3.OperationalError:
+        # Database built before the metadata table existed
+        return 0, None
+    return meta.get('data_version', 0), meta.get('last_modified')
+
+
+def close_connection(db_path=None):
+    """Close this thread's connection (e.g. after an error left it in a bad state)"""
+    connections = getattr(_local, 'connections', {})
+    conn = connections.pop(db_path or DB_PATH, None)
+    if conn is not None:
+        with _lock:
+            _open_connections.discard(conn)
+        conn.close()
+
+
+def close_all():
+    """Close every connection opened by this process"""
+    with _lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            # Owned by another thread; it is released with that thread
+            pass
+
+
+def _reset_after_fork():
+    # The child must not touch handles inherited from the parent: forget them
+    # without closing, and open fresh connections on first use.
+    global _local, _lock, _open_connections
+    _local = threading.local()
+    _lock = threading.Lock()
+    _open_connections = set()
+
+
+def init_app(app):
+    """Register connection teardown on a Flask app"""
+    @app.teardown_appcontext
+    def _teardown_connection(exception):
+        if exception is not None:
+            close_connection()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(close_all)
@@ -0,0 +1,497 @@
+"""Growth rates and short-range forecasts of daily revenue and orders
+
+Each process keeps, per database and per category (or all orders), a dense
+NumPy series of daily revenue and order counts read from rollup_daily /
+rollup_category_day. The series is kept in step with the database
+incrementally: when data_version changes, only the days touched by ingest
+batches logged since the last sync are re-read. An RFM rescore, which bumps
+data_version without adding orders, re-reads nothing.
+
+Growth compares a date range with the equally long range just before it.
+Both sums come from prefix sums of the series, so a request costs two array
+lookups however long the range is.
+
+Forecasts use additive Holt-Winters (level, trend and a weekly season). The
+smoothing parameters are chosen by a grid search that runs every
+combination at once as NumPy vectors. The fit is cached with the series and
+only covers complete days: the latest day is treated as still filling up.
+When an ingest only adds days after the fitted ones, the cached model is
+advanced over them with its parameters kept; a change to an older day
+refits. A seasonal naive model (the same weekday last week) is scored
+alongside, and whichever has the lower one-step error makes the forecast.
+
+    python forecast.py [--db data/ecommerce.db] [--category Books] [--horizon 30]
+"""
+import argparse
+import datetime
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import db
+import instrumentation
+import sketches
+import snapshot
+
+SEASON = 7  # days; weekly seasonality
+GROWTH_WINDOW_DAYS = 30  # growth period when a request does not give a start
+DEFAULT_HORIZON = 30
+MAX_HORIZON = 365
+
+# Holt-Winters smoothing parameters tried by the grid search (level, trend, season)
+ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5)
+BETAS = (0.0, 0.01, 0.05, 0.1)
+GAMMAS = (0.05, 0.1, 0.2, 0.3)
+
+SERIES_SQL = {
+    'all': "SELECT order_day, revenue, order_count FROM rollup_daily WHERE order_day BETWEEN ? AND ?",
+    'category': """
+        SELECT order_day, revenue, order_count FROM rollup_category_day
+        WHERE category_key = (SELECT category_key FROM categories WHERE category = ?)
+          AND order_day BETWEEN ? AND ?
+    """,
+}
+
+# First and last order_day of the orders in every batch logged after a given one
+CHANGED_DAYS_SQL = """
+    SELECT MIN(o.order_day), MAX(o.order_day)
+    FROM ingest_batches b JOIN order_facts o ON o.order_id BETWEEN b.first_order_id AND b.last_order_id
+    WHERE b.batch_id > ?
+"""
+
+ALL_DAYS = (-(1 << 62), 1 << 62)
+
+NO_GROWTH = {'revenue': None, 'orders': None, 'aov': None, 'period': None, 'previous_period': None}
+
+
+def prefix_sums(values):
+    """Cumulative sums with a leading 0: sum(values[i:j]) == sums[j] - sums[i]"""
+    sums = np.zeros(len(values) + 1, dtype=np.result_type(values.dtype, np.int64))
+    np.cumsum(values, out=sums[1:])
+    return sums
+
+
+def rolling_sum(values, window):
+    """Sum of each trailing window of values (shorter at the start), vectorized"""
+    sums = prefix_sums(values)
+    ends = np.arange(1, len(values) + 1)
+    return sums[ends] - sums[np.maximum(ends - window, 0)]
+
+
+def window_growth(values, window):
+    """Percent change of each trailing window's sum over the window before it (nan when undefined)"""
+    current = rolling_sum(values, window).astype(np.float64)
+    previous = np.full(len(values), np.nan)
+    previous[window:] = current[:-window]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (current / previous - 1) * 100
+    growth[~(previous > 0)] = np.nan
+    return growth
+
+
+def percent_change(current, previous):
+    """Rounded percent change, or None when there is nothing to compare with"""
+    if not previous:
+        return None
+    return round((float(current) / float(previous) - 1) * 100, 1)
+
+
+def _smooth(values, start, alpha, beta, gamma, level, trend, season):
+    """Run the additive Holt-Winters recursion over values[start:] for every parameter set at once
+
+    level, trend and the (sets, SEASON) season array are updated in place;
+    returns the sum of squared one-step errors for each set.
+    """
+    sse = np.zeros(len(alpha))
+    for t in range(start, len(values)):
+        y = values[t]
+        phase = t % SEASON
+        seasonal = season[:, phase].copy()
+        previous = level.copy()
+        error = y - (previous + trend + seasonal)
+        sse += error * error
+        level[:] = alpha * (y - seasonal) + (1 - alpha) * (previous + trend)
+        trend[:] = beta * (level - previous) + (1 - beta) * trend
+        season[:, phase] = gamma * (y - level) + (1 - gamma) * seasonal
+    return sse
+
+
+class DailyModel:
+    """A fitted forecast of one daily series, advanced in place as complete days arrive"""
+
+    def __init__(self, values):
+        self.fitted_through = 0  # values[:fitted_through] are in the fit
+        self.params = None  # (alpha, beta, gamma) once there are two full seasons
+        self.sse = self.naive_sse = 0.0
+        self.count = 0
+        self._fit(values)
+
+    @instrumentation.stage('analysis.fit_forecast')
+    def _fit(self, values):
+        n = len(values)
+        self.fitted_through = n
+        if n < 2 * SEASON:
+            return
+        # Initial level, trend and season from the first two weeks
+        first, second = values[:SEASON], values[SEASON:2 * SEASON]
+        alpha, beta, gamma = (grid.ravel() for grid in np.meshgrid(ALPHAS, BETAS, GAMMAS, indexing='ij'))
+        level = np.full(len(alpha), second.mean())
+        trend = np.full(len(alpha), (second.mean() - first.mean()) / SEASON)
+        initial = ((first - first.mean()) + (second - second.mean())) / 2
+        season = np.tile(initial, (len(alpha), 1))
+        sse = _smooth(values, 2 * SEASON, alpha, beta, gamma, level, trend, season)
+
+        best = int(np.argmin(sse))
+        self.params = (float(alpha[best]), float(beta[best]), float(gamma[best]))
+        self.level, self.trend, self.season = level[best:best + 1], trend[best:best + 1], season[best:best + 1]
+        self.sse = float(sse[best])
+        self.naive_sse = float(np.sum((values[2 * SEASON:] - values[SEASON:-SEASON]) ** 2))
+        self.count = n - 2 * SEASON
+
+    def advance(self, values):
+        """Add values[fitted_through:] (the days completed since) to the fit, keeping its parameters"""
+        start, n = self.fitted_through, len(values)
+        if n <= start:
+            return
+        if self.params is None:
+            self._fit(values)
+            return
+        alpha, beta, gamma = (np.array([p]) for p in self.params)
+        self.sse += float(_smooth(values, start, alpha, beta, gamma, self.level, self.trend, self.season)[0])
+        self.naive_sse += float(np.sum((values[start:] - values[start - SEASON:n - SEASON]) ** 2))
+        self.count += n - start
+        self.fitted_through = n
+
+    @property
+    def method(self):
+        if self.params is not None and self.sse <= self.naive_sse:
+            return 'holt_winters'
+        return 'seasonal_naive' if self.fitted_through >= SEASON else 'mean'
+
+    @property
+    def rmse(self):
+        if not self.count:
+            return None
+        sse = self.sse if self.method == 'holt_winters' else self.naive_sse
+        return float(np.sqrt(sse / self.count))
+
+    def forecast(self, values, horizon):
+        """The next horizon days after values[:fitted_through], as a float array (never negative)"""
+        n = self.fitted_through
+        steps = np.arange(1, horizon + 1)
+        method = self.method
+        if method == 'holt_winters':
+            predicted = self.level[0] + steps * self.trend[0] + self.season[0, (n + steps - 1) % SEASON]
+        elif method == 'seasonal_naive':
+            predicted = values[n - SEASON + (steps - 1) % SEASON].astype(np.float64)
+        else:
+            predicted = np.full(horizon, values[:n].mean() if n else 0.0)
+        return np.maximum(predicted, 0.0)
+
+
+class DailySeries:
+    """Dense daily revenue and order counts from first_day on, with cached prefix sums and models"""
+
+    METRICS = ('revenue', 'orders')
+
+    def __init__(self, rows):
+        days = np.array([row[0] for row in rows], dtype=np.int64)
+        self.first_day = int(days.min()) if len(days) else 0
+        size = int(days.max()) - self.first_day + 1 if len(days) else 0
+        self.values = {'revenue': np.zeros(size, dtype=np.float64), 'orders': np.zeros(size, dtype=np.int64)}
+        self._assign(rows)
+        self._sums = None
+        self._models = {}
+
+    def __len__(self):
+        return len(self.values['orders'])
+
+    @property
+    def last_day(self):
+        return self.first_day + len(self) - 1
+
+    def _assign(self, rows):
+        if not rows:
+            return
+        positions = np.array([row[0] for row in rows], dtype=np.int64) - self.first_day
+        self.values['revenue'][positions] = [row[1] for row in rows]
+        self.values['orders'][positions] = [row[2] for row in rows]
+
+    def replace_days(self, first, last, rows):
+        """Overwrite first..last with rows (the rollups' totals for those days)
+
+        The series grows only up to the last day in rows, so it still ends at
+        its own last order. Returns False when the series is empty or first is
+        before it starts; the caller then rebuilds the series.
+        """
+        if not len(self) or first < self.first_day:
+            return False
+        size = max([len(self)] + [row[0] - self.first_day + 1 for row in rows])
+        for name, values in self.values.items():
+            if size > len(values):
+                values = self.values[name] = np.concatenate([values, np.zeros(size - len(values), values.dtype)])
+            values[first - self.first_day:last - self.first_day + 1] = 0
+        self._assign(rows)
+        self._sums = None
+        complete = len(self) - 1
+        for name, model in list(self._models.items()):
+            if first - self.first_day < model.fitted_through:
+                del self._models[name]  # history changed; refit on the next forecast
+            else:
+                model.advance(self.values[name][:complete])
+        return True
+
+    def total(self, start_day, end_day):
+        """{metric: sum over start_day..end_day (inclusive; clipped to the series)}"""
+        if self._sums is None:
+            self._sums = {name: prefix_sums(values) for name, values in self.values.items()}
+        lo = min(max(start_day - self.first_day, 0), len(self))
+        hi = min(max(end_day - self.first_day + 1, lo), len(self))
+        return {name: sums[hi] - sums[lo] for name, sums in self._sums.items()}
+
+    def growth(self, start_day=None, end_day=None):
+        """Growth of start_day..end_day over the equally long period before it
+
+        end_day defaults to the last day with orders and start_day to
+        GROWTH_WINDOW_DAYS before it. An empty range (start after end) has
+        no growth.
+        """
+        if end_day is None and not len(self):
+            return dict(NO_GROWTH)
+        end_day = self.last_day if end_day is None else end_day
+        start_day = end_day - GROWTH_WINDOW_DAYS + 1 if start_day is None else start_day
+        if start_day > end_day:  # e.g. a start after the last order with no end given
+            return dict(NO_GROWTH)
+        length = end_day - start_day + 1
+        current = self.total(start_day, end_day)
+        previous = self.total(start_day - length, start_day - 1)
+        aov = current['revenue'] / current['orders'] if current['orders'] else 0.0
+        previous_aov = previous['revenue'] / previous['orders'] if previous['orders'] else 0.0
+        return {
+            'revenue': percent_change(current['revenue'], previous['revenue']),
+            'orders': percent_change(current['orders'], previous['orders']),
+            'aov': percent_change(aov, previous_aov),
+            'period': [start_day, end_day],
+            'previous_period': [start_day - length, start_day - 1],
+        }
+
+    def model(self, name):
+        """The cached model of a metric over the complete days (all but the last), fitting it if needed"""
+        model = self._models.get(name)
+        if model is None:
+            model = self._models[name] = DailyModel(self.values[name][:len(self) - 1])
+        return model
+
+    def forecast(self, horizon=DEFAULT_HORIZON, history=4 * SEASON):
+        """{metric: forecast of the horizon days after the last complete day, plus model details}
+
+        'recent' holds the last history complete days with each day's
+        week-over-week growth of the trailing 7-day sums.
+        """
+        complete = len(self) - 1
+        if complete <= 0:
+            horizon = 0  # no complete day to forecast from
+        result = {'recent': {}}
+        for name in self.METRICS:
+            values = self.values[name][:complete]
+            result['recent'][name] = values[-history:].copy()  # the series is updated in place
+            result['recent'][f"{name}_growth_7d"] = window_growth(values, SEASON)[-history:]
+            model = self.model(name)
+            result[name] = {
+                'values': model.forecast(self.values[name], horizon),
+                'method': model.method,
+                'params': model.params,
+                'rmse': model.rmse,
+            }
+        # The last complete day; the forecast starts the day after it
+        result['history_end'] = self.first_day + complete - 1 if complete > 0 else None
+        return result
+
+
+class GrowthEngine:
+    """Per-database cache of DailySeries, synced with the database incrementally"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}  # None (all orders) or category name -> DailySeries
+        self._version = None
+        self._batches = None  # snapshot.orders_version() at the last sync
+
+    def growth(self, conn, start_day=None, end_day=None, category=None):
+        with self._lock:
+            return self._current(conn, category).growth(start_day, end_day)
+
+    def forecast(self, conn, horizon=DEFAULT_HORIZON, category=None):
+        with self._lock:
+            return self._current(conn, category).forecast(horizon)
+
+    def _current(self, conn, category):
+        """The up-to-date DailySeries of one category (None: all orders); call with the lock held"""
+        self._sync(conn)
+        series = self._series.get(category)
+        if series is None:
+            series = self._series[category] = DailySeries(_read_days(conn, category, *ALL_DAYS))
+        return series
+
+    def _sync(self, conn):
+        # A reload restarts data_version, so last_modified is part of the key
+        version = db.get_data_version(conn)
+        if version == self._version:
+            return
+        began = not conn.in_transaction
+        if began:
+            conn.execute("BEGIN")  # one read transaction: the batches match the rollups read
+        try:
+            batches = snapshot.orders_version(conn)
+            changed = self._changed_days(conn, batches)
+            if changed is None:
+                self._series.clear()
+            elif changed:
+                for category, series in list(self._series.items()):
+                    if not series.replace_days(*changed, _read_days(conn, category, *changed)):
+                        del self._series[category]
+            self._version, self._batches = version, batches
+        finally:
+            if began:
+                conn.execute("COMMIT")
+
+    def _changed_days(self, conn, batches):
+        """(first, last) order_day touched since the last sync, () if none, or None to reread everything"""
+        if self._batches is None or batches is None or batches[0] < self._batches[0]:
+            return None
+        if batches == self._batches:
+            return ()
+        # A reload restarts batch ids, so the last batch seen must still be the same one
+        row = conn.execute("SELECT loaded_at FROM ingest_batches WHERE batch_id = ?",
+                           (self._batches[0],)).fetchone()
+        if row is None or row[0] != self._batches[1]:
+            return None
+        first, last = conn.execute(CHANGED_DAYS_SQL, (self._batches[0],)).fetchone()
+        return () if first is None else (first, last)
+
+
+def _read_days(conn, category, first, last):
+    if category is None:
+        return conn.execute(SERIES_SQL['all'], (first, last)).fetchall()
+    return conn.execute(SERIES_SQL['category'], (category, first, last)).fetchall()
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def engine(db_path=None):
+    """This process's GrowthEngine for a database"""
+    db_path = db_path or db.DB_PATH
+    with _engines_lock:
+        return _engines.setdefault(db_path, GrowthEngine())
+
+
+def growth_rates(conn, start_day=None, end_day=None, category=None, db_path=None):
+    """Revenue, order and average order value growth (percent) of a period over the one before it
+
+    The periods come back as [first, last] ISO dates (None without orders or for an empty range).
+    """
+    growth = engine(db_path).growth(conn, start_day, end_day, category)
+    for name in ('period', 'previous_period'):
+        if growth[name] is not None:
+            growth[name] = [str(day_date(day)) for day in growth[name]]
+    return growth
+
+
+def forecast(conn, horizon=DEFAULT_HORIZON, category=None, db_path=None):
+    """Daily revenue and order forecasts for the horizon days after the last complete day"""
+    return engine(db_path).forecast(conn, horizon, category)
+
+
+def day_date(day):
+    """Days since 1970-01-01 -> datetime.date (the inverse of sketches.day_number)"""
+    return sketches.EPOCH + datetime.timedelta(days=int(day))
+
+
+def _dates(first_day, count):
+    return np.arange(first_day, first_day + count).astype('datetime64[D]').astype(str).tolist()
+
+
+def _rounded(values, digits=2):
+    """Floats for JSON, with nan (undefined growth) as None"""
+    return [None if value != value else value for value in np.round(values, digits).tolist()]
+
+
+def to_json(result):
+    """A forecast() result as JSON-ready lists with ISO dates"""
+    history_end = result['history_end']
+    recent = result['recent']
+    if history_end is None:
+        dates = recent_dates = []
+    else:
+        dates = _dates(history_end + 1, len(result['revenue']['values']))
+        recent_dates = _dates(history_end - len(recent['orders']) + 1, len(recent['orders']))
+    return {
+        'history_end': None if history_end is None else str(day_date(history_end)),
+        'dates': dates,
+        **{name: {
+            'values': _rounded(result[name]['values']),
+            'method': result[name]['method'],
+            'params': result[name]['params'],
+            'rmse': None if result[name]['rmse'] is None else round(result[name]['rmse'], 2),
+        } for name in DailySeries.METRICS},
+        'recent': {
+            'dates': recent_dates,
+            **{name: _rounded(values, 1 if name.endswith('_7d') else 2) for name, values in recent.items()},
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print growth rates and a daily forecast')
+    parser.add_argument('--db', default=None)
+    parser.add_argument('--category', default=None)
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON)
+    args = parser.parse_args()
+
+    conn = db.connect_readonly(args.db)
+    try:
+        start = time.perf_counter()
+        growth = growth_rates(conn, category=args.category, db_path=args.db)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        result = forecast(conn, args.horizon, args.category, args.db)
+        fit = time.perf_counter() - start
+        start = time.perf_counter()
+        growth_rates(conn, category=args.category, db_path=args.db)
+        forecast(conn, args.horizon, args.category, args.db)
+        cached = time.perf_counter() - start
+    except sqlite3.OperationalError as e:
+        print(f"❌ {e}; load the database first: python create_database.py")
+        return
+    finally:
+        conn.close()
+
+    if growth['period'] is None:
+        print(f"📈 {args.category or 'All orders'}: no orders to compare")
+    else:
+        (first, last), (previous_first, previous_last) = growth['period'], growth['previous_period']
+        print(f"📈 {args.category or 'All orders'}: {first} to {last} vs {previous_first} to {previous_last}")
+    for name in ('revenue', 'orders', 'aov'):
+        value = growth[name]
+        print(f"   {name:8} {'n/a' if value is None else f'{value:+.1f}%'}")
+
+    history_end = result['history_end']
+    if history_end is None:
+        print("🔮 No complete days to forecast from")
+        return
+    print(f"🔮 Next {args.horizon} days after {day_date(history_end)}:")
+    for name in DailySeries.METRICS:
+        entry = result[name]
+        params = ', '.join(f"{p:g}" for p in entry['params']) if entry['params'] else '-'
+        rmse = 'n/a' if entry['rmse'] is None else f"{entry['rmse']:,.1f}"
+        print(f"   {name:8} {entry['values'].sum():>14,.1f} total  ({entry['method']}, "
+              f"alpha/beta/gamma {params}, one-step RMSE {rmse})")
+    print(f"⏱️  first call {cold * 1000:.1f}ms, fit {fit * 1000:.1f}ms, cached growth + forecast {cached * 1000:.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+"""Query and pipeline instrumentation, exported in the Prometheus text format
+
+Connections opened through connect() (db.py and the loaders use it) time
+every statement from execute() through its last fetch, count the rows it
+returned and the SQLite VM instructions it ran (a proxy for rows scanned,
+sampled every PROGRESS_STEPS instructions by a progress handler), and record
+the EXPLAIN QUERY PLAN of each distinct statement once. Statements are keyed
+by a fingerprint of their normalized SQL, so the label set stays bounded.
+stage() times pipeline steps, init_app() adds per-route request histograms to
+a Flask app, and render() produces the /metrics page.
+
+The per-statement cost is a few perf_counter() calls and one dict lookup, and
+the plan is only explained the first time a statement is seen.
+
+Environment:
+    ECOMMERCE_INSTRUMENT=0          plain sqlite3 connections, nothing recorded
+    ECOMMERCE_SLOW_QUERY_MS=50      log statements slower than this (with plan)
+    ECOMMERCE_SLOW_QUERY_LOG=path   ... to this file instead of stderr
+    ECOMMERCE_PROFILE=1             print a query/stage table when a script exits
+"""
+import atexit
+import bisect
+import contextlib
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+ENABLED = os.environ.get('ECOMMERCE_INSTRUMENT', '1') != '0'
+SLOW_QUERY_MS = float(os.environ['ECOMMERCE_SLOW_QUERY_MS']) if os.environ.get('ECOMMERCE_SLOW_QUERY_MS') else None
+PROGRESS_STEPS = 1000  # VM instructions per progress-handler tick
+_MAX_TICKS = 2 ** 62
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MAX_SQL_LABEL = 200
+
+slow_query_log = None
+if SLOW_QUERY_MS is not None:
+    import logging  # only when asked for: cron commands import this module on startup
+    slow_query_log = logging.getLogger('ecommerce.slow_queries')
+    if os.environ.get('ECOMMERCE_SLOW_QUERY_LOG'):
+        _handler = logging.FileHandler(os.environ['ECOMMERCE_SLOW_QUERY_LOG'])
+        _handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_log.addHandler(_handler)
+        slow_query_log.propagate = False
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help_, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_, labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is one bisect and a few adds under a lock"""
+
+    def __init__(self, name, help_, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_, labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """{labels: (sum, count)}"""
+        with self._lock:
+            return {labels: (series[1], series[2]) for labels, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total, count) for labels, (counts, total, count)
+                            in self._series.items())
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+QUERY_SECONDS = Histogram('ecommerce_query_duration_seconds',
+                          'SQLite statement time, execute() through the last fetch', ('query',))
+QUERY_ROWS = Counter('ecommerce_query_rows_returned_total', 'Rows returned (or changed) by statements', ('query',))
+QUERY_VM_STEPS = Counter('ecommerce_query_vm_steps_total',
+                         f'SQLite VM instructions run, sampled every {PROGRESS_STEPS} (a proxy for rows scanned)',
+                         ('query',))
+STAGE_SECONDS = Histogram('ecommerce_stage_duration_seconds', 'Pipeline stage time', ('stage',))
+HTTP_SECONDS = Histogram('ecommerce_http_request_duration_seconds',
+                         'Request time until the response is returned (streamed bodies excluded)',
+                         ('method', 'route', 'status'))
+METRICS = [HTTP_SECONDS, QUERY_SECONDS, QUERY_ROWS, QUERY_VM_STEPS, STAGE_SECONDS]
+
+
+class QueryInfo:
+    __slots__ = ('fingerprint', 'sql', 'plan', 'explainable')
+
+    def __init__(self, fingerprint, sql):
+        self.fingerprint, self.sql, self.plan = fingerprint, sql, None
+        self.explainable = sql.split(' ', 1)[0].upper() in ('SELECT', 'WITH')
+
+
+_queries = {}  # raw SQL text -> QueryInfo (statements are few, most are module constants)
+_queries_lock = threading.Lock()
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def query_info(sql):
+    info = _queries.get(sql)
+    if info is None:
+        normalized = _IN_LISTS.sub('(?, ...)', _LITERALS.sub('?', ' '.join(sql.split())))
+        fingerprint = f"{zlib.crc32(normalized.encode('utf-8')):08x}"
+        with _queries_lock:
+            if len(_queries) > 4096:  # ad-hoc SQL with inlined values; keep the table bounded
+                _queries.clear()
+            info = _queries.setdefault(sql, QueryInfo(fingerprint, normalized))
+    return info
+
+
+def _explain(conn, sql, parameters):
+    try:
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+    except sqlite3.Error:
+        return 'unavailable'
+    return '; '.join(' '.join(str(row[-1]).split()) for row in rows) or 'constant'
+
+
+class Cursor(sqlite3.Cursor):
+    """sqlite3 cursor that reports each statement when it is exhausted, replaced or dropped"""
+
+    _info = None
+
+    def _start(self, sql, parameters):
+        self._finish()
+        self._info = query_info(sql)
+        self._sql, self._parameters = sql, parameters
+        self._elapsed = 0.0
+        self._rows = 0
+        self._ticks = self.connection.vm_ticks
+
+    def _finish(self):
+        info = self._info
+        if info is None:
+            return
+        self._info = None
+        QUERY_SECONDS.observe(self._elapsed, info.fingerprint)
+        rows = self._rows if self._rows else max(self.rowcount, 0)
+        if rows:
+            QUERY_ROWS.inc(rows, info.fingerprint)
+        steps = self.connection.vm_ticks - self._ticks
+        if steps:
+            QUERY_VM_STEPS.inc(steps * PROGRESS_STEPS, info.fingerprint)
+        if info.plan is None and info.explainable:
+            info.plan = _explain(self.connection, self._sql, self._parameters)
+        if SLOW_QUERY_MS is not None and self._elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_query_log.warning("slow query %s: %.1f ms, %d rows, ~%d VM steps, plan: %s | %s | params=%r",
+                                   info.fingerprint, self._elapsed * 1000, rows, steps * PROGRESS_STEPS,
+                                   info.plan, info.sql[:MAX_SQL_LABEL], self._parameters)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, ())
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._elapsed += time.perf_counter() - start
+            self._finish()
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - start
+            self._finish()
+            raise
+        self._elapsed += time.perf_counter() - start
+        self._rows += 1
+        return row
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - start
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._elapsed += time.perf_counter() - start
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - start
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except (sqlite3.Error, AttributeError):
+            pass  # connection already closed
+
+
+class Connection(sqlite3.Connection):
+    """sqlite3 connection whose statements are recorded by Cursor"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # A C-level counter as the progress handler: each tick consumes one 0
+        # (falsy, so never interrupts) without calling back into Python code
+        self._vm_counter = itertools.repeat(0, _MAX_TICKS)
+        self.set_progress_handler(self._vm_counter.__next__, PROGRESS_STEPS)
+
+    @property
+    def vm_ticks(self):
+        return _MAX_TICKS - self._vm_counter.__length_hint__()
+
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute does not go through an overridden cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect(database, **kwargs):
+    """sqlite3.connect() with instrumentation (unless ECOMMERCE_INSTRUMENT=0)"""
+    if ENABLED:
+        kwargs.setdefault('factory', Connection)
+    return sqlite3.connect(database, **kwargs)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a pipeline step (usable as a decorator too)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, name)
+
+
+def init_app(app):
+    """Record a request-duration histogram per route of a Flask app"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.instrumentation_start = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        start = g.pop('instrumentation_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+            HTTP_SECONDS.observe(time.perf_counter() - start, request.method, route, str(response.status_code))
+        return response
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines += ["# HELP ecommerce_query_info Normalized SQL and query plan of each statement fingerprint",
+              "# TYPE ecommerce_query_info gauge"]
+    with _queries_lock:
+        infos = {info.fingerprint: info for info in _queries.values()}
+    for fingerprint, info in sorted(infos.items()):
+        lines.append(f"ecommerce_query_info{_labels(('query', 'sql', 'plan'), (fingerprint, info.sql[:MAX_SQL_LABEL], info.plan or ''))} 1")
+    return '\n'.join(lines) + '\n'
+
+
+def profile_report(limit=15):
+    """Plain-text table of the slowest statements and stages so far"""
+    with _queries_lock:
+        infos = {info.fingerprint: info for info in _queries.values()}
+    queries = sorted(QUERY_SECONDS.snapshot().items(), key=lambda item: -item[1][0])[:limit]
+    lines = [f"{'total ms':>10} {'calls':>6} {'rows':>10}  query / plan"]
+    for (fingerprint,), (total, count) in queries:
+        info = infos.get(fingerprint)
+        rows = QUERY_ROWS._values.get((fingerprint,), 0)
+        lines.append(f"{total * 1000:>10.1f} {count:>6} {rows:>10}  {info.sql[:100] if info else fingerprint}")
+        if info and info.plan:
+            lines.append(f"{'':30}{info.plan[:100]}")
+    stages = sorted(STAGE_SECONDS.snapshot().items(), key=lambda item: -item[1][0])
+    if stages:
+        lines.append(f"\n{'total ms':>10} {'calls':>6}  stage")
+        lines += [f"{total * 1000:>10.1f} {count:>6}  {name}" for (name,), (total, count) in stages]
+    return '\n'.join(lines)
+
+
+if os.environ.get('ECOMMERCE_PROFILE') == '1':
+    atexit.register(lambda: print("\n⏱️  Profile\n" + profile_report(), file=sys.stderr))
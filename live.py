@@ -0,0 +1,210 @@
+"""Live metrics pushed to dashboards over Server-Sent Events
+
+One publisher thread per server process watches the database for commits
+(PRAGMA data_version, which costs no table reads). When an ingest lands, it
+computes the new totals and the changed months once from the rollups, encodes
+the delta event once, and hands the same bytes to every subscriber. A
+connected dashboard therefore costs one queue put per event, however many are
+open, instead of re-running every /api/* aggregate on each poll.
+
+Subscribers that fall too far behind are dropped; the browser's EventSource
+reconnects and starts again from a fresh snapshot.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import db
+import sketches
+from query import dumps
+
+POLL_INTERVAL = 1.0  # seconds between data_version checks
+HEARTBEAT_INTERVAL = 15.0  # seconds between keep-alive comments on idle streams
+QUEUE_SIZE = 64  # undelivered events before a slow subscriber is dropped
+
+HEARTBEAT = b": keepalive\n\n"
+
+
+def format_event(event, data, event_id=None):
+    """Encode one SSE message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    return ("\n".join(lines) + "\n").encode('utf-8') + b"data: " + dumps(data) + b"\n\n"
+
+
+def read_snapshot(conn):
+    """Current totals and per-month figures, all from the rollups"""
+    version, last_modified = db.get_data_version(conn)
+    orders, revenue = conn.execute(
+        "SELECT COALESCE(SUM(order_count), 0), COALESCE(SUM(revenue), 0.0) FROM rollup_monthly"
+    ).fetchone()
+    months = {f"{month // 100}-{month % 100:02d}": [round(revenue_, 2), count]
+              for month, revenue_, count in conn.execute(
+                  "SELECT order_month, revenue, order_count FROM rollup_monthly ORDER BY order_month")}
+    return {
+        'version': version,
+        'last_modified': last_modified,
+        'total_orders': orders,
+        'total_revenue': round(revenue, 2),
+        'avg_order_value': round(revenue / orders, 2) if orders else 0.0,
+        'unique_customers': sketches.unique_count(conn)['value'],
+        'months': months,
+    }
+
+
+def diff_snapshots(old, new):
+    """What changed between two snapshots: new totals, their deltas and the touched months"""
+    return {
+        'version': new['version'],
+        'total_orders': new['total_orders'],
+        'total_revenue': new['total_revenue'],
+        'avg_order_value': new['avg_order_value'],
+        'unique_customers': new['unique_customers'],
+        'delta': {
+            'orders': new['total_orders'] - old['total_orders'],
+            'revenue': round(new['total_revenue'] - old['total_revenue'], 2),
+            'unique_customers': new['unique_customers'] - old['unique_customers'],
+        },
+        'months': {month: values for month, values in new['months'].items()
+                   if old['months'].get(month) != values},
+    }
+
+
+class Subscription:
+    """A subscriber's bounded event queue, consumed by a blocking (WSGI) stream"""
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize)
+        self.dropped = False
+
+    def deliver(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped = True
+
+    def get(self, timeout=HEARTBEAT_INTERVAL):
+        """Next message, or None after timeout seconds without one"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class MetricsHub:
+    """Watches the database and broadcasts snapshot deltas to every subscriber"""
+
+    def __init__(self, db_path=None, poll_interval=POLL_INTERVAL):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.snapshot_event = None
+        self.events_published = 0
+        self._thread = None
+
+    def start(self):
+        with self.lock:
+            if self._thread is None:
+                conn = db.connect_readonly(self.db_path)
+                try:
+                    self._publish_snapshot(read_snapshot(conn))
+                finally:
+                    conn.close()
+                self._thread = threading.Thread(target=self._run, name='live-metrics', daemon=True)
+                self._thread.start()
+        return self
+
+    def subscribe(self, deliver):
+        """Register deliver(message_bytes); returns the current snapshot event to send first"""
+        self.start()
+        with self.lock:
+            self.subscribers.add(deliver)
+            return self.snapshot_event
+
+    def unsubscribe(self, deliver):
+        with self.lock:
+            self.subscribers.discard(deliver)
+
+    def stats(self):
+        with self.lock:
+            return {'subscribers': len(self.subscribers), 'events_published': self.events_published,
+                    'version': self.snapshot and self.snapshot['version']}
+
+    def _publish_snapshot(self, snapshot):
+        self.snapshot = snapshot
+        self.snapshot_event = format_event('snapshot', snapshot, snapshot['version'])
+
+    def _run(self):
+        # The first tick always re-reads, catching commits made since start()
+        conn, seen = None, None
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                if conn is None:
+                    conn = db.connect_readonly(self.db_path)
+                current = conn.execute("PRAGMA data_version").fetchone()[0]
+                if current == seen:
+                    continue
+                seen = current
+                snapshot = read_snapshot(conn)
+            except sqlite3.Error:
+                # e.g. the database is being rebuilt; reconnect on the next tick
+                if conn is not None:
+                    conn.close()
+                conn, seen = None, None
+                continue
+            if snapshot['version'] == self.snapshot['version']:
+                continue
+
+            # Computed and encoded once, whatever the number of subscribers
+            message = format_event('delta', diff_snapshots(self.snapshot, snapshot), snapshot['version'])
+            with self.lock:
+                self._publish_snapshot(snapshot)
+                self.events_published += 1
+                subscribers = list(self.subscribers)
+            for deliver in subscribers:
+                deliver(message)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """This process's hub, created (and its thread started) on first use"""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = MetricsHub()
+        return _hub
+
+
+def _reset_after_fork():
+    # The publisher thread does not survive a fork; children start their own
+    global _hub, _hub_lock
+    _hub = None
+    _hub_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def stream_events(hub=None):
+    """Generator of SSE bytes for one blocking (WSGI) client"""
+    hub = hub or get_hub()
+    subscription = Subscription()
+    snapshot = hub.subscribe(subscription.deliver)
+    try:
+        yield snapshot
+        while not subscription.dropped:
+            message = subscription.get()
+            yield HEARTBEAT if message is None else message
+    finally:
+        hub.unsubscribe(subscription.deliver)
@@ -1,21 +1,8 @@
-import pandas as pd
+import argparse
 import numpy as np
-from datetime import datetime, timedelta
 import os
-import sqlite3
-
-print("📊 Starting Phase 1: Data Collection & Database Setup...")
-
-# Create data folder if it doesn't exist
-os.makedirs('data', exist_ok=True)
-
-# Generate sample data
-np.random.seed(42)
-num_orders = 2000
-
-# Date range
-start_date = datetime(2023, 1, 1)
-date_range = [start_date + timedelta(days=x) for x in range(365)]
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 # Product data
 products = [
@@ -31,31 +18,149 @@ products = [
     ('Face Cream', 'Beauty', 19.99)
 ]
 
-# Generate orders
-data = []
-for order_id in range(1, num_orders + 1):
-    customer_id = f"CUST_{np.random.randint(1, 101):03d}"
-    order_date = np.random.choice(date_range)
-    product_name, category, base_price = products[np.random.randint(0, len(products))]
-    
-    quantity = np.random.randint(1, 4)
-    unit_price = round(base_price * np.random.uniform(0.8, 1.2), 2)
-    total_amount = round(unit_price * quantity, 2)
-    
-    data.append({
-        'order_id': order_id,
-        'customer_id': customer_id,
-        'product_name': product_name,
-        'category': category,
-        'order_date': order_date.strftime('%Y-%m-%d'),
-        'unit_price': unit_price,
-        'quantity': quantity,
-        'total_amount': total_amount
-    })
-
-# Create DataFrame and save
-df = pd.DataFrame(data)
-df.to_csv('data/ecommerce_data.csv', index=False)
-print("✅ Sample data generated and saved to data/ecommerce_data.csv")
-print(f"📊 Generated {len(df)} orders")
-print(df.head(3))
\ No newline at end of file
+# Date range
+START_DATE = np.datetime64('2023-01-01')
+NUM_DAYS = 365
+NUM_CUSTOMERS = 100
+
+CSV_HEADER = 'order_id,customer_id,product_name,category,order_date,unit_price,quantity,total_amount\n'
+
+# Lookup tables so each CSV chunk is assembled from small, pre-formatted strings
+PRODUCT_COLUMNS = np.array([f'{name},{category}' for name, category, _ in products])
+PRODUCT_PRICE_CENTS = np.array([round(price * 100) for _, _, price in products], dtype=np.int64)
+CUSTOMER_IDS = np.array([f'CUST_{i:03d}' for i in range(NUM_CUSTOMERS + 1)])
+DATE_STRINGS = np.datetime_as_string(START_DATE + np.arange(NUM_DAYS), unit='D')
+CENT_STRINGS = np.array([f'{i:02d}' for i in range(100)])
+
+
+def generate_order_chunks(num_orders, chunk_size=1_000_000, seed=42, start_order_id=1):
+    """Yield orders as dicts of NumPy column arrays, at most chunk_size rows each
+
+    Money is generated in integer cents so total = unit price * quantity is exact.
+    """
+    if chunk_size < 1:  # the loop below would never advance
+        raise ValueError(f"chunk_size must be at least 1, not {chunk_size}")
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    first = start_order_id
+    end = start_order_id + num_orders
+
+    while first < end:
+        n = min(chunk_size, end - first)
+
+        product_idx = rng.integers(0, len(products), n)
+        quantity = rng.integers(1, 4, n)
+        unit_price_cents = np.rint(PRODUCT_PRICE_CENTS[product_idx] * rng.uniform(0.8, 1.2, n)).astype(np.int64)
+
+        yield {
+            'order_id': np.arange(first, first + n),
+            'customer_num': rng.integers(1, NUM_CUSTOMERS + 1, n),
+            'product_idx': product_idx,
+            'order_date': START_DATE + rng.integers(0, NUM_DAYS, n),
+            'unit_price_cents': unit_price_cents,
+            'quantity': quantity,
+            'total_cents': unit_price_cents * quantity,
+        }
+        first += n
+
+
+def format_chunk_csv(chunk):
+    """Render one column chunk as CSV text (no header)"""
+    unit_price = chunk['unit_price_cents']
+    total = chunk['total_cents']
+    columns = [
+        chunk['order_id'].tolist(),
+        CUSTOMER_IDS[chunk['customer_num']].tolist(),
+        PRODUCT_COLUMNS[chunk['product_idx']].tolist(),
+        DATE_STRINGS[(chunk['order_date'] - START_DATE).astype(np.int64)].tolist(),
+        (unit_price // 100).tolist(),
+        CENT_STRINGS[unit_price % 100].tolist(),
+        chunk['quantity'].tolist(),
+        (total // 100).tolist(),
+        CENT_STRINGS[total % 100].tolist(),
+    ]
+    # Product and category names never contain commas, so no quoting needed
+    return '\n'.join(map('{},{},{},{},{}.{},{},{}.{}'.format, *columns)) + '\n'
+
+
+def write_orders_csv(path, num_orders, chunk_size=1_000_000, seed=42, start_order_id=1, header=True):
+    """Stream generated orders to a CSV file one chunk at a time; returns rows written"""
+    rows = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if header:
+            f.write(CSV_HEADER)
+        for chunk in generate_order_chunks(num_orders, chunk_size, seed, start_order_id):
+            f.write(format_chunk_csv(chunk))
+            rows += len(chunk['order_id'])
+    return rows
+
+
+def _write_shard(task):
+    path, rows, chunk_size, seed_seq, start_order_id = task
+    return write_orders_csv(path, rows, chunk_size, np.random.default_rng(seed_seq), start_order_id)
+
+
+def write_orders_sharded(output_dir, num_orders, shard_rows=10_000_000, chunk_size=1_000_000, seed=42, workers=None):
+    """Generate orders as fixed-size shard files across a process pool; returns shard paths
+
+    Shard boundaries and seeds depend only on num_orders, shard_rows and seed: shard i
+    covers order ids [1 + i * shard_rows, ...] and draws from the i-th SeedSequence
+    child, so the files are identical for any worker count.
+    """
+    if shard_rows < 1:
+        raise ValueError(f"shard_rows must be at least 1, not {shard_rows}")
+    os.makedirs(output_dir, exist_ok=True)
+    num_shards = max(1, -(-num_orders // shard_rows))
+    seed_seqs = np.random.SeedSequence(seed).spawn(num_shards)
+
+    tasks = []
+    for i, seed_seq in enumerate(seed_seqs):
+        first = i * shard_rows
+        rows = min(shard_rows, num_orders - first)
+        path = os.path.join(output_dir, f'orders-{i:05d}.csv')
+        tasks.append((path, rows, min(chunk_size, shard_rows), seed_seq, first + 1))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_write_shard, tasks))
+    return [task[0] for task in tasks]
+
+
+def positive_int(value):
+    """argparse type for row counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, not {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic e-commerce orders')
+    parser.add_argument('--rows', type=int, default=2000, help='number of orders to generate')
+    parser.add_argument('--chunk-size', type=positive_int, default=1_000_000, help='rows generated per batch')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='data/ecommerce_data.csv')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='generate shards in parallel with this many processes (-1 = all cores)')
+    parser.add_argument('--shard-rows', type=positive_int, default=10_000_000, help='rows per shard file in parallel mode')
+    parser.add_argument('--shard-dir', default='data/shards', help='output directory for shard files')
+    args = parser.parse_args()
+
+    print("📊 Starting Phase 1: Data Collection & Database Setup...")
+
+    start = time.perf_counter()
+    if args.workers:
+        workers = None if args.workers < 0 else args.workers
+        shards = write_orders_sharded(args.shard_dir, args.rows, args.shard_rows, args.chunk_size, args.seed, workers)
+        rows = args.rows
+        print(f"✅ Sample data generated and saved as {len(shards)} shards in {args.shard_dir}")
+    else:
+        # Create data folder if it doesn't exist
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        rows = write_orders_csv(args.output, args.rows, args.chunk_size, args.seed)
+        print(f"✅ Sample data generated and saved to {args.output}")
+    elapsed = time.perf_counter() - start
+
+    print(f"📊 Generated {rows:,} orders in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Lightweight query layer for the API: cursor rows straight to JSON
+
+Dashboard results are one to a few dozen rows, so building a DataFrame just to
+call .to_dict('records') costs more than the query itself. These helpers read
+sqlite3 cursor rows directly into dicts and encode them with orjson when it is
+installed (falling back to the standard json module).
+"""
+import csv
+import io
+import json
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def dumps(obj):
+    """Encode obj as compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(obj, status=200):
+    """Flask response with a JSON body, bypassing jsonify's pretty-printing machinery"""
+    return Response(dumps(obj), status=status, mimetype='application/json')
+
+
+def iter_json_array(cursor, batch_size=1000):
+    """Yield a cursor's rows as a JSON array of objects, batch_size rows at a time"""
+    columns = [d[0] for d in cursor.description]
+    yield b'['
+    first = True
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        body = b','.join(dumps(dict(zip(columns, row))) for row in rows)
+        yield body if first else b',' + body
+        first = False
+    yield b']'
+
+
+def iter_ndjson(cursor, batch_size=1000):
+    """Yield a cursor's rows as newline-delimited JSON objects, batch_size rows at a time"""
+    columns = [d[0] for d in cursor.description]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield b''.join(dumps(dict(zip(columns, row))) + b'\n' for row in rows)
+
+
+def iter_csv(cursor, batch_size=1000):
+    """Yield a cursor's rows as CSV (header first), batch_size rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow([d[0] for d in cursor.description])
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        writer.writerows(rows)
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        if not rows:
+            break
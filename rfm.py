@@ -0,0 +1,238 @@
+"""RFM segmentation with quintile scoring over every customer
+
+Recency, frequency and monetary value come straight from rollup_customer, so
+no order rows are scanned. Each measure is scored 1-5 against approximate
+quintile edges (quantiles of a bounded random sample), replacing the fixed
+thresholds the reports used to hard-code. Scores are persisted in
+customer_rfm; an incremental run rescoring only the customers whose orders
+arrived since the last run reuses the stored edges and anchor day.
+
+    python rfm.py              # full rescoring
+    python rfm.py --incremental
+"""
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+
+import db
+import instrumentation
+from create_database import bump_data_version
+
+QUANTILES = (0.2, 0.4, 0.6, 0.8)
+SAMPLE_SIZE = 200_000
+
+SEGMENTS = np.array(['Champions', 'Loyal', 'Potential', 'New', 'Needs Attention',
+                     'At Risk', 'Hibernating'])
+
+RFM_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS customer_rfm (
+        customer_key INTEGER PRIMARY KEY,
+        recency_days INTEGER NOT NULL,
+        frequency INTEGER NOT NULL,
+        monetary REAL NOT NULL,
+        r_score INTEGER NOT NULL,
+        f_score INTEGER NOT NULL,
+        m_score INTEGER NOT NULL,
+        segment TEXT NOT NULL
+    )
+"""
+
+CUSTOMER_DTYPE = np.dtype([
+    ('customer_key', np.int64),
+    ('frequency', np.int64),
+    ('monetary', np.float64),
+    ('last_day', np.int64),
+])
+
+
+def approximate_edges(values, quantiles=QUANTILES, sample_size=SAMPLE_SIZE, seed=0):
+    """Quantile edges estimated from a uniform sample of at most sample_size values"""
+    if len(values) > sample_size:
+        values = np.random.default_rng(seed).choice(values, sample_size, replace=False)
+    if len(values) == 0:
+        return np.zeros(len(quantiles))
+    return np.quantile(values, quantiles)
+
+
+def quintile_scores(values, edges):
+    """Score 1 (lowest quintile) to 5 (highest) against precomputed edges"""
+    return (np.searchsorted(edges, values, side='right') + 1).astype(np.int8)
+
+
+def segment_codes(r_score, f_score, m_score):
+    """Map score triples to indexes into SEGMENTS"""
+    fm = (f_score + m_score) / 2
+    return np.select(
+        [
+            (r_score >= 4) & (fm >= 4),
+            (r_score >= 3) & (fm >= 3),
+            (r_score >= 3) & (fm >= 2),
+            (r_score >= 4),
+            (r_score == 3),
+            (r_score <= 2) & (fm >= 3),
+        ],
+        [0, 1, 2, 3, 4, 5],
+        6,
+    )
+
+
+def score_rfm(recency_days, frequency, monetary, edges=None):
+    """Vectorized RFM scoring; returns (scores dict, edges used)
+
+    Lower recency is better, so it is scored on its negation. Pass the edges
+    from a previous run to score a subset of customers consistently.
+    """
+    if edges is None:
+        edges = {
+            'recency': approximate_edges(-recency_days),
+            'frequency': approximate_edges(frequency),
+            'monetary': approximate_edges(monetary),
+        }
+    r_score = quintile_scores(-recency_days, edges['recency'])
+    f_score = quintile_scores(frequency, edges['frequency'])
+    m_score = quintile_scores(monetary, edges['monetary'])
+    return {
+        'r_score': r_score,
+        'f_score': f_score,
+        'm_score': m_score,
+        'segment': SEGMENTS[segment_codes(r_score, f_score, m_score)],
+    }, edges
+
+
+def _read_customers(conn, customer_keys=None, chunk_size=1_000_000):
+    sql = "SELECT customer_key, order_count, revenue, last_day FROM rollup_customer"
+    if customer_keys is None:
+        return np.fromiter(conn.execute(sql).fetchall(), dtype=CUSTOMER_DTYPE)
+    parts = []
+    keys = iter(customer_keys)
+    while True:
+        batch = list(itertools.islice(keys, 900))  # stay under SQLite's variable limit
+        if not batch:
+            break
+        where = f" WHERE customer_key IN ({', '.join('?' * len(batch))})"
+        parts.append(np.fromiter(conn.execute(sql + where, batch).fetchall(), dtype=CUSTOMER_DTYPE))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=CUSTOMER_DTYPE)
+
+
+def _get_meta(conn, key):
+    row = conn.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT INTO metadata (key, value) VALUES (?, ?) "
+                 "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, value))
+
+
+@instrumentation.stage('rfm.score_customers')
+def score_customers(db_path=None, incremental=False):
+    """Compute and persist RFM scores; returns run statistics
+
+    A full run re-estimates the quintile edges and the recency anchor (the
+    latest order day). An incremental run rescores only customers with orders
+    newer than the last run's highest order_id, against the stored edges.
+    """
+    conn = instrumentation.connect(db_path or db.DB_PATH, isolation_level=None)
+    try:
+        conn.execute(RFM_SCHEMA)
+        max_order_id = conn.execute("SELECT MAX(order_id) FROM order_facts").fetchone()[0] or 0
+        state = _get_meta(conn, 'rfm_state')
+        has_scores = conn.execute("SELECT 1 FROM customer_rfm LIMIT 1").fetchone() is not None
+        incremental = incremental and state is not None and has_scores
+
+        read_start = time.perf_counter()
+        if incremental:
+            state = json.loads(state)
+            touched = [key for (key,) in conn.execute(
+                "SELECT DISTINCT customer_key FROM order_facts WHERE order_id > ?",
+                (state['last_order_id'],))]
+            customers = _read_customers(conn, touched)
+            anchor_day = state['anchor_day']
+            edges = {name: np.array(values) for name, values in state['edges'].items()}
+        else:
+            customers = _read_customers(conn)
+            anchor_day = conn.execute("SELECT MAX(order_day) FROM rollup_daily").fetchone()[0] or 0
+            edges = None
+        read_seconds = time.perf_counter() - read_start
+
+        score_start = time.perf_counter()
+        recency_days = np.maximum(anchor_day - customers['last_day'], 0)
+        scores, edges = score_rfm(recency_days, customers['frequency'], customers['monetary'], edges)
+        score_seconds = time.perf_counter() - score_start
+
+        write_start = time.perf_counter()
+        conn.execute("BEGIN")
+        if not incremental:
+            conn.execute("DELETE FROM customer_rfm")
+        conn.executemany(
+            "INSERT OR REPLACE INTO customer_rfm VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(customers['customer_key'].tolist(), recency_days.tolist(),
+                customers['frequency'].tolist(), customers['monetary'].tolist(),
+                scores['r_score'].tolist(), scores['f_score'].tolist(),
+                scores['m_score'].tolist(), scores['segment'].tolist()))
+        _set_meta(conn, 'rfm_state', json.dumps({
+            'anchor_day': int(anchor_day),
+            'last_order_id': int(max_order_id),
+            'edges': {name: values.tolist() for name, values in edges.items()},
+        }))
+        # Scores are served by the cached API, so a rescoring invalidates it too
+        bump_data_version(conn)
+        conn.execute("COMMIT")
+        write_seconds = time.perf_counter() - write_start
+    finally:
+        conn.close()
+
+    return {
+        'customers_scored': len(customers),
+        'incremental': incremental,
+        'read_seconds': read_seconds,
+        'score_seconds': score_seconds,
+        'write_seconds': write_seconds,
+    }
+
+
+def segment_summary(conn):
+    """Customer count and averages per segment, from the persisted scores"""
+    cursor = conn.execute("""
+        SELECT segment, COUNT(*) as customer_count, AVG(monetary) as avg_spend,
+               AVG(frequency) as avg_orders, AVG(recency_days) as avg_recency_days
+        FROM customer_rfm
+        GROUP BY segment
+        ORDER BY avg_spend DESC
+    """)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def customer_scores(conn, customer_id):
+    """Persisted RFM scores for one customer, or None"""
+    cursor = conn.execute("""
+        SELECT c.customer_id, r.recency_days, r.frequency, r.monetary,
+               r.r_score, r.f_score, r.m_score, r.segment
+        FROM customers c JOIN customer_rfm r ON r.customer_key = c.customer_key
+        WHERE c.customer_id = ?
+    """, (customer_id,))
+    row = cursor.fetchone()
+    return dict(zip([d[0] for d in cursor.description], row)) if row else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute RFM quintile scores for all customers')
+    parser.add_argument('--db', default=None)
+    parser.add_argument('--incremental', action='store_true',
+                        help='only rescore customers with orders since the last run')
+    args = parser.parse_args()
+
+    print("👥 Scoring customers (RFM)...")
+    stats = score_customers(args.db, args.incremental)
+    mode = 'incremental' if stats['incremental'] else 'full'
+    print(f"✅ {mode.capitalize()} run scored {stats['customers_scored']:,} customers "
+          f"(read {stats['read_seconds']:.2f}s, score {stats['score_seconds']:.3f}s, "
+          f"write {stats['write_seconds']:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
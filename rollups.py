@@ -0,0 +1,145 @@
+"""Pre-aggregated summary tables maintained alongside order_facts
+
+The dashboard endpoints read these few-dozen-row tables instead of scanning
+order_facts. They are rebuilt after a full load and incremented in the same
+transaction as every appended batch (see ingest.py).
+"""
+
+ROLLUP_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS rollup_daily (
+        order_day INTEGER PRIMARY KEY,
+        revenue REAL NOT NULL,
+        order_count INTEGER NOT NULL,
+        units INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_monthly (
+        order_month INTEGER PRIMARY KEY,
+        revenue REAL NOT NULL,
+        order_count INTEGER NOT NULL,
+        units INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_category_month (
+        category_key INTEGER NOT NULL,
+        order_month INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        order_count INTEGER NOT NULL,
+        units INTEGER NOT NULL,
+        PRIMARY KEY (category_key, order_month)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_category_day (
+        category_key INTEGER NOT NULL,
+        order_day INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        order_count INTEGER NOT NULL,
+        units INTEGER NOT NULL,
+        PRIMARY KEY (category_key, order_day)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_customer (
+        customer_key INTEGER PRIMARY KEY,
+        revenue REAL NOT NULL,
+        order_count INTEGER NOT NULL,
+        first_day INTEGER NOT NULL,
+        last_day INTEGER NOT NULL
+    )
+    """,
+]
+
+ROLLUP_TABLES = ['rollup_daily', 'rollup_monthly', 'rollup_category_month', 'rollup_category_day',
+                 'rollup_customer']
+
+# One statement per entry of ROLLUP_TABLES, in the same order. Each aggregates {source} and adds the result onto the existing rollup rows.
+# "WHERE true" resolves the INSERT ... SELECT ... ON CONFLICT parsing ambiguity.
+ROLLUP_UPSERTS = [
+    """
+    INSERT INTO rollup_daily (order_day, revenue, order_count, units)
+    SELECT order_day, SUM(total_amount), COUNT(*), SUM(quantity)
+    FROM {source} WHERE true
+    GROUP BY order_day
+    ON CONFLICT (order_day) DO UPDATE SET
+        revenue = revenue + excluded.revenue,
+        order_count = order_count + excluded.order_count,
+        units = units + excluded.units
+    """,
+    """
+    INSERT INTO rollup_monthly (order_month, revenue, order_count, units)
+    SELECT order_month, SUM(total_amount), COUNT(*), SUM(quantity)
+    FROM {source} WHERE true
+    GROUP BY order_month
+    ON CONFLICT (order_month) DO UPDATE SET
+        revenue = revenue + excluded.revenue,
+        order_count = order_count + excluded.order_count,
+        units = units + excluded.units
+    """,
+    """
+    INSERT INTO rollup_category_month (category_key, order_month, revenue, order_count, units)
+    SELECT category_key, order_month, SUM(total_amount), COUNT(*), SUM(quantity)
+    FROM {source} WHERE true
+    GROUP BY category_key, order_month
+    ON CONFLICT (category_key, order_month) DO UPDATE SET
+        revenue = revenue + excluded.revenue,
+        order_count = order_count + excluded.order_count,
+        units = units + excluded.units
+    """,
+    """
+    INSERT INTO rollup_category_day (category_key, order_day, revenue, order_count, units)
+    SELECT category_key, order_day, SUM(total_amount), COUNT(*), SUM(quantity)
+    FROM {source} WHERE true
+    GROUP BY category_key, order_day
+    ON CONFLICT (category_key, order_day) DO UPDATE SET
+        revenue = revenue + excluded.revenue,
+        order_count = order_count + excluded.order_count,
+        units = units + excluded.units
+    """,
+    """
+    INSERT INTO rollup_customer (customer_key, revenue, order_count, first_day, last_day)
+    SELECT customer_key, SUM(total_amount), COUNT(*), MIN(order_day), MAX(order_day)
+    FROM {source} WHERE true
+    GROUP BY customer_key
+    ON CONFLICT (customer_key) DO UPDATE SET
+        revenue = revenue + excluded.revenue,
+        order_count = order_count + excluded.order_count,
+        first_day = MIN(first_day, excluded.first_day),
+        last_day = MAX(last_day, excluded.last_day)
+    """,
+]
+
+# Only the fact rows that belong to the batch currently in staging_orders
+STAGED_FACTS = "(SELECT * FROM order_facts WHERE order_id IN (SELECT order_id FROM staging_orders))"
+
+
+def create_rollups(conn):
+    """Create the rollup tables if missing; returns the names of the tables it created"""
+    existing = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for statement in ROLLUP_SCHEMA:
+        conn.execute(statement)
+    return [table for table in ROLLUP_TABLES if table not in existing]
+
+
+def drop_rollups(conn):
+    """Drop all rollup tables"""
+    for table in ROLLUP_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def apply_rollups(conn, source=STAGED_FACTS, tables=ROLLUP_TABLES):
+    """Add the aggregates of source (a table or subquery over order_facts) to the rollups"""
+    for table, statement in zip(ROLLUP_TABLES, ROLLUP_UPSERTS):
+        if table in tables:
+            conn.execute(statement.format(source=source))
+
+
+def rebuild_rollups(conn, tables=ROLLUP_TABLES):
+    """Recompute rollup tables (all by default) from the full order_facts table"""
+    create_rollups(conn)
+    for table in tables:
+        conn.execute(f"DELETE FROM {table}")
+    apply_rollups(conn, source='order_facts', tables=tables)
@@ -0,0 +1,443 @@
+"""Mergeable per-day sketches for unique customers and top-K customers/products
+
+For every order day and dimension (customer, product) the sketch_daily table
+keeps a HyperLogLog of the distinct keys, a Count-Min sketch of revenue per key
+and a Space-Saving summary of the top keys by revenue. A question over any
+date range is answered by merging the few hundred small per-day sketches in
+that range instead of running COUNT(DISTINCT ...) or sorting every group.
+Like the rollups, the sketches are rebuilt after a full load and merged with
+each appended batch inside its ingest transaction.
+
+Error bounds (pass exact=True to any query to get the exact SQL answer):
+
+* Distinct counts: HyperLogLog with 2**HLL_PRECISION registers has a relative
+  standard error of 1.04 / sqrt(2**HLL_PRECISION), about 0.8%; small counts
+  use linear counting and are typically exact.
+* Top-K revenue: Space-Saving estimates never undercount, and each one is at
+  most the returned error_bound above the true revenue. Candidates are also
+  checked against the Count-Min sketch, which overcounts by at most
+  e / CMS_WIDTH of the range's revenue with probability 1 - exp(-CMS_DEPTH).
+
+    python sketches.py [--db data/ecommerce.db] [--start 2023-07-01] [--end 2023-09-30] [--exact]
+"""
+import argparse
+import datetime
+import math
+import time
+import zlib
+
+import numpy as np
+
+import db
+import instrumentation
+import snapshot
+from rollups import STAGED_FACTS
+
+HLL_PRECISION = 14
+CMS_WIDTH = 1024
+CMS_DEPTH = 4
+TOPK_SIZE = 100
+
+SKETCH_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sketch_daily (
+        order_day INTEGER NOT NULL,
+        dimension TEXT NOT NULL,
+        total REAL NOT NULL,
+        hll BLOB NOT NULL,
+        cms BLOB NOT NULL,
+        topk BLOB NOT NULL,
+        topk_floor REAL NOT NULL,
+        PRIMARY KEY (order_day, dimension)
+    ) WITHOUT ROWID
+"""
+
+# dimension -> (fact key column, dimension table, key column, label column)
+DIMENSIONS = {
+    'customer': ('customer_key', 'customers', 'customer_key', 'customer_id'),
+    'product': ('product_key', 'products', 'product_key', 'product_name'),
+}
+
+FACT_DTYPE = np.dtype([
+    ('order_day', np.int64),
+    ('customer_key', np.int64),
+    ('product_key', np.int64),
+    ('total_amount', np.float64),
+])
+
+TOPK_DTYPE = np.dtype([('key', np.int64), ('count', np.float64)])
+
+EPOCH = datetime.date(1970, 1, 1)
+
+
+def hash64(keys, seed=0):
+    """Vectorized splitmix64 of integer keys (stable across runs and processes)"""
+    with np.errstate(over='ignore'):
+        x = np.asarray(keys, dtype=np.int64).view(np.uint64)
+        x = x + np.uint64(((seed + 1) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+class HyperLogLog:
+    """Distinct-count sketch; merging is an element-wise register maximum"""
+
+    def __init__(self, registers=None, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = (np.zeros(1 << precision, dtype=np.uint8)
+                          if registers is None else registers)
+
+    def add(self, keys):
+        if len(keys) == 0:
+            return
+        hashes = hash64(keys)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # Remaining bits fit in a float64 mantissa, so frexp gives the exact bit length
+        rest = (hashes & np.uint64((1 << (64 - self.precision)) - 1)).astype(np.float64)
+        rank = (64 - self.precision) - np.frexp(rest)[1] + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+
+class CountMinSketch:
+    """Weighted frequency sketch; estimates only overcount, merging adds the tables"""
+
+    def __init__(self, table=None, width=CMS_WIDTH, depth=CMS_DEPTH):
+        self.table = np.zeros((depth, width), dtype=np.float64) if table is None else table
+
+    def _columns(self, keys):
+        depth, width = self.table.shape
+        return [(hash64(keys, seed=row + 1) % np.uint64(width)).astype(np.int64)
+                for row in range(depth)]
+
+    def add(self, keys, weights):
+        for row, columns in enumerate(self._columns(keys)):
+            self.table[row] += np.bincount(columns, weights=weights, minlength=self.table.shape[1])
+
+    def merge(self, other):
+        self.table += other.table
+        return self
+
+    def estimate(self, keys):
+        if len(keys) == 0:
+            return np.zeros(0)
+        return np.min([self.table[row, columns]
+                       for row, columns in enumerate(self._columns(keys))], axis=0)
+
+
+class SpaceSaving:
+    """Top-K summary by weight, mergeable with a deterministic overcount bound
+
+    floor is the most revenue a key missing from the summary can have; every
+    stored count overestimates its key's revenue by at most floor.
+    """
+
+    def __init__(self, items=None, floor=0.0, size=TOPK_SIZE):
+        self.items = np.zeros(0, dtype=TOPK_DTYPE) if items is None else items
+        self.floor = floor
+        self.size = size
+
+    @classmethod
+    def from_counts(cls, keys, counts, size=TOPK_SIZE):
+        order = np.argsort(-counts, kind='stable')
+        items = np.zeros(min(len(keys), size), dtype=TOPK_DTYPE)
+        items['key'] = keys[order[:size]]
+        items['count'] = counts[order[:size]]
+        floor = float(counts[order[size]]) if len(keys) > size else 0.0
+        return cls(items, floor, size)
+
+    def merge(self, other):
+        keys = np.union1d(self.items['key'], other.items['key'])
+        counts = np.zeros(len(keys))
+        for summary in (self, other):
+            # A key absent from a summary may still have up to its floor there
+            present = np.isin(keys, summary.items['key'])
+            counts[~present] += summary.floor
+            positions = np.searchsorted(keys, summary.items['key'])
+            counts[positions] += summary.items['count']
+        merged = SpaceSaving.from_counts(keys, counts, self.size)
+        self.items = merged.items
+        self.floor = max(merged.floor, self.floor + other.floor)
+        return self
+
+
+class DaySketch:
+    """The HyperLogLog, Count-Min and Space-Saving sketches for one day and dimension"""
+
+    def __init__(self, total=0.0, hll=None, cms=None, topk=None):
+        self.total = total
+        self.hll = hll or HyperLogLog()
+        self.cms = cms or CountMinSketch()
+        self.topk = topk or SpaceSaving()
+
+    def add(self, keys, weights):
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=weights)
+        self.total += float(weights.sum())
+        self.hll.add(unique)
+        self.cms.add(unique, sums)
+        self.topk.merge(SpaceSaving.from_counts(unique, sums))
+
+    def merge(self, other):
+        self.total += other.total
+        self.hll.merge(other.hll)
+        self.cms.merge(other.cms)
+        self.topk.merge(other.topk)
+        return self
+
+    def to_row(self):
+        return (self.total,
+                zlib.compress(self.hll.registers.tobytes()),
+                zlib.compress(self.cms.table.tobytes()),
+                zlib.compress(self.topk.items.tobytes()),
+                self.topk.floor)
+
+    @classmethod
+    def from_row(cls, total, hll, cms, topk, topk_floor):
+        return cls(
+            total,
+            HyperLogLog(np.frombuffer(zlib.decompress(hll), dtype=np.uint8).copy()),
+            CountMinSketch(np.frombuffer(zlib.decompress(cms), dtype=np.float64)
+                           .reshape(CMS_DEPTH, CMS_WIDTH).copy()),
+            SpaceSaving(np.frombuffer(zlib.decompress(topk), dtype=TOPK_DTYPE).copy(), topk_floor),
+        )
+
+
+def create_sketches(conn):
+    """Create the sketch table if missing"""
+    conn.execute(SKETCH_SCHEMA)
+
+
+def drop_sketches(conn):
+    conn.execute("DROP TABLE IF EXISTS sketch_daily")
+
+
+class SketchBatch:
+    """Day sketches of the orders added in one write transaction, kept in memory until flush()
+
+    Ingesting chunk by chunk into one SketchBatch reads, merges and rewrites
+    each touched day's stored sketch once per batch instead of once per chunk.
+    """
+
+    def __init__(self):
+        self.sketches = {}  # (order_day, dimension) -> DaySketch of the new orders only
+
+    def add(self, conn, source=STAGED_FACTS, chunk_size=500_000):
+        """Sketch the orders in source (a table or subquery over order_facts)"""
+        cursor = conn.execute(
+            f"SELECT order_day, customer_key, product_key, total_amount FROM {source}")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            facts = np.fromiter(rows, dtype=FACT_DTYPE, count=len(rows))
+            facts = facts[np.argsort(facts['order_day'], kind='stable')]
+            days, starts = np.unique(facts['order_day'], return_index=True)
+            for day, part in zip(days.tolist(), np.split(facts, starts[1:])):
+                for dimension, (column, *_) in DIMENSIONS.items():
+                    sketch = self.sketches.setdefault((day, dimension), DaySketch())
+                    sketch.add(part[column], part['total_amount'])
+
+    def flush(self, conn):
+        """Merge the batch into sketch_daily, one read and one write per touched day; returns days written"""
+        if not self.sketches:
+            return 0
+        days = [day for day, _ in self.sketches]
+        stored = conn.execute(
+            "SELECT order_day, dimension, total, hll, cms, topk, topk_floor FROM sketch_daily "
+            "WHERE order_day BETWEEN ? AND ?", (min(days), max(days)))
+        for day, dimension, *row in stored:
+            sketch = self.sketches.get((day, dimension))
+            if sketch is not None:
+                self.sketches[day, dimension] = DaySketch.from_row(*row).merge(sketch)
+        conn.executemany("INSERT OR REPLACE INTO sketch_daily VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key + sketch.to_row() for key, sketch in self.sketches.items()))
+        written = len(self.sketches)
+        self.sketches = {}
+        return written
+
+
+def apply_sketches(conn, source=STAGED_FACTS, chunk_size=500_000):
+    """Merge the orders in source (a table or subquery over order_facts) into the day sketches
+
+    Defaults to the batch in staging_orders, like rollups.apply_rollups.
+    """
+    batch = SketchBatch()
+    batch.add(conn, source, chunk_size)
+    return batch.flush(conn)
+
+
+@instrumentation.stage('load.rebuild_sketches')
+def rebuild_sketches(conn):
+    """Recompute every day sketch from the full order_facts table"""
+    create_sketches(conn)
+    conn.execute("DELETE FROM sketch_daily")
+    apply_sketches(conn, source='order_facts')
+
+
+def day_number(value):
+    """ISO date string / date -> days since 1970-01-01 (None passes through)"""
+    if value is None:
+        return None
+    if not isinstance(value, datetime.date):
+        value = datetime.date.fromisoformat(str(value))
+    return (value - EPOCH).days
+
+
+def _day_range(start, end):
+    start, end = day_number(start), day_number(end)
+    return (-(1 << 62) if start is None else start, (1 << 62) if end is None else end)
+
+
+def merged_sketch(conn, dimension, start=None, end=None, parts=('hll', 'cms', 'topk')):
+    """Merge the day sketches of one dimension over [start, end] (inclusive)
+
+    Only the listed parts are read and decompressed; the others stay empty.
+    """
+    rows = conn.execute(f"""
+        SELECT total, topk_floor, {', '.join(parts)} FROM sketch_daily
+        WHERE dimension = ? AND order_day BETWEEN ? AND ?
+    """, (dimension, *_day_range(start, end))).fetchall()
+    merged = DaySketch(sum(row[0] for row in rows))
+    if not rows:
+        return merged
+    columns = {part: [zlib.decompress(row[2 + i]) for row in rows] for i, part in enumerate(parts)}
+
+    # One vectorized k-way merge instead of folding the days in pairwise
+    if 'hll' in columns:
+        registers = np.frombuffer(b''.join(columns['hll']), dtype=np.uint8)
+        merged.hll = HyperLogLog(registers.reshape(len(rows), -1).max(axis=0))
+    if 'cms' in columns:
+        tables = np.frombuffer(b''.join(columns['cms']), dtype=np.float64)
+        merged.cms = CountMinSketch(tables.reshape(len(rows), CMS_DEPTH, CMS_WIDTH).sum(axis=0))
+    if 'topk' in columns:
+        items = np.frombuffer(b''.join(columns['topk']), dtype=TOPK_DTYPE)
+        floors = np.repeat([row[1] for row in rows],
+                           [len(blob) // TOPK_DTYPE.itemsize for blob in columns['topk']])
+        floor_total = sum(row[1] for row in rows)
+        keys, inverse = np.unique(items['key'], return_inverse=True)
+        # Each key gets its count where present and the summary's floor everywhere else
+        counts = np.bincount(inverse, weights=items['count'] - floors, minlength=len(keys)) + floor_total
+        merged.topk = SpaceSaving.from_counts(keys, counts)
+        merged.topk.floor = max(merged.topk.floor, floor_total)
+    return merged
+
+
+def unique_count(conn, dimension='customer', start=None, end=None, exact=False):
+    """Distinct customers (or products) ordering in [start, end]
+
+    Returns {'value', 'exact', 'relative_error'}; relative_error is the
+    HyperLogLog standard error (0 for exact answers).
+    """
+    if exact and dimension == 'customer' and start is None and end is None:
+        # All-time distinct customers is just the size of the customer rollup
+        value = conn.execute("SELECT COUNT(*) FROM rollup_customer").fetchone()[0]
+        return {'value': value, 'exact': True, 'relative_error': 0.0}
+    if exact:
+        store = snapshot.load(conn)
+        if store is not None:
+            value = snapshot.unique_count(store, dimension, *_day_range(start, end))
+            return {'value': value, 'exact': True, 'relative_error': 0.0}
+        column = DIMENSIONS[dimension][0]
+        value = conn.execute(
+            f"SELECT COUNT(DISTINCT {column}) FROM order_facts WHERE order_day BETWEEN ? AND ?",
+            _day_range(start, end)).fetchone()[0]
+        return {'value': value, 'exact': True, 'relative_error': 0.0}
+    hll = merged_sketch(conn, dimension, start, end, parts=('hll',)).hll
+    return {'value': hll.count(), 'exact': False, 'relative_error': hll.relative_error}
+
+
+def top_k(conn, dimension='product', k=10, start=None, end=None, exact=False):
+    """Top k customers (or products) by revenue in [start, end]
+
+    Returns [{'name', 'revenue', 'error_bound'}]; approximate revenues are
+    upper bounds that exceed the true value by at most error_bound.
+    """
+    if k < 1:  # LIMIT -1 means no limit to SQLite, and [:-1] drops the last item
+        raise ValueError(f"k must be at least 1, not {k}")
+    column, table, key_column, label = DIMENSIONS[dimension]
+    if exact:
+        store = snapshot.load(conn)
+        if store is not None:
+            rows = snapshot.top_k(store, dimension, k, *_day_range(start, end))
+            return [{'name': name, 'revenue': revenue, 'error_bound': 0.0} for name, revenue in rows]
+        rows = conn.execute(f"""
+            SELECT d.{label}, a.revenue
+            FROM (
+                SELECT {column} as key, SUM(total_amount) as revenue
+                FROM order_facts
+                WHERE order_day BETWEEN ? AND ?
+                GROUP BY {column}
+                ORDER BY revenue DESC
+                LIMIT ?
+            ) a
+            JOIN {table} d ON d.{key_column} = a.key
+            ORDER BY a.revenue DESC
+        """, (*_day_range(start, end), k)).fetchall()
+        return [{'name': name, 'revenue': revenue, 'error_bound': 0.0} for name, revenue in rows]
+
+    sketch = merged_sketch(conn, dimension, start, end, parts=('cms', 'topk'))
+    items = sketch.topk.items
+    # Both estimates only overcount, so the smaller one is the tighter bound
+    revenue = np.minimum(items['count'], sketch.cms.estimate(items['key']))
+    order = np.argsort(-revenue, kind='stable')[:k]
+    keys = items['key'][order].tolist()
+    names = dict(conn.execute(
+        f"SELECT {key_column}, {label} FROM {table} WHERE {key_column} IN ({', '.join('?' * len(keys))})",
+        keys)) if keys else {}
+    return [{'name': names.get(key), 'revenue': float(value), 'error_bound': sketch.topk.floor}
+            for key, value in zip(keys, revenue[order].tolist())]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Approximate unique customers and top-K from day sketches')
+    parser.add_argument('--db', default=None)
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--exact', action='store_true', help='answer with exact SQL instead')
+    parser.add_argument('--rebuild', action='store_true', help='recompute the sketches first')
+    args = parser.parse_args()
+
+    if args.rebuild:
+        conn = instrumentation.connect(args.db or db.DB_PATH, isolation_level=None)
+        conn.execute("BEGIN")
+        rebuild_sketches(conn)
+        conn.execute("COMMIT")
+        conn.close()
+
+    conn = db.connect_readonly(args.db)
+    start = time.perf_counter()
+    customers = unique_count(conn, 'customer', args.start, args.end, args.exact)
+    products = top_k(conn, 'product', args.k, args.start, args.end, args.exact)
+    top_customers = top_k(conn, 'customer', args.k, args.start, args.end, args.exact)
+    elapsed = time.perf_counter() - start
+
+    print(f"👥 Unique customers: {customers['value']:,} (±{customers['relative_error']:.1%})")
+    print(f"🏆 Top {args.k} products by revenue:")
+    for row in products:
+        print(f"   {row['name']:25} ${row['revenue']:>14,.2f} (+≤${row['error_bound']:,.2f})")
+    print(f"💰 Top {args.k} customers by revenue:")
+    for row in top_customers:
+        print(f"   {row['name']:25} ${row['revenue']:>14,.2f} (+≤${row['error_bound']:,.2f})")
+    print(f"⚡ {'Exact' if args.exact else 'Sketch'} answers in {elapsed * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
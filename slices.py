@@ -0,0 +1,262 @@
+"""Date-range / category slices for the dashboard API, planned onto rollups and indexes
+
+Every endpoint accepts start and end (ISO dates, inclusive), category and
+granularity (day, week or month). Each query reads the smallest structure
+that answers it exactly, so its cost grows with the slice, not the table:
+
+* month-aligned ranges     -> rollup_monthly / rollup_category_month
+* any other range          -> rollup_daily / rollup_category_day (primary key range scan)
+* unique customers         -> day sketches, or idx_facts_category when a category is set
+* recent orders / exports  -> idx_facts_day / idx_facts_category in (order_day, order_id)
+                              order, paged by keyset cursors
+"""
+import calendar
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
+import sketches
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# SQL label for each bucket, given an order_day expression
+BUCKET_LABELS = {
+    'day': "date({day} * 86400, 'unixepoch')",
+    'week': "strftime('%Y-%W', {day} * 86400, 'unixepoch')",
+    'month': "strftime('%Y-%m', {day} * 86400, 'unixepoch')",
+}
+
+CATEGORY_KEY = "(SELECT category_key FROM categories WHERE category = ?)"
+
+
+@dataclass(frozen=True)
+class Slice:
+    start: Optional[datetime.date] = None
+    end: Optional[datetime.date] = None
+    category: Optional[str] = None
+    granularity: str = 'month'
+
+    @property
+    def start_day(self):
+        return sketches.day_number(self.start)
+
+    @property
+    def end_day(self):
+        return sketches.day_number(self.end)
+
+    @property
+    def month_aligned(self):
+        """True when the range covers whole calendar months, so monthly rollups suffice"""
+        start_ok = self.start is None or self.start.day == 1
+        end_ok = self.end is None or self.end.day == calendar.monthrange(self.end.year, self.end.month)[1]
+        return start_ok and end_ok
+
+    @property
+    def filters(self):
+        """Keyword filters for the columnar backend"""
+        return {'start': self.start, 'end': self.end, 'category': self.category}
+
+
+def parse_slice(args, default_granularity='month'):
+    """Build a Slice from request args; raises ValueError on malformed values"""
+    def date_arg(name):
+        value = args.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an ISO date (YYYY-MM-DD), got {value!r}") from None
+
+    granularity = args.get('granularity') or default_granularity
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}, got {granularity!r}")
+    start, end = date_arg('start'), date_arg('end')
+    if start and end and start > end:
+        raise ValueError("start must not be after end")
+    return Slice(start, end, args.get('category') or None, granularity)
+
+
+def _month_key(date):
+    return date.year * 100 + date.month
+
+
+def _where(conditions):
+    return ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+
+ROLLUP_TABLES = {
+    # (month level, by category) -> table
+    (True, False): 'rollup_monthly',
+    (True, True): 'rollup_category_month',
+    (False, False): 'rollup_daily',
+    (False, True): 'rollup_category_day',
+}
+
+
+def _rollup_source(s, by_category=False, day_level=False):
+    """(table, WHERE clause, params) of the smallest rollup that answers slice s exactly
+
+    Month-aligned ranges read the monthly rollups unless day_level is set;
+    by_category picks the per-category rollups even without a category filter.
+    """
+    monthly = s.month_aligned and not day_level
+    table = ROLLUP_TABLES[monthly, bool(by_category or s.category)]
+    conditions, params = [], []
+    if s.category:
+        conditions.append(f"category_key = {CATEGORY_KEY}")
+        params.append(s.category)
+    if monthly:
+        column, start, end = 'order_month', s.start and _month_key(s.start), s.end and _month_key(s.end)
+    else:
+        column, start, end = 'order_day', s.start_day, s.end_day
+    if start is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{column} <= ?")
+        params.append(end)
+    return table, _where(conditions), params
+
+
+def metrics(conn, s, exact=False):
+    """Totals for the slice plus distinct customers"""
+    table, where, params = _rollup_source(s)
+    row = conn.execute(f"""
+        SELECT SUM(order_count), SUM(revenue), SUM(revenue) / SUM(order_count)
+        FROM {table} {where}
+    """, params).fetchone()
+
+    if s.category:
+        # Sketches are not kept per category; count exactly off the covering category index
+        _, where, day_params = _rollup_source(s, day_level=True)
+        value = conn.execute(
+            f"SELECT COUNT(DISTINCT customer_key) FROM order_facts {where}", day_params).fetchone()[0]
+        unique = {'value': value, 'exact': True, 'relative_error': 0.0}
+    else:
+        unique = sketches.unique_count(conn, 'customer', s.start, s.end, exact=exact)
+
+    return {
+        'total_orders': row[0] or 0,
+        'total_revenue': row[1] or 0.0,
+        'avg_order_value': row[2] or 0.0,
+        'unique_customers': unique['value'],
+        'unique_customers_error': unique['relative_error'],
+    }
+
+
+def series(conn, s):
+    """Revenue and order count per granularity bucket; the label key is the granularity"""
+    if s.granularity == 'month' and s.month_aligned:
+        table, where, params = _rollup_source(s)
+        label = "printf('%d-%02d', order_month / 100, order_month % 100)"
+    else:
+        # Day-level rollups bucketed on the fly, so partial months/weeks at the edges stay exact
+        table, where, params = _rollup_source(s, day_level=True)
+        label = BUCKET_LABELS[s.granularity].format(day='order_day')
+    cursor = conn.execute(f"""
+        SELECT {label}, SUM(revenue), SUM(order_count)
+        FROM {table} {where}
+        GROUP BY 1
+        ORDER BY 1
+    """, params)
+    return [{s.granularity: bucket, 'revenue': revenue, 'orders': orders}
+            for bucket, revenue, orders in cursor]
+
+
+def categories(conn, s):
+    """Orders and revenue per category within the slice"""
+    table, where, params = _rollup_source(s, by_category=True)
+    cursor = conn.execute(f"""
+        SELECT k.category, a.order_count, a.revenue
+        FROM (
+            SELECT category_key, SUM(order_count) as order_count, SUM(revenue) as revenue
+            FROM {table} {where}
+            GROUP BY category_key
+        ) a
+        JOIN categories k ON k.category_key = a.category_key
+        ORDER BY a.revenue DESC
+    """, params)
+    return [{'category': category, 'order_count': order_count, 'revenue': revenue}
+            for category, order_count, revenue in cursor]
+
+
+def parse_cursor(value):
+    """'YYYY-MM-DD_order_id' page cursor -> (order_day, order_id); raises ValueError"""
+    try:
+        date, order_id = value.rsplit('_', 1)
+        return sketches.day_number(date), int(order_id)
+    except ValueError:
+        raise ValueError(f"cursor must look like 2023-12-31_1896, got {value!r}") from None
+
+
+def format_cursor(order):
+    """Page cursor pointing just past an order row (as returned by recent_orders)"""
+    return f"{order['order_date']}_{order['order_id']}"
+
+
+def _keyset(where, params, cursor, op):
+    """Add a (order_day, order_id) keyset bound to a WHERE clause"""
+    if cursor is None:
+        return where, params
+    condition = f"(order_day, order_id) {op} (?, ?)"
+    return (f"{where} AND {condition}" if where else f"WHERE {condition}"), params + list(cursor)
+
+
+ORDER_COLUMNS = """
+            f.order_id,
+            c.customer_id,
+            date(f.order_day * 86400, 'unixepoch') as order_date,
+            f.total_amount,
+            p.product_name"""
+
+
+def recent_orders(conn, s, limit=10, before=None):
+    """Latest orders in the slice, newest first
+
+    before is a (order_day, order_id) keyset cursor: the page starts at the
+    first order strictly older than it, walking the (order_day, order_id) index
+    backwards, so every page costs the same however deep it is.
+    """
+    _, where, params = _rollup_source(s, day_level=True)
+    where, params = _keyset(where, params, before, '<')
+    cursor = conn.execute(f"""
+        SELECT {ORDER_COLUMNS}
+        FROM (
+            SELECT order_id, customer_key, product_key, order_day, total_amount
+            FROM order_facts {where}
+            ORDER BY order_day DESC, order_id DESC
+            LIMIT ?
+        ) f
+        JOIN customers c ON c.customer_key = f.customer_key
+        JOIN products p ON p.product_key = f.product_key
+        ORDER BY f.order_day DESC, f.order_id DESC
+    """, params + [limit])
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def export_orders(conn, s, after=None):
+    """Cursor over every order in the slice, oldest first, for streaming exports
+
+    Rows come straight off the (order_day, order_id) index in order, so nothing
+    is sorted or buffered; after resumes an interrupted export.
+    """
+    _, where, params = _rollup_source(s, day_level=True)
+    where, params = _keyset(where, params, after, '>')
+    return conn.execute(f"""
+        SELECT
+            f.order_id,
+            c.customer_id,
+            p.product_name,
+            k.category,
+            date(f.order_day * 86400, 'unixepoch') as order_date,
+            f.unit_price,
+            f.quantity,
+            f.total_amount
+        FROM (SELECT * FROM order_facts {where}) f
+        JOIN customers c ON c.customer_key = f.customer_key
+        JOIN products p ON p.product_key = f.product_key
+        JOIN categories k ON k.category_key = f.category_key
+        ORDER BY f.order_day, f.order_id
+    """, params)
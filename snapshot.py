@@ -0,0 +1,247 @@
+"""Memory-mapped binary snapshot of the orders, for instant analytics startup
+
+After a load, the OrderStore columns are written next to the database
+(data/ecommerce.db -> data/ecommerce.snapshot/) as one fixed-width
+little-endian file per column, plus header.json (row count, dtypes and the
+last ingest batch it contains) and dictionaries.json (the strings the
+customer/product/category codes index). Readers np.memmap the column files,
+so opening a snapshot costs a few small reads however many rows it holds, and
+every process that maps it (analysis scripts, API workers) shares one copy of
+the data through the OS page cache.
+
+Each write goes to a new versioned directory and then atomically replaces the
+CURRENT pointer file, so a reader never sees a half-written snapshot and
+processes that still map an older version keep working. A snapshot that
+does not hold the database's latest ingest batch (e.g. after an ingest with
+--no-snapshot) is ignored and callers fall back to SQL. Batches are logged in
+the same transaction as the orders they insert, and unlike data_version they
+do not change when only RFM scores are rewritten.
+
+    python snapshot.py write [--db data/ecommerce.db]
+    python snapshot.py info [--db data/ecommerce.db]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import db
+import instrumentation
+from order_store import COLUMNS, OrderStore
+
+# 2: product codes are one per products row (1 merged names shared across categories)
+FORMAT_VERSION = 2
+CURRENT = 'CURRENT'
+HEADER = 'header.json'
+DICTIONARIES = 'dictionaries.json'
+
+# The last ingest batch and the total rows logged; identifies the order rows
+ORDERS_VERSION_SQL = """
+    SELECT batch_id, loaded_at, (SELECT SUM(row_count) FROM ingest_batches)
+    FROM ingest_batches ORDER BY batch_id DESC LIMIT 1
+"""
+
+_lock = threading.Lock()
+_open = {}  # snapshot directory -> (version directory name, OrderStore)
+
+
+def snapshot_dir(db_path=None):
+    """Where the snapshot of a database lives: data/ecommerce.db -> data/ecommerce.snapshot"""
+    return os.path.splitext(db_path or db.DB_PATH)[0] + '.snapshot'
+
+
+def orders_version(conn):
+    """[batch_id, loaded_at, total rows] of the latest ingest batch, or None"""
+    try:
+        row = conn.execute(ORDERS_VERSION_SQL).fetchone()
+    except sqlite3.OperationalError:  # built before ingest_batches existed
+        return None
+    return list(row) if row else None
+
+
+def write_snapshot(store, directory, version):
+    """Write store (holding the orders up to ingest batch version) as the current snapshot; returns its path"""
+    os.makedirs(directory, exist_ok=True)
+    name = f"b{version[0] if version else 0}-{time.time_ns():x}"
+    tmp = os.path.join(directory, f".tmp-{name}")
+    os.makedirs(tmp)
+    try:
+        columns = {}
+        for column in COLUMNS:
+            array = store.column(column)
+            dtype = array.dtype.newbyteorder('<')
+            np.ascontiguousarray(array, dtype=dtype).tofile(os.path.join(tmp, f"{column}.bin"))
+            columns[column] = {'dtype': dtype.str, 'file': f"{column}.bin"}
+        with open(os.path.join(tmp, DICTIONARIES), 'w', encoding='utf-8') as f:
+            json.dump(store.dictionaries, f, ensure_ascii=False)
+        header = {
+            'format': FORMAT_VERSION,
+            'rows': len(store),
+            'orders_version': version,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'columns': columns,
+        }
+        with open(os.path.join(tmp, HEADER), 'w') as f:
+            json.dump(header, f, indent=2)
+        os.rename(tmp, os.path.join(directory, name))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(directory, f".{CURRENT}.tmp-{os.getpid()}")
+    with open(pointer, 'w') as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(directory, CURRENT))
+    _prune(directory, keep=name)
+    return os.path.join(directory, name)
+
+
+def _prune(directory, keep):
+    # Unlinked files stay readable for processes that still map them (POSIX);
+    # where removal fails the old version is simply left for the next write
+    for entry in os.listdir(directory):
+        if entry != keep and entry != CURRENT and os.path.isdir(os.path.join(directory, entry)):
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+@instrumentation.stage('load.write_snapshot')
+def write_from_db(db_path=None, directory=None):
+    """Snapshot a database's order_facts; returns the snapshot path"""
+    db_path = db_path or db.DB_PATH
+    conn = db.connect_readonly(db_path)
+    try:
+        conn.execute("BEGIN")  # one read transaction: the version matches the rows
+        version = orders_version(conn)
+        store = OrderStore.from_db(conn)
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return write_snapshot(store, directory or snapshot_dir(db_path), version)
+
+
+def read_header(directory, name=None):
+    """(version directory name, header dict) of the current (or named) version, or (None, None)"""
+    try:
+        if name is None:
+            with open(os.path.join(directory, CURRENT)) as f:
+                name = f.read().strip()
+        with open(os.path.join(directory, name, HEADER)) as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+    if header.get('format') != FORMAT_VERSION:
+        return None, None
+    return name, header
+
+
+def open_snapshot(directory, name=None):
+    """(OrderStore of read-only np.memmap columns, header) for the current (or named) version, or (None, None)"""
+    name, header = read_header(directory, name)
+    if name is None:
+        return None, None
+    path = os.path.join(directory, name)
+    rows = header['rows']
+    columns = {}
+    for column, spec in header['columns'].items():
+        dtype = np.dtype(spec['dtype'])
+        if rows == 0:  # zero-length files cannot be mapped
+            columns[column] = np.empty(0, dtype=dtype)
+        else:
+            columns[column] = np.memmap(os.path.join(path, spec['file']), dtype=dtype, mode='r', shape=(rows,))
+    with open(os.path.join(path, DICTIONARIES), encoding='utf-8') as f:
+        dictionaries = json.load(f)
+    store = OrderStore(columns, dictionaries)
+    store.location = (directory, name)
+    return store, header
+
+
+def load(conn=None, db_path=None, directory=None):
+    """This process's mapping of the snapshot, if it holds the database's current orders
+
+    The database is conn's (or db_path's). Returns None when there is no
+    snapshot or it is stale, so callers can fall back to SQL. The mapping is
+    reused until a newer snapshot becomes current.
+    """
+    if db_path is None:
+        db_path = conn.execute("PRAGMA database_list").fetchone()[2] if conn is not None else db.DB_PATH
+    conn = conn or db.get_connection(db_path)
+    directory = directory or snapshot_dir(db_path)
+    version = orders_version(conn)
+    name, header = read_header(directory)
+    if name is None or version is None or header.get('orders_version') != version:
+        return None
+    with _lock:
+        cached = _open.get(directory)
+        if cached is not None and cached[0] == name:
+            return cached[1]
+    store, header = open_snapshot(directory)
+    if store is None or header.get('orders_version') != version:
+        return None
+    with _lock:
+        _open[directory] = (name, store)
+    return store
+
+
+def _day_mask(store, start_day, end_day):
+    days = store.column('order_day')
+    return (days >= start_day) & (days <= end_day)
+
+
+def unique_count(store, dimension, start_day, end_day):
+    """Exact number of distinct customers (or products) ordering in [start_day, end_day]"""
+    codes = store.column(dimension)[_day_mask(store, start_day, end_day)]
+    return int(np.count_nonzero(np.bincount(codes, minlength=len(store.dictionaries[dimension]))))
+
+
+def top_k(store, dimension, k, start_day, end_day):
+    """Exact top k customers (or products) by revenue in [start_day, end_day], as [(name, revenue)]"""
+    mask = _day_mask(store, start_day, end_day)
+    cents = np.bincount(store.column(dimension)[mask], weights=store.column('total_cents')[mask],
+                        minlength=len(store.dictionaries[dimension]))
+    order = np.argsort(-cents, kind='stable')[:k]
+    order = order[cents[order] > 0]
+    names = store.dictionaries[dimension]
+    return [(names[code], value / 100) for code, value in zip(order.tolist(), cents[order].tolist())]
+
+
+def refresh_if_present(db_path=None):
+    """Rewrite the snapshot after new data, but only for databases that already have one"""
+    directory = snapshot_dir(db_path)
+    if read_header(directory)[0] is None:
+        return None
+    return write_from_db(db_path, directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write or inspect the memory-mapped orders snapshot')
+    parser.add_argument('command', choices=['write', 'info'])
+    parser.add_argument('--db', default=None)
+    args = parser.parse_args()
+    directory = snapshot_dir(args.db)
+
+    if args.command == 'write':
+        start = time.perf_counter()
+        path = write_from_db(args.db, directory)
+        print(f"📸 Snapshot written to {path} in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    store, header = open_snapshot(directory)
+    if store is None:
+        print(f"❌ No snapshot in {directory}; run: python snapshot.py write")
+        return
+    elapsed = time.perf_counter() - start
+    conn = db.connect_readonly(args.db)
+    fresh = header.get('orders_version') == orders_version(conn)
+    size = sum(column.nbytes for column in store.columns.values())
+    print(f"🗂️  {directory}: {header['rows']:,} orders, {size / 1e6:.1f} MB of columns, "
+          f"up to ingest batch {(header.get('orders_version') or [None])[0]} ({'current' if fresh else 'stale'}), "
+          f"opened in {elapsed * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
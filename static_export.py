@@ -0,0 +1,305 @@
+"""Static HTML dashboards from a compiled template
+
+templates/dashboard.html marks its data with attributes: elements carrying
+data-metric="name" get their text replaced (escaped), elements carrying
+data-slot="name" get their inner HTML replaced by a generated block. The
+template is parsed once into literal chunks and slots (cached until the file
+changes), so rendering is a single join over pre-split chunks, linear in the
+output size, and never touches text outside a slot the way a chain of
+str.replace calls does.
+
+A batch export fetches the per-category, per-day rollup once and renders
+every requested slice (overall, per category, per date range) from it in
+memory; only the five-row orders table is read per dashboard, off the
+(order_day, order_id) index.
+
+    python static_export.py --by-category --range 2023-01-01:2023-06-30 --range 2023-07-01:2023-12-31
+"""
+import argparse
+import datetime
+import functools
+import html
+import os
+import re
+import time
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+import numpy as np
+
+import db
+import instrumentation
+import slices
+
+TEMPLATE_PATH = 'templates/dashboard.html'
+OUTPUT_DIR = 'data/static'
+
+CHART_WIDTH, CHART_HEIGHT = 472, 150  # viewBox of the revenue chart
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """A template split around its slots: chunks[i], slot i, chunks[i + 1], ..."""
+    chunks: tuple
+    slots: tuple  # (name, kind) with kind 'text' (escaped) or 'html'
+    defaults: tuple  # each slot's original content, kept when no value is given
+
+    def render(self, values):
+        parts = [self.chunks[0]]
+        for (name, kind), default, chunk in zip(self.slots, self.defaults, self.chunks[1:]):
+            value = values.get(name)
+            if value is None:
+                parts.append(default)
+            else:
+                parts.append(html.escape(str(value), quote=False) if kind == 'text' else value)
+            parts.append(chunk)
+        return ''.join(parts)
+
+
+class _SlotFinder(HTMLParser):
+    """Collects (inner start, inner end, name, kind) of every data-metric/data-slot element"""
+
+    def __init__(self, text):
+        super().__init__(convert_charrefs=False)
+        self.line_offsets = [0] + [m.end() for m in re.finditer('\n', text)]
+        self.stack = []  # (tag, slot or None) of open elements
+        self.found = []
+
+    def _offset(self):
+        line, column = self.getpos()
+        return self.line_offsets[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        slot = None
+        if 'data-slot' in attrs:
+            slot = (attrs['data-slot'], 'html')
+        elif 'data-metric' in attrs:
+            slot = (attrs['data-metric'], 'text')
+        inner_start = self._offset() + len(self.get_starttag_text())
+        self.stack.append((tag, slot and (inner_start, *slot)))
+
+    def handle_endtag(self, tag):
+        # Unclosed (void) elements are popped along the way
+        while self.stack:
+            open_tag, slot = self.stack.pop()
+            if open_tag == tag:
+                if slot:
+                    inner_start, name, kind = slot
+                    self.found.append((inner_start, self._offset(), name, kind))
+                return
+
+
+def compile_template(text):
+    """Parse template text once into a CompiledTemplate"""
+    finder = _SlotFinder(text)
+    finder.feed(text)
+    finder.close()
+    chunks, slots, defaults, position = [], [], [], 0
+    for start, end, name, kind in sorted(finder.found):
+        if start < position:
+            raise ValueError(f"slot {name!r} is nested inside another slot")
+        chunks.append(text[position:start])
+        slots.append((name, kind))
+        defaults.append(text[start:end])
+        position = end
+    chunks.append(text[position:])
+    return CompiledTemplate(tuple(chunks), tuple(slots), tuple(defaults))
+
+
+@functools.lru_cache(maxsize=8)
+def _compile_file(path, mtime_ns, size):
+    with open(path, 'r', encoding='utf-8') as f:
+        return compile_template(f.read())
+
+
+def load_template(path=TEMPLATE_PATH):
+    """The compiled template for path, re-parsed only when the file changes"""
+    stat = os.stat(path)
+    return _compile_file(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+class Aggregates:
+    """The per-category daily rollup, fetched once and sliced in memory"""
+
+    def __init__(self, conn):
+        rows = conn.execute("""
+            SELECT k.category, r.order_day, r.revenue, r.order_count
+            FROM rollup_category_day r
+            JOIN categories k ON k.category_key = r.category_key
+            ORDER BY r.order_day
+        """).fetchall()
+        category, day, revenue, orders = zip(*rows) if rows else ((), (), (), ())
+        names, codes = np.unique(np.array(category, dtype=object), return_inverse=True)
+        self.categories = list(names)
+        self.codes = codes.astype(np.int64)
+        self.day = np.array(day, dtype=np.int64)
+        self.revenue = np.array(revenue, dtype=np.float64)
+        self.orders = np.array(orders, dtype=np.int64)
+
+    def _mask(self, s, by_category=True):
+        mask = np.ones(len(self.day), dtype=bool)
+        if s.start is not None:
+            mask &= self.day >= s.start_day
+        if s.end is not None:
+            mask &= self.day <= s.end_day
+        if by_category and s.category:
+            code = self.categories.index(s.category) if s.category in self.categories else -1
+            mask &= self.codes == code
+        return mask
+
+    def totals(self, s):
+        mask = self._mask(s)
+        orders, revenue = int(self.orders[mask].sum()), float(self.revenue[mask].sum())
+        return {'orders': orders, 'revenue': revenue, 'avg_order_value': revenue / orders if orders else 0.0}
+
+    def series(self, s):
+        """Revenue per granularity bucket, oldest first"""
+        mask = self._mask(s)
+        days = self.day[mask].astype('datetime64[D]')
+        if s.granularity == 'month':
+            buckets = days.astype('datetime64[M]').astype(np.int64)
+        elif s.granularity == 'week':
+            buckets = (self.day[mask] + 3) // 7  # day 0 was a Thursday; weeks start on Monday
+        else:
+            buckets = days.astype(np.int64)
+        _, inverse = np.unique(buckets, return_inverse=True)
+        return np.bincount(inverse, weights=self.revenue[mask]) if len(inverse) else np.zeros(0)
+
+    def orders_by_category(self, s):
+        """Order counts per category within the slice's date range (every category is shown)"""
+        mask = self._mask(s, by_category=False)
+        counts = np.bincount(self.codes[mask], weights=self.orders[mask], minlength=len(self.categories))
+        return dict(zip(self.categories, counts.astype(np.int64).tolist()))
+
+
+def revenue_chart(values):
+    """Inner SVG of the revenue card: a smoothed line and its gradient fill"""
+    if len(values) == 0:
+        values = np.zeros(1)
+    if len(values) == 1:
+        values = np.repeat(values, 2)
+    low, high = values.min(), values.max()
+    xs = np.linspace(0, CHART_WIDTH, len(values))
+    scaled = (values - low) / (high - low) if high > low else np.full(len(values), 0.5)
+    ys = 1 + (CHART_HEIGHT - 2) * (1 - scaled)
+    path = f"M{xs[0]:g} {ys[0]:.4g}" + ''.join(
+        f"C{(x0 + x1) / 2:.6g} {y0:.4g} {(x0 + x1) / 2:.6g} {y1:.4g} {x1:.6g} {y1:.4g}"
+        for x0, y0, x1, y1 in zip(xs, ys, xs[1:], ys[1:]))
+    return (
+        f'\n<path d="{path}" stroke="#93c5fd" stroke-linecap="round" stroke-width="3"></path>'
+        f'\n<path d="{path}V{CHART_HEIGHT - 1}H0V{ys[0]:.4g}Z" fill="url(#paint0_linear_revenue)"></path>'
+        '\n<defs>\n<linearGradient gradientUnits="userSpaceOnUse" id="paint0_linear_revenue" '
+        f'x1="{CHART_WIDTH // 2}" x2="{CHART_WIDTH // 2}" y1="1" y2="{CHART_HEIGHT - 1}">'
+        '\n<stop stop-color="#93c5fd" stop-opacity="0.2"></stop>'
+        '\n<stop offset="1" stop-color="#93c5fd" stop-opacity="0"></stop>'
+        '\n</linearGradient>\n</defs>\n'
+    )
+
+
+def category_bars(counts):
+    top = max(counts.values(), default=0) or 1
+    return ''.join(
+        '\n<div class="w-full flex flex-col items-center gap-2">'
+        f'\n<div class="w-full bg-primary/20 rounded" style="height: {100 * count / top:.0f}%;"></div>'
+        f'\n<p class="text-xs text-text-muted">{html.escape(name)}</p>'
+        '\n</div>'
+        for name, count in counts.items()) + '\n'
+
+
+def order_rows(orders):
+    rows = []
+    for i, order in enumerate(orders):
+        border = ' border-b border-border-color' if i < len(orders) - 1 else ''
+        rows.append(
+            f'\n<tr class="bg-background-dark/50{border}">'
+            f'\n<th class="px-6 py-4 font-medium text-white whitespace-nowrap" scope="row">#{order["order_id"]}</th>'
+            f'\n<td class="px-6 py-4">{html.escape(order["customer_id"])}</td>'
+            f'\n<td class="px-6 py-4">{order["order_date"]}</td>'
+            f'\n<td class="px-6 py-4">${order["total_amount"]:,.2f}</td>'
+            '\n<td class="px-6 py-4 text-center"><span class="px-2 py-1 text-xs font-medium rounded-full '
+            'bg-green-900 text-green-300">Completed</span></td>'
+            '\n</tr>')
+    return ''.join(rows) + '\n'
+
+
+def describe(s):
+    """Subtitle for a slice"""
+    parts = [s.category or 'All categories']
+    if s.start or s.end:
+        parts.append(f"{s.start or 'start'} to {s.end or 'today'}")
+    return ' · '.join(parts)
+
+
+def dashboard_values(conn, aggregates, s):
+    """Slot values for one slice"""
+    totals = aggregates.totals(s)
+    return {
+        'subtitle': describe(s),
+        'revenue': f"${totals['revenue']:,.2f}",
+        'orders': f"{totals['orders']:,}",
+        'aov': f"${totals['avg_order_value']:,.2f}",
+        'revenue_chart': revenue_chart(aggregates.series(s)),
+        'category_bars': category_bars(aggregates.orders_by_category(s)),
+        'recent_orders': order_rows(slices.recent_orders(conn, s, limit=5)),
+        'live': '',  # static files have no /api/live to subscribe to
+    }
+
+
+def slug(s):
+    parts = [re.sub(r'[^a-z0-9]+', '-', s.category.lower()).strip('-') if s.category else 'all']
+    if s.start or s.end:
+        parts.append(f"{s.start or 'start'}_{s.end or 'end'}")
+    return '-'.join(parts)
+
+
+@instrumentation.stage('render.static_dashboards')
+def render_dashboards(conn, slices_, aggregates=None, template_path=TEMPLATE_PATH):
+    """{slice: html} for every slice, from one rollup fetch and one parsed template"""
+    template = load_template(template_path)
+    aggregates = aggregates or Aggregates(conn)
+    return {s: template.render(dashboard_values(conn, aggregates, s)) for s in slices_}
+
+
+def batch_slices(ranges=((None, None),), categories=(None,), granularity='month'):
+    return [slices.Slice(start, end, category, granularity) for start, end in ranges for category in categories]
+
+
+def _date_range(value):
+    try:
+        start, end = value.split(':')
+        return (datetime.date.fromisoformat(start) if start else None,
+                datetime.date.fromisoformat(end) if end else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected START:END as ISO dates, got {value!r}") from None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render static dashboards for many slices in one batch')
+    parser.add_argument('--db', default=None)
+    parser.add_argument('--out-dir', default=OUTPUT_DIR)
+    parser.add_argument('--range', dest='ranges', type=_date_range, action='append',
+                        help='START:END (either side may be empty); repeatable')
+    parser.add_argument('--by-category', action='store_true', help='also render one dashboard per category')
+    parser.add_argument('--granularity', choices=slices.GRANULARITIES, default='month')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = db.connect_readonly(args.db)
+    try:
+        aggregates = Aggregates(conn)
+        categories = [None] + (aggregates.categories if args.by_category else [])
+        pages = render_dashboards(conn, batch_slices(args.ranges or [(None, None)], categories, args.granularity),
+                                  aggregates)
+    finally:
+        conn.close()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for s, page in pages.items():
+        with open(os.path.join(args.out_dir, f"dashboard-{slug(s)}.html"), 'w', encoding='utf-8') as f:
+            f.write(page)
+    print(f"✅ Rendered {len(pages)} dashboards into {args.out_dir}/ in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
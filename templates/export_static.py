@@ -1,17 +1,14 @@
 # export_static.py - Simple static dashboard creator
-import sqlite3
-import pandas as pd
+import os
+import sys
 
-def create_static_dashboard():
-    print('Creating static dashboard...')
-    
-    # Get data
-    conn = sqlite3.connect('data/ecommerce.db')
-    metrics = pd.read_sql_query('SELECT COUNT(*) as orders, SUM(total_amount) as revenue FROM orders', conn)
-    conn.close()
-    
-    # Simple HTML
-    html = '''<html>
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from static_export import compile_template  # noqa: E402
+
+# Simple HTML; data-metric elements are the slots filled in below
+TEMPLATE = compile_template('''<html>
 <head><title>Dashboard</title>
 <style>
 body { background: #0f172a; color: white; font-family: Arial; padding: 20px; }
@@ -21,15 +18,23 @@ body { background: #0f172a; color: white; font-family: Arial; padding: 20px; }
 <body>
 <h1>E-commerce Analytics</h1>
 <div class="card">
-    <h3>Total Revenue: ${REVENUE}</h3>
-    <h3>Total Orders: {ORDERS}</h3>
+    <h3>Total Revenue: $<span data-metric="revenue">0.00</span></h3>
+    <h3>Total Orders: <span data-metric="orders">0</span></h3>
 </div>
 <p>Portfolio Project - Data Analytics</p>
 </body>
-</html>'''
+</html>''')
+
+def create_static_dashboard():
+    print('Creating static dashboard...')
+    
+    # Get data
+    conn = db.connect_readonly()
+    orders, revenue = conn.execute(
+        'SELECT COALESCE(SUM(order_count), 0), COALESCE(SUM(revenue), 0.0) FROM rollup_monthly').fetchone()
+    conn.close()
     
-    html = html.replace('{REVENUE}', f'{metrics.iloc[0]["revenue"]:,.2f}')
-    html = html.replace('{ORDERS}', str(metrics.iloc[0]["orders"]))
+    html = TEMPLATE.render({'revenue': f'{revenue:,.2f}', 'orders': orders})
     
     with open('dashboard.html', 'w') as f:
         f.write(html)
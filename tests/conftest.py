@@ -0,0 +1,72 @@
+"""Shared fixtures: a small generated database, loaded the way the pipeline loads it
+
+The orders come from the phase 1 generator (fixed seed) plus a product name
+sold in two categories, which the dictionary-encoded paths must keep apart.
+"""
+import csv
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import create_database  # noqa: E402
+import phase1_data_collection  # noqa: E402
+
+ROWS = 3000
+CSV_HEADER = ['order_id', 'customer_id', 'product_name', 'category', 'order_date',
+              'unit_price', 'quantity', 'total_amount']
+
+# One name in two categories (products is unique on name + category)
+SHARED_NAME_ORDERS = [
+    [ROWS + 1, 'CUST_001', 'Gift Card', 'Books', '2023-03-05', 10.0, 1, 10.0],
+    [ROWS + 2, 'CUST_002', 'Gift Card', 'Sports', '2023-03-06', 20.0, 1, 20.0],
+    [ROWS + 3, 'CUST_002', 'Gift Card', 'Sports', '2023-07-14', 20.0, 2, 40.0],
+]
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+def build_database(directory, snapshot=True):
+    """Generate and load the test orders into directory/ecommerce.db; returns its path"""
+    generated = os.path.join(directory, 'generated.csv')
+    phase1_data_collection.write_orders_csv(generated, ROWS, seed=7)
+    shared = write_csv(os.path.join(directory, 'shared.csv'), SHARED_NAME_ORDERS)
+    db_path = os.path.join(directory, 'ecommerce.db')
+    create_database.load_orders([generated, shared], db_path, write_snapshot=snapshot)
+    return db_path
+
+
+@pytest.fixture(scope='session')
+def db_path(tmp_path_factory):
+    """A loaded database with a current snapshot; tests must not modify it"""
+    return build_database(str(tmp_path_factory.mktemp('orders')))
+
+
+@pytest.fixture
+def fresh_db_path(tmp_path):
+    """A loaded database of the test's own, for tests that ingest into it"""
+    return build_database(str(tmp_path))
+
+
+@pytest.fixture
+def orders_csv(tmp_path):
+    """Write order rows (CSV_HEADER columns) to a CSV file in the test's directory; returns its path"""
+    count = iter(range(1_000_000))
+    return lambda rows: write_csv(tmp_path / f"orders-{next(count)}.csv", rows)
+
+
+@pytest.fixture
+def conn(db_path):
+    import db
+    connection = db.connect_readonly(db_path)
+    yield connection
+    connection.close()
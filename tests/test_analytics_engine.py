@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+import analytics_engine
+import db
+import snapshot
+from order_store import OrderStore
+
+
+def assert_reports_equal(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        pd.testing.assert_frame_equal(actual[name], expected[name], obj=name)
+
+
+@pytest.fixture(scope='module')
+def sql_report(db_path):
+    conn = db.connect_readonly(db_path)
+    try:
+        return analytics_engine.build_report(analytics_engine.aggregate_orders(conn), conn)
+    finally:
+        conn.close()
+
+
+def test_store_aggregation_equals_sql(conn, sql_report):
+    store = OrderStore.from_db(conn)
+    report = analytics_engine.build_report(analytics_engine.aggregate_store(store, chunk_size=500),
+                                           dimensions=analytics_engine.store_dimensions(store))
+    assert_reports_equal(report, sql_report)
+
+
+def test_load_report_is_cached_per_data_version(db_path, sql_report, tmp_path):
+    cache_path = str(tmp_path / 'report.pkl')
+    assert_reports_equal(analytics_engine.load_report(db_path, cache_path, refresh=True), sql_report)
+    assert_reports_equal(analytics_engine.load_report(db_path, cache_path), sql_report)
+
+    def recompute(*args, **kwargs):
+        raise AssertionError("the cached report should have been used")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(analytics_engine, 'aggregate_store', recompute)
+        patch.setattr(analytics_engine, 'aggregate_orders', recompute)
+        analytics_engine.load_report(db_path, cache_path)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_parallel_id_ranges_equal_sql(conn, db_path, sql_report, workers):
+    aggregates = analytics_engine.aggregate_parallel(db_path, workers=workers, partitions=7, chunk_size=100)
+    assert_reports_equal(analytics_engine.build_report(aggregates, conn), sql_report)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_parallel_snapshot_rows_equal_sql(conn, db_path, sql_report, workers):
+    store = snapshot.load(conn, db_path)
+    aggregates = analytics_engine.aggregate_parallel(db_path, workers=workers, store=store, partitions=7)
+    report = analytics_engine.build_report(aggregates, dimensions=analytics_engine.store_dimensions(store))
+    assert_reports_equal(report, sql_report)
+
+
+def test_parallel_needs_a_mapped_store(conn):
+    with pytest.raises(ValueError):
+        analytics_engine.aggregate_parallel(workers=2, store=OrderStore.from_db(conn))
+
+
+def test_load_report_with_workers_equals_sql(db_path, sql_report, tmp_path):
+    report = analytics_engine.load_report(db_path, str(tmp_path / 'report.pkl'), refresh=True, workers=2)
+    assert_reports_equal(report, sql_report)
+
+
+@pytest.mark.parametrize('low, high, parts', [(0, 9, 3), (5, 5, 4), (1, 3, 10), (-4, 100, 7)])
+def test_split_range_covers_range_once(low, high, parts):
+    ranges = analytics_engine.split_range(low, high, parts)
+    assert len(ranges) == min(parts, high - low + 1)
+    assert ranges[0][0] == low and ranges[-1][1] == high
+    assert all(first <= last for first, last in ranges)
+    assert all(a[1] + 1 == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_split_empty_range():
+    assert analytics_engine.split_range(5, 4, 3) == []
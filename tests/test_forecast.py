@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+import db
+import forecast
+import ingest
+from conftest import ROWS
+from sketches import day_number
+
+RANGES = [(None, None), ('2023-03-01', '2023-03-31'), ('2023-06-10', '2023-06-20'), ('2023-12-01', '2024-01-05')]
+
+
+def order(order_id, date, category='Books', total=50.0):
+    return [order_id, 'CUST_003', 'Test Product', category, date, total, 1, total]
+
+
+def growths(engine, conn, category=None):
+    return [engine.growth(conn, day_number(start), day_number(end), category) for start, end in RANGES]
+
+
+def assert_forecasts_equal(actual, expected):
+    assert actual['history_end'] == expected['history_end']
+    for name in forecast.DailySeries.METRICS:
+        assert actual[name]['method'] == expected[name]['method']
+        assert actual[name]['params'] == expected[name]['params']
+        np.testing.assert_allclose(actual[name]['values'], expected[name]['values'], rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(actual['recent'][name], expected['recent'][name])
+
+
+@pytest.fixture
+def warm_engine(fresh_db_path):
+    """A GrowthEngine that has read every series of the fresh database once"""
+    engine = forecast.GrowthEngine()
+    conn = db.connect_readonly(fresh_db_path)
+    for category in (None, 'Books'):
+        engine.growth(conn, category=category)
+        engine.forecast(conn, category=category)
+    yield engine, conn
+    conn.close()
+
+
+def test_ingest_into_old_days_matches_fresh_engine(warm_engine, fresh_db_path, orders_csv):
+    engine, conn = warm_engine
+    ingest.append_orders([orders_csv([order(ROWS + 101, '2023-06-15'), order(ROWS + 102, '2023-06-15'),
+                                      order(ROWS + 103, '2024-01-02', 'Electronics')])],
+                         fresh_db_path, refresh_snapshot=False)
+
+    fresh = forecast.GrowthEngine()
+    for category in (None, 'Books', 'Electronics'):
+        assert growths(engine, conn, category) == growths(fresh, conn, category)
+        assert_forecasts_equal(engine.forecast(conn, category=category),
+                               fresh.forecast(conn, category=category))
+
+
+def test_category_first_seen_in_ingest_matches_fresh_engine(warm_engine, fresh_db_path, orders_csv):
+    engine, conn = warm_engine
+    assert engine.forecast(conn, category='Garden')['history_end'] is None
+    ingest.append_orders([orders_csv([order(ROWS + 101, '2023-11-20', 'Garden'),
+                                      order(ROWS + 102, '2023-11-22', 'Garden')])],
+                         fresh_db_path, refresh_snapshot=False)
+    fresh = forecast.GrowthEngine()
+    assert growths(engine, conn, 'Garden') == growths(fresh, conn, 'Garden')
+    assert_forecasts_equal(engine.forecast(conn, category='Garden'), fresh.forecast(conn, category='Garden'))
+
+
+def test_appended_days_advance_model_like_a_full_fit(warm_engine, fresh_db_path, orders_csv, monkeypatch):
+    engine, conn = warm_engine
+    fitted = engine.forecast(conn)
+    ingest.append_orders([orders_csv([order(ROWS + 100 + i, f'2024-01-0{i}', total=100.0 * i)
+                                      for i in range(1, 5)])],
+                         fresh_db_path, refresh_snapshot=False)
+    advanced = engine.forecast(conn)
+    assert advanced['history_end'] == day_number('2024-01-03')
+
+    # Appending keeps the fitted parameters, so a full fit restricted to them must agree
+    params = fitted['revenue']['params']
+    assert advanced['revenue']['params'] == params
+    monkeypatch.setattr(forecast, 'ALPHAS', (params[0],))
+    monkeypatch.setattr(forecast, 'BETAS', (params[1],))
+    monkeypatch.setattr(forecast, 'GAMMAS', (params[2],))
+    refitted = forecast.GrowthEngine().forecast(conn)
+    assert refitted['history_end'] == advanced['history_end']
+    assert refitted['revenue']['method'] == advanced['revenue']['method']
+    np.testing.assert_allclose(advanced['revenue']['values'], refitted['revenue']['values'], rtol=1e-9)
+    assert advanced['revenue']['rmse'] == pytest.approx(refitted['revenue']['rmse'], rel=1e-9)
+    assert growths(engine, conn) == growths(forecast.GrowthEngine(), conn)
+
+
+def test_rescore_without_new_orders_keeps_series(warm_engine):
+    engine, conn = warm_engine
+    before = growths(engine, conn)
+    engine._version = None  # as after an RFM rescore: data_version moved, no batch logged
+    assert growths(engine, conn) == before
+
+
+def test_growth_compares_equal_length_periods(conn):
+    engine = forecast.GrowthEngine()
+    growth = engine.growth(conn, day_number('2023-07-01'), day_number('2023-07-31'))
+    assert growth['period'] == [day_number('2023-07-01'), day_number('2023-07-31')]
+    assert growth['previous_period'] == [day_number('2023-05-31'), day_number('2023-06-30')]
+    july, june = (conn.execute("SELECT SUM(revenue) FROM rollup_daily WHERE order_day BETWEEN ? AND ?",
+                               (day_number(start), day_number(end))).fetchone()[0]
+                  for start, end in [('2023-07-01', '2023-07-31'), ('2023-05-31', '2023-06-30')])
+    assert growth['revenue'] == round((july / june - 1) * 100, 1)
+
+
+def test_no_growth_for_empty_ranges(conn, db_path):
+    engine = forecast.GrowthEngine()
+    assert engine.growth(conn, day_number('2030-01-01')) == forecast.NO_GROWTH
+    assert engine.growth(conn, day_number('2023-05-02'), day_number('2023-05-01')) == forecast.NO_GROWTH
+    assert engine.growth(conn, category='No Such Category') == forecast.NO_GROWTH
+    assert engine.forecast(conn, category='No Such Category')['history_end'] is None
+    assert forecast.growth_rates(conn, day_number('2030-01-01'), db_path=db_path)['period'] is None
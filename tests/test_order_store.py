@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from order_store import COLUMNS, DICTIONARY_COLUMNS, OrderStore, to_cents
+
+
+def csv_paths(db_path):
+    directory = os.path.dirname(db_path)
+    return [os.path.join(directory, 'generated.csv'), os.path.join(directory, 'shared.csv')]
+
+
+def by_order_id(store):
+    """{column: values in order_id order}, with dictionary columns decoded to strings"""
+    order = np.argsort(store.column('order_id'), kind='stable')
+    values = {name: store.column(name)[order] for name in COLUMNS}
+    for name in DICTIONARY_COLUMNS:
+        values[name] = store.decode(name, values[name])
+    return values
+
+
+def test_csv_store_equals_db_store(conn, db_path):
+    from_db = by_order_id(OrderStore.from_db(conn))
+    from_csv = by_order_id(OrderStore.from_csv(csv_paths(db_path), chunk_size=700))
+    for name in COLUMNS:
+        np.testing.assert_array_equal(from_csv[name], from_db[name], err_msg=name)
+
+
+@pytest.mark.parametrize('load', ['db', 'csv'])
+def test_product_codes_are_per_name_and_category(conn, db_path, load):
+    store = OrderStore.from_db(conn) if load == 'db' else OrderStore.from_csv(csv_paths(db_path))
+    gift = store.take(store.decode('product') == 'Gift Card')
+    pairs = set(zip(gift.column('product').tolist(), gift.decode('category').tolist()))
+    assert len(pairs) == 2
+    assert len({code for code, _ in pairs}) == 2
+
+
+def test_columns_use_narrow_dtypes(conn):
+    store = OrderStore.from_db(conn)
+    assert store.column('customer').dtype == np.int8  # 100 customers
+    assert store.column('category').dtype == np.int8
+    assert store.column('total_cents').dtype == np.int64
+    report = store.memory_report()
+    assert report['rows'] == len(store)
+    assert report['total_bytes'] == (sum(c['bytes'] for c in report['columns'].values())
+                                     + sum(d['bytes'] for d in report['dictionaries'].values()))
+
+
+def test_between_is_inclusive(conn):
+    store = OrderStore.from_db(conn)
+    days = store.column('order_day')
+    start, end = int(days.min()) + 10, int(days.min()) + 40
+    selected = store.between(start, end)
+    assert len(selected) == np.count_nonzero((days >= start) & (days <= end))
+    assert selected.column('order_day').min() == start and selected.column('order_day').max() == end
+    assert len(store.between(end, start)) == 0
+
+
+def test_cents_are_exact():
+    np.testing.assert_array_equal(to_cents([0.1, 0.29, 1172.12, 19.999999]), [10, 29, 117212, 2000])
+
+
+def test_mismatched_columns_are_rejected(conn):
+    columns = dict(OrderStore.from_db(conn).columns)
+    columns['quantity'] = columns['quantity'][:-1]
+    with pytest.raises(ValueError):
+        OrderStore(columns, {name: [] for name in DICTIONARY_COLUMNS})
+    del columns['quantity']
+    with pytest.raises(ValueError):
+        OrderStore(columns, {name: [] for name in DICTIONARY_COLUMNS})
@@ -0,0 +1,110 @@
+import math
+import shutil
+
+import numpy as np
+import pytest
+
+import db
+import ingest
+import instrumentation
+import sketches
+from conftest import ROWS
+
+
+@pytest.mark.parametrize('n', [50, 2_000, 40_000, 400_000])
+def test_hll_error_within_three_standard_errors(n):
+    keys = np.arange(n, dtype=np.int64) * 7919 + 12345
+    hll = sketches.HyperLogLog()
+    hll.add(keys)
+    assert abs(hll.count() - n) <= 3 * hll.relative_error * n
+
+
+def test_hll_merge_equals_one_pass():
+    keys = np.arange(30_000, dtype=np.int64)
+    whole, left, right = sketches.HyperLogLog(), sketches.HyperLogLog(), sketches.HyperLogLog()
+    whole.add(keys)
+    left.add(keys[:20_000])
+    right.add(keys[10_000:])
+    np.testing.assert_array_equal(left.merge(right).registers, whole.registers)
+
+
+def test_count_min_overcount_is_bounded():
+    rng = np.random.default_rng(3)
+    keys = np.arange(20_000, dtype=np.int64)
+    weights = rng.pareto(1.5, len(keys)) * 100
+    cms = sketches.CountMinSketch()
+    cms.add(keys, weights)
+    overcount = cms.estimate(keys) - weights
+    assert overcount.min() >= -1e-6
+    # e / width of the total, for all but a 1 - exp(-depth) share of keys
+    within = overcount <= math.e / sketches.CMS_WIDTH * weights.sum()
+    assert within.mean() >= 1 - math.exp(-sketches.CMS_DEPTH)
+
+
+def test_space_saving_merge_keeps_its_bound():
+    rng = np.random.default_rng(5)
+    size = 20
+    truth = np.zeros(500)
+    summary = sketches.SpaceSaving(size=size)
+    for _ in range(30):  # one summary per "day", merged like sketch_daily rows
+        keys = np.unique(rng.zipf(1.3, 200) % len(truth)).astype(np.int64)
+        counts = rng.uniform(1, 100, len(keys))
+        truth[keys] += counts
+        summary.merge(sketches.SpaceSaving.from_counts(keys, counts, size))
+
+    items = summary.items
+    assert len(items) == size
+    assert np.all(items['count'] >= truth[items['key']] - 1e-6)
+    assert np.all(items['count'] <= truth[items['key']] + summary.floor + 1e-6)
+    missing = np.setdiff1d(np.arange(len(truth)), items['key'])
+    assert truth[missing].max() <= summary.floor + 1e-6
+
+
+@pytest.mark.parametrize('dimension', ['customer', 'product'])
+@pytest.mark.parametrize('start, end', [(None, None), ('2023-07-01', '2023-09-30'), ('2023-03-05', '2023-03-05')])
+def test_top_k_within_error_bound_of_exact(conn, dimension, start, end):
+    approximate = sketches.top_k(conn, dimension, 5, start, end)
+    exact = sketches.top_k(conn, dimension, 1000, start, end, exact=True)
+    revenue = {}
+    for row in exact:
+        revenue[row['name']] = revenue.get(row['name'], 0.0) + row['revenue']
+    for row in approximate:
+        assert revenue[row['name']] - 1e-6 <= row['revenue'] <= revenue[row['name']] + row['error_bound'] + 1e-6
+
+
+@pytest.mark.parametrize('start, end', [(None, None), ('2023-07-01', '2023-09-30'), ('2023-03-05', '2023-03-06')])
+def test_unique_customers_within_error_bound(conn, start, end):
+    estimate = sketches.unique_count(conn, 'customer', start, end)
+    exact = sketches.unique_count(conn, 'customer', start, end, exact=True)
+    assert exact['exact'] and not estimate['exact']
+    assert abs(estimate['value'] - exact['value']) <= 3 * estimate['relative_error'] * exact['value']
+
+
+def test_top_k_rejects_non_positive_k(conn):
+    with pytest.raises(ValueError):
+        sketches.top_k(conn, 'product', 0)
+
+
+def test_ingested_sketches_equal_rebuild(fresh_db_path, orders_csv, tmp_path):
+    rng = np.random.default_rng(11)
+    rows = [[ROWS + 100 + i, f"CUST_{rng.integers(1, 150):03d}", 'AirPods', 'Electronics',
+             f"2023-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}", 9.5, 2, 19.0] for i in range(400)]
+    ingest.append_orders([orders_csv(rows[:150]), orders_csv(rows[150:])], fresh_db_path,
+                         chunk_size=60, refresh_snapshot=False)
+
+    rebuilt_path = str(tmp_path / 'rebuilt.db')
+    shutil.copy(fresh_db_path, rebuilt_path)
+    conn = instrumentation.connect(rebuilt_path, isolation_level=None)
+    conn.execute("BEGIN")
+    sketches.rebuild_sketches(conn)
+    conn.execute("COMMIT")
+    conn.close()
+
+    query = "SELECT order_day, dimension, total, hll, cms, topk, topk_floor FROM sketch_daily"
+    ingested, rebuilt = ({(day, dimension): sketches.DaySketch.from_row(*row) for day, dimension, *row in
+                          db.connect_readonly(path).execute(query)} for path in (fresh_db_path, rebuilt_path))
+    assert ingested.keys() == rebuilt.keys()
+    for key, sketch in rebuilt.items():
+        assert ingested[key].total == pytest.approx(sketch.total)
+        np.testing.assert_array_equal(ingested[key].hll.registers, sketch.hll.registers)
+        np.testing.assert_allclose(ingested[key].cms.table, sketch.cms.table)
@@ -0,0 +1,99 @@
+import datetime
+
+import pytest
+
+import db
+import ingest
+import slices
+from conftest import ROWS
+
+SLICES = [
+    slices.Slice(),
+    slices.Slice(datetime.date(2023, 3, 1), datetime.date(2023, 5, 31), 'Electronics'),
+    slices.Slice(datetime.date(2023, 3, 5), datetime.date(2023, 3, 6), 'Books'),
+]
+
+
+def expected_ids(conn, s):
+    """order_ids of the slice, newest first, straight from order_facts"""
+    conditions, params = [], []
+    if s.start is not None:
+        conditions.append("order_day >= ?")
+        params.append(s.start_day)
+    if s.end is not None:
+        conditions.append("order_day <= ?")
+        params.append(s.end_day)
+    if s.category is not None:
+        conditions.append(f"category_key = {slices.CATEGORY_KEY}")
+        params.append(s.category)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return [row[0] for row in conn.execute(
+        f"SELECT order_id FROM order_facts {where} ORDER BY order_day DESC, order_id DESC", params)]
+
+
+def all_pages(conn, s, limit):
+    pages, before = [], None
+    while True:
+        page = slices.recent_orders(conn, s, limit, before)
+        if not page:
+            return pages
+        pages.append(page)
+        before = slices.parse_cursor(slices.format_cursor(page[-1]))
+
+
+@pytest.mark.parametrize('s', SLICES)
+@pytest.mark.parametrize('limit', [1, 7, 250])
+def test_pages_cover_the_slice_once_in_order(conn, s, limit):
+    pages = all_pages(conn, s, limit)
+    assert all(len(page) == limit for page in pages[:-1])
+    assert [order['order_id'] for page in pages for order in page] == expected_ids(conn, s)
+
+
+def test_pages_are_stable_across_an_ingest(fresh_db_path, orders_csv):
+    conn = db.connect_readonly(fresh_db_path)
+    try:
+        s = slices.Slice(end=datetime.date(2023, 6, 30))
+        first, second = all_pages(conn, s, 25)[:2]
+        boundary = first[-1]['order_date']
+        # A newer order, one on the page boundary's day (newer than the cursor) and a re-sent old one
+        ingest.append_orders([orders_csv([
+            [ROWS + 100, 'CUST_001', 'AirPods', 'Electronics', '2023-06-30', 10.0, 1, 10.0],
+            [ROWS + 101, 'CUST_001', 'AirPods', 'Electronics', boundary, 10.0, 1, 10.0],
+            [1, 'CUST_001', 'AirPods', 'Electronics', boundary, 10.0, 1, 10.0],
+        ])], fresh_db_path, refresh_snapshot=False)
+
+        before = slices.parse_cursor(slices.format_cursor(first[-1]))
+        assert slices.recent_orders(conn, s, 25, before) == second
+        assert slices.recent_orders(conn, s, 25)[0]['order_id'] == ROWS + 100
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('s', SLICES)
+def test_export_resumes_after_cursor(conn, s):
+    rows = slices.export_orders(conn, s).fetchall()
+    assert [row[0] for row in rows] == expected_ids(conn, s)[::-1]
+    middle = len(rows) // 2
+    after = slices.parse_cursor(f"{rows[middle][4]}_{rows[middle][0]}")
+    assert slices.export_orders(conn, s, after).fetchall() == rows[middle + 1:]
+
+
+def test_parse_slice():
+    s = slices.parse_slice({'start': '2023-07-01', 'end': '2023-09-30', 'category': 'Books'})
+    assert s == slices.Slice(datetime.date(2023, 7, 1), datetime.date(2023, 9, 30), 'Books', 'month')
+    assert s.month_aligned
+    assert not slices.parse_slice({'start': '2023-07-02'}).month_aligned
+    assert slices.parse_slice({'category': ''}, 'day') == slices.Slice(granularity='day')
+
+
+@pytest.mark.parametrize('args', [{'start': '2023-13-01'}, {'granularity': 'year'},
+                                  {'start': '2023-07-02', 'end': '2023-07-01'}])
+def test_parse_slice_rejects_bad_values(args):
+    with pytest.raises(ValueError):
+        slices.parse_slice(args)
+
+
+@pytest.mark.parametrize('value', ['2023-12-31', '2023-12-31_x', 'yesterday_12', ''])
+def test_parse_cursor_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        slices.parse_cursor(value)
@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import analytics_engine
+import db
+import ingest
+import sketches
+import snapshot
+from order_store import OrderStore
+
+
+def sql_report(conn):
+    return analytics_engine.build_report(analytics_engine.aggregate_orders(conn), conn)
+
+
+def test_snapshot_is_written_and_current(conn, db_path):
+    store = snapshot.load(conn, db_path)
+    assert store is not None
+    assert store.location[0] == snapshot.snapshot_dir(db_path)
+    assert len(store) == conn.execute("SELECT COUNT(*) FROM order_facts").fetchone()[0]
+
+
+def test_snapshot_columns_match_database(conn, db_path):
+    store = snapshot.load(conn, db_path)
+    expected = OrderStore.from_db(conn)
+    assert store.dictionaries == expected.dictionaries
+    for name, column in expected.columns.items():
+        np.testing.assert_array_equal(store.column(name), column)
+
+
+def test_snapshot_report_equals_sql_report(conn, db_path):
+    store = snapshot.load(conn, db_path)
+    from_snapshot = analytics_engine.build_report(analytics_engine.aggregate_store(store),
+                                                  dimensions=analytics_engine.store_dimensions(store))
+    from_sql = sql_report(conn)
+    assert from_snapshot.keys() == from_sql.keys()
+    for name in from_sql:
+        pd.testing.assert_frame_equal(from_snapshot[name], from_sql[name], obj=name)
+
+
+def test_shared_product_name_stays_two_products(conn, db_path):
+    store = snapshot.load(conn, db_path)
+    report = analytics_engine.build_report(analytics_engine.aggregate_store(store),
+                                           dimensions=analytics_engine.store_dimensions(store))
+    gift = report['product_performance'].query("product_name == 'Gift Card'")
+    assert sorted(zip(gift['category'], gift['revenue'], gift['order_count'])) == [
+        ('Books', 10.0, 1), ('Sports', 60.0, 2)]
+
+
+def test_exact_top_products_equal_sql(conn, db_path, monkeypatch):
+    with_snapshot = sketches.top_k(conn, 'product', 100, exact=True)
+    monkeypatch.setattr(snapshot, 'load', lambda *args, **kwargs: None)
+    with_sql = sketches.top_k(conn, 'product', 100, exact=True)
+    assert sorted((row['name'], round(row['revenue'], 2)) for row in with_snapshot) == \
+        sorted((row['name'], round(row['revenue'], 2)) for row in with_sql)
+    assert sum(row['name'] == 'Gift Card' for row in with_snapshot) == 2
+
+
+def test_exact_unique_counts_equal_sql(conn, db_path):
+    store = snapshot.load(conn, db_path)
+    for dimension, column in (('customer', 'customer_key'), ('product', 'product_key')):
+        expected = conn.execute(
+            f"SELECT COUNT(DISTINCT {column}) FROM order_facts WHERE order_day BETWEEN 19450 AND 19600"
+        ).fetchone()[0]
+        assert snapshot.unique_count(store, dimension, 19450, 19600) == expected
+
+
+def test_stale_or_old_format_snapshot_is_ignored(fresh_db_path, orders_csv):
+    conn = db.connect_readonly(fresh_db_path)
+    try:
+        directory = snapshot.snapshot_dir(fresh_db_path)
+        name, header = snapshot.read_header(directory)
+        assert snapshot.load(conn, fresh_db_path, directory) is not None
+
+        # An ingest without a refresh leaves the snapshot behind the database
+        new = orders_csv([[900001, 'CUST_900', 'Gift Card', 'Books', '2023-12-30', 10.0, 1, 10.0]])
+        ingest.append_orders([new], fresh_db_path, refresh_snapshot=False)
+        assert snapshot.load(conn, fresh_db_path, directory) is None
+        snapshot.refresh_if_present(fresh_db_path)
+        assert snapshot.load(conn, fresh_db_path, directory) is not None
+
+        # Snapshots in another format are never read
+        name, header = snapshot.read_header(directory)
+        path = os.path.join(directory, name, snapshot.HEADER)
+        with open(path) as f:
+            text = f.read()
+        with open(path, 'w') as f:
+            f.write(text.replace(f'"format": {snapshot.FORMAT_VERSION}', '"format": 1'))
+        assert snapshot.read_header(directory) == (None, None)
+    finally:
+        conn.close()
@@ -0,0 +1,40 @@
+import datetime
+
+import pytest
+
+import db
+import sketches
+from cache import api_cache
+
+
+@pytest.fixture
+def client(db_path, monkeypatch):
+    import web_dashboard
+    monkeypatch.setattr(db, 'DB_PATH', db_path)
+    api_cache.clear()
+    yield web_dashboard.app.test_client()
+    api_cache.clear()
+    db.close_connection(db_path)
+
+
+def ranked(rows):
+    return [(row['name'], round(row['revenue'], 2)) for row in rows]
+
+
+@pytest.mark.parametrize('dimension', ['product', 'customer'])
+@pytest.mark.parametrize('exact', [False, True])
+def test_ranged_top_k_equals_exact_answer(client, conn, dimension, exact):
+    start, end = datetime.date(2023, 7, 1), datetime.date(2023, 7, 31)
+    query = f"?start={start}&end={end}&k=5" + ('&exact=1' if exact else '')
+    response = client.get(f"/api/top-{dimension}s{query}")
+    assert response.status_code == 200
+    expected = sketches.top_k(conn, dimension, 5, start, end, exact=True)
+    assert ranked(response.get_json()) == ranked(expected)
+    assert ranked(expected) != ranked(sketches.top_k(conn, dimension, 5, exact=True))
+
+
+@pytest.mark.parametrize('query', ['?category=Books', '?start=2023-07-31&end=2023-07-01', '?k=0'])
+def test_top_k_rejects_unsupported_arguments(client, query):
+    response = client.get(f"/api/top-products{query}")
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
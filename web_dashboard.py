@@ -1,9 +1,64 @@
-from flask import Flask, render_template, jsonify
-import sqlite3
-import pandas as pd
+from flask import Flask, Response, abort, render_template, request, url_for
 from datetime import datetime, timedelta
+import os
+import sqlite3
+
+import db
+import forecast
+import instrumentation
+import live
+import rfm
+import sketches
+import slices
+from cache import api_cache, cached_json
+from query import iter_csv, iter_json_array, iter_ndjson, json_response
 
 app = Flask(__name__)
+db.init_app(app)
+instrumentation.init_app(app)
+
+# Serve the aggregate endpoints from a Parquet export instead (see columnar_store.py)
+PARQUET_DATASET = os.environ.get('ECOMMERCE_PARQUET')
+if PARQUET_DATASET:
+    import columnar_store  # pulls in pyarrow, so only for this backend
+
+MAX_PAGE_SIZE = 1000
+
+def _flag(name):
+    """True when a query-string flag is set (?name=1 / true / yes)"""
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+def _request_slice():
+    """start/end/category/granularity from the query string; 400 on malformed values"""
+    try:
+        return slices.parse_slice(request.args)
+    except ValueError as e:
+        abort(json_response({'error': str(e)}, status=400))
+
+def _request_cursor():
+    """The ?cursor= keyset position, or None; 400 when malformed"""
+    value = request.args.get('cursor')
+    if not value:
+        return None
+    try:
+        return slices.parse_cursor(value)
+    except ValueError as e:
+        abort(json_response({'error': str(e)}, status=400))
+
+def _request_k():
+    """The ?k= result count (default 10, at most MAX_PAGE_SIZE); 400 when not positive"""
+    k = request.args.get('k', 10, type=int)
+    if k < 1:
+        abort(json_response({'error': 'k must be a positive integer'}, status=400))
+    return min(k, MAX_PAGE_SIZE)
+
+def _request_range():
+    """A slice for the sketch-backed endpoints: start/end only, 400 when a category is given"""
+    s = _request_slice()
+    if s.category is not None:
+        abort(json_response({'error': 'category is not supported here; day sketches cover all categories'},
+                            status=400))
+    return s
 
 @app.route('/')
 def dashboard():
@@ -11,99 +66,163 @@ def dashboard():
     return render_template('dashboard.html')
 
 @app.route('/api/metrics')
+@cached_json
 def get_metrics():
-    """API endpoint for main metrics"""
-    conn = sqlite3.connect('data/ecommerce.db')
+    """API endpoint for main metrics (?start=&end=&category= slice the data)"""
+    s = _request_slice()
+    # Get basic metrics from the pre-aggregated rollups
+    if PARQUET_DATASET:
+        metrics = columnar_store.metrics(PARQUET_DATASET, **s.filters)
+    else:
+        # Distinct customers come from the merged day sketches; ?exact=1 counts them exactly
+        metrics = slices.metrics(db.get_connection(), s, exact=_flag('exact'))
     
-    # Get basic metrics
-    metrics = pd.read_sql_query("""
-        SELECT 
-            COUNT(*) as total_orders,
-            SUM(total_amount) as total_revenue,
-            AVG(total_amount) as avg_order_value,
-            COUNT(DISTINCT customer_id) as unique_customers
-        FROM orders
-    """, conn)
-    
-    # Calculate growth percentages (mock data for now)
-    revenue_growth = 12.5
-    orders_growth = 8.2
-    conversion_growth = -2.1
-    aov_growth = 5.3
-    
-    conn.close()
-    
-    return jsonify({
-        'total_revenue': round(float(metrics.iloc[0]['total_revenue']), 2),
-        'total_orders': int(metrics.iloc[0]['total_orders']),
-        'avg_order_value': round(float(metrics.iloc[0]['avg_order_value']), 2),
-        'unique_customers': int(metrics.iloc[0]['unique_customers']),
+    # Growth of the slice over the equally long period before it (the last 30 days by default),
+    # from this process's cached daily series
+    growth = forecast.growth_rates(db.get_connection(), s.start_day, s.end_day, s.category)
+
+    return json_response({
+        'total_revenue': round(metrics['total_revenue'] or 0.0, 2),
+        'total_orders': metrics['total_orders'] or 0,
+        'avg_order_value': round(metrics['avg_order_value'] or 0.0, 2),
+        'unique_customers': metrics['unique_customers'],
+        'unique_customers_error': metrics.get('unique_customers_error', 0.0),
         'growth_rates': {
-            'revenue': revenue_growth,
-            'orders': orders_growth,
-            'conversion': conversion_growth,
-            'aov': aov_growth
-        }
+            'revenue': growth['revenue'],
+            'orders': growth['orders'],
+            'conversion': None,  # no visit data to compute a conversion rate from
+            'aov': growth['aov']
+        },
+        'growth_period': {'current': growth['period'], 'previous': growth['previous_period']}
     })
 
+@app.route('/api/forecast')
+@cached_json
+def get_forecast():
+    """API endpoint for daily revenue and order forecasts (?horizon= days, default 30; ?category=)"""
+    horizon = min(max(request.args.get('horizon', forecast.DEFAULT_HORIZON, type=int), 1), forecast.MAX_HORIZON)
+    category = request.args.get('category') or None
+    return json_response(forecast.to_json(forecast.forecast(db.get_connection(), horizon, category)))
+
 @app.route('/api/monthly-data')
+@cached_json
 def get_monthly_data():
-    """API endpoint for monthly revenue data"""
-    conn = sqlite3.connect('data/ecommerce.db')
-    
-    monthly_data = pd.read_sql_query("""
-        SELECT 
-            strftime('%Y-%m', order_date) as month,
-            SUM(total_amount) as revenue,
-            COUNT(*) as orders
-        FROM orders
-        GROUP BY month
-        ORDER BY month
-    """, conn)
-    
-    conn.close()
-    
-    return jsonify(monthly_data.to_dict('records'))
+    """API endpoint for revenue over time (?granularity=day|week|month, default month)"""
+    s = _request_slice()
+    if PARQUET_DATASET:
+        return json_response(columnar_store.monthly_data(PARQUET_DATASET, s.granularity, **s.filters))
+    return json_response(slices.series(db.get_connection(), s))
 
 @app.route('/api/categories')
+@cached_json
 def get_categories():
     """API endpoint for category data"""
-    conn = sqlite3.connect('data/ecommerce.db')
-    
-    categories = pd.read_sql_query("""
-        SELECT 
-            category,
-            COUNT(*) as order_count,
-            SUM(total_amount) as revenue
-        FROM orders
-        GROUP BY category
-        ORDER BY revenue DESC
-    """, conn)
-    
-    conn.close()
-    
-    return jsonify(categories.to_dict('records'))
+    s = _request_slice()
+    if PARQUET_DATASET:
+        return json_response(columnar_store.categories(PARQUET_DATASET, **s.filters))
+    return json_response(slices.categories(db.get_connection(), s))
 
 @app.route('/api/recent-orders')
+@cached_json
 def get_recent_orders():
-    """API endpoint for recent orders table"""
-    conn = sqlite3.connect('data/ecommerce.db')
-    
-    orders = pd.read_sql_query("""
-        SELECT 
-            order_id,
-            customer_id,
-            order_date,
-            total_amount,
-            product_name
-        FROM orders
-        ORDER BY order_date DESC
-        LIMIT 10
-    """, conn)
-    
-    conn.close()
-    
-    return jsonify(orders.to_dict('records'))
+    """API endpoint for recent orders, newest first (?limit=, ?cursor= for the next page)
+
+    When more rows follow, the Link header carries the URL of the next page.
+    """
+    s = _request_slice()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)
+    before = _request_cursor()
+    orders = slices.recent_orders(db.get_connection(), s, limit, before)
+
+    response = json_response(orders)
+    if len(orders) == limit:
+        args = {**request.args.to_dict(), 'cursor': slices.format_cursor(orders[-1])}
+        response.headers['Link'] = f'<{url_for("get_recent_orders", **args)}>; rel="next"'
+    return response
+
+@app.route('/api/orders/export')
+def export_orders():
+    """Stream every order in the slice as NDJSON (default), CSV (?format=csv) or a JSON array (?format=json)
+
+    Rows are sent as they are read from a dedicated connection, so memory use
+    is flat and the first bytes go out immediately; ?cursor= resumes after an
+    order (oldest-first order).
+    """
+    s = _request_slice()
+    after = _request_cursor()
+    export_format = request.args.get('format', 'ndjson')
+    encoders = {'ndjson': iter_ndjson, 'csv': iter_csv, 'json': iter_json_array}
+    if export_format not in encoders:
+        return json_response({'error': "format must be ndjson, csv or json"}, status=400)
+
+    def generate():
+        conn = db.connect_readonly()
+        try:
+            cursor = slices.export_orders(conn, s, after)
+            yield from encoders[export_format](cursor)
+        finally:
+            conn.close()
+
+    if export_format == 'csv':
+        return Response(generate(), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=orders.csv'})
+    if export_format == 'json':
+        return Response(generate(), mimetype='application/json')
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/live')
+def live_metrics():
+    """Server-Sent Events: a snapshot on connect, then a delta after every ingest"""
+    return Response(live.stream_events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/top-products')
+@cached_json
+def get_top_products():
+    """API endpoint for best sellers by revenue over ?start=&end= (from day sketches unless ?exact=1)"""
+    s = _request_range()
+    return json_response(sketches.top_k(db.get_connection(), 'product', _request_k(), s.start, s.end,
+                                        exact=_flag('exact')))
+
+@app.route('/api/top-customers')
+@cached_json
+def get_top_customers():
+    """API endpoint for top customers by revenue over ?start=&end= (from day sketches unless ?exact=1)"""
+    s = _request_range()
+    return json_response(sketches.top_k(db.get_connection(), 'customer', _request_k(), s.start, s.end,
+                                        exact=_flag('exact')))
+
+@app.route('/api/rfm')
+@cached_json
+def get_rfm_segments():
+    """API endpoint for RFM segment sizes (scores precomputed by rfm.py)"""
+    try:
+        segments = rfm.segment_summary(db.get_connection())
+    except sqlite3.OperationalError:
+        return json_response({'error': 'RFM scores not computed; run python rfm.py'}, status=404)
+    return json_response(segments)
+
+@app.route('/api/rfm/<customer_id>')
+@cached_json
+def get_customer_rfm(customer_id):
+    """API endpoint for one customer's RFM scores"""
+    try:
+        scores = rfm.customer_scores(db.get_connection(), customer_id)
+    except sqlite3.OperationalError:
+        scores = None
+    if scores is None:
+        return json_response({'error': f'no RFM scores for {customer_id}'}, status=404)
+    return json_response(scores)
+
+@app.route('/api/cache-stats')
+def get_cache_stats():
+    """API endpoint for result cache hit/miss statistics"""
+    return json_response({**api_cache.stats(), 'live': live.get_hub().stats()})
+
+@app.route('/metrics')
+def get_prometheus_metrics():
+    """Query, stage and request timings in the Prometheus text format"""
+    return Response(instrumentation.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     print("🚀 Starting E-commerce Dashboard...")
@@ -112,4 +231,12 @@ if __name__ == '__main__':
     print("   - http://localhost:5000/api/metrics")
     print("   - http://localhost:5000/api/monthly-data")
     print("   - http://localhost:5000/api/categories")
+    print("   - http://localhost:5000/api/forecast?horizon=30")
+    print("   - http://localhost:5000/api/live (Server-Sent Events)")
+    print("   - http://localhost:5000/api/orders/export?format=csv")
+    print("   - http://localhost:5000/api/top-products")
+    print("   - http://localhost:5000/api/top-customers")
+    print("   - http://localhost:5000/api/rfm")
+    print("   - http://localhost:5000/api/cache-stats")
+    print("   - http://localhost:5000/metrics (Prometheus)")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file